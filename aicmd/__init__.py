@@ -1,4 +1,10 @@
-from .core import Assistant
-
 __version__ = '0.1.0'
-__all__ = ['Assistant'] 
\ No newline at end of file
+__all__ = ['Assistant']
+
+
+def __getattr__(name):
+    """按需导入 Assistant，避免 import aicmd 时加载全部依赖"""
+    if name == 'Assistant':
+        from .core import Assistant
+        return Assistant
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
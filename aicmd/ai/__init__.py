@@ -1,4 +1,16 @@
-from .chat import ChatManager
-from .search import SearchEngine
+import importlib
 
-__all__ = ['ChatManager', 'SearchEngine'] 
\ No newline at end of file
+_LAZY_ATTRS = {
+    'ChatManager': '.chat',
+    'SearchEngine': '.search',
+}
+
+__all__ = ['ChatManager', 'SearchEngine']
+
+
+def __getattr__(name):
+    """首次访问时才导入对应模块（openai / requests 较重）"""
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from ..utils.cache import DiskCache
+
+# 影响回答内容的系统信息字段
+ENV_FIELDS = (
+    ('os', 'system'),
+    ('os', 'release'),
+    ('os', 'machine'),
+    ('shell', 'type'),
+)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s?？。.!！~～]+$')
+# 指代上文（上一条命令、输出或回答）的说法：这样的追问依赖对话上下文，不缓存
+_FOLLOW_UP_RE = re.compile(
+    r'这个|这些|那个|那些|这里|上面|上述|刚才|刚刚|之前|前面|上一条|上一个|它|继续|还是不行|怎么回事|呢\s*[?？]?$'
+    r'|\b(it|this|that|these|those|above|previous|again)\b',
+    re.IGNORECASE,
+)
+
+
+class ResponseCache:
+    """AI 回答缓存
+
+    只缓存不依赖上下文的问题（“怎么查看端口占用”），以“规范化后的问题 + 系统环境摘要”为键，
+    保存在 ~/.aicmd/response_cache/，按 LRU 和 TTL 淘汰。指代上文的追问（“这个报错怎么解决”）
+    的回答取决于对话内容，由 is_follow_up 判断后不查也不写缓存。
+    """
+    def __init__(self, directory=None, max_entries=200, ttl=86400, enabled=True):
+        self.enabled = enabled
+        self.store = DiskCache(
+            directory or Path.home() / '.aicmd' / 'response_cache',
+            max_entries=max_entries,
+            ttl=ttl,
+        )
+
+    @classmethod
+    def from_settings(cls, settings, enabled=True):
+        """根据配置创建"""
+        return cls(
+            max_entries=settings.get('cache.max_entries', 200),
+            ttl=settings.get('cache.ttl', 86400),
+            enabled=enabled and settings.get('cache.enabled', True),
+        )
+
+    @staticmethod
+    def normalize(query):
+        """规范化问题：统一大小写和空白，去掉结尾的标点"""
+        query = _WHITESPACE_RE.sub(' ', query.strip().lower())
+        return _TRAILING_PUNCT_RE.sub('', query)
+
+    @staticmethod
+    def is_follow_up(query):
+        """问题是否是依赖上文的追问"""
+        return bool(_FOLLOW_UP_RE.search(query))
+
+    @staticmethod
+    def env_hash(system_info):
+        """系统环境摘要"""
+        values = []
+        for section, field in ENV_FIELDS:
+            value = (system_info or {}).get(section, {})
+            values.append(value.get(field, '') if isinstance(value, dict) else '')
+        return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()[:16]
+
+    def _key(self, query, system_info):
+        return f"{self.normalize(query)}\0{self.env_hash(system_info)}"
+
+    def get(self, query, system_info):
+        """查找缓存的回答，未命中返回 None"""
+        if not self.enabled:
+            return None
+        return self.store.get(self._key(query, system_info))
+
+    def put(self, query, system_info, response):
+        """缓存回答"""
+        if self.enabled and response:
+            self.store.set(self._key(query, system_info), response)
+
+    @property
+    def hits(self):
+        return self.store.hits
+
+    @property
+    def misses(self):
+        return self.store.misses
+
+    def clear(self):
+        """清空缓存"""
+        self.store.clear()
+
+    def report(self):
+        """缓存统计文本"""
+        state = "已启用" if self.enabled else "已关闭"
+        return f"回答缓存{state}：命中 {self.hits} 次，未命中 {self.misses} 次，共 {len(self.store)} 条"
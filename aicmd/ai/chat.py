@@ -1,37 +1,97 @@
+import asyncio
 import json
-import time
-from openai import OpenAI
 from ..utils.timer import ThinkingTimer
 from ..config.settings import Settings
+from .transport import get_transport
+from .router import ModelRouter, ROUTE_NAMES
+from .stream import ThinkStreamParser
+from .context import estimate_tokens
 import sys
 from ..prompts.base import SYSTEM_PROMPT, WINDOWS_SHELL_CHECK, COMMAND_ANALYSIS
 
 class ChatManager:
     """AI 对话管理"""
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, settings=None):
+        self.settings = settings or Settings()
         self.setup_client(api_key)
         self.conversation_history = []
         self.system_prompt = SYSTEM_PROMPT
+        self.last_reasoning = ""  # 最近一次回答的思考过程
+        self.echo = True  # 是否在屏幕上显示回答（批量模式下关闭）
+        self.show_thinking = self.settings.get('display.show_thinking', False)
         
     def setup_client(self, api_key=None):
         """设置 API 客户端"""
-        settings = Settings()
+        settings = self.settings
         
         # 检查配置
         if not settings.check_api_config():
             if not settings.setup_wizard():
                 raise Exception("API 配置失败")
         
-        # 创建 OpenAI 客户端
-        self.client = OpenAI(
-            base_url='http://localhost:11434/v1/',
-            api_key='ollama',  # required but ignored
-        )
-
-    def get_response(self, query, system_info, context=""):
-        """获取 AI 响应"""
-        # 构建消息
-        messages = [
+        # 客户端延迟到第一次请求时创建，按 (base_url, api_key) 缓存
+        self._clients = {}
+        self._async_clients = {}
+        self._no_usage_option = set()  # 不接受 stream_options 的接口地址
+        self.router = ModelRouter(settings)
+
+    @property
+    def client(self):
+        """默认路由（问答）使用的 OpenAI 客户端"""
+        return self._client_for(self.router.resolve('qa'))
+
+    def _client_for(self, route):
+        """获取路由对应接口的 OpenAI 客户端（首次使用时才导入 openai 并创建）"""
+        key = (route.base_url, route.api_key)
+        if key not in self._clients:
+            from openai import OpenAI
+            self._clients[key] = OpenAI(
+                base_url=route.base_url,
+                api_key=route.api_key,
+                http_client=self.transport.client,  # 共享连接池，连续对话复用连接
+            )
+        return self._clients[key]
+
+    @property
+    def transport(self):
+        """共享的 HTTP 连接池"""
+        return get_transport(self.settings)
+
+    def _async_client_for(self, route):
+        """获取路由对应接口的异步 OpenAI 客户端"""
+        key = (route.base_url, route.api_key)
+        if key not in self._async_clients:
+            from openai import AsyncOpenAI
+            self._async_clients[key] = AsyncOpenAI(
+                base_url=route.base_url,
+                api_key=route.api_key,
+                http_client=self.transport.async_client,
+            )
+        return self._async_clients[key]
+
+    def _render(self, events, timer, last_kind, flush=True):
+        """显示解析出的内容，返回最后显示的内容类型（尚未显示任何内容时为 None）
+
+        思考过程默认隐藏，/think 开启后以暗色显示。异步模式下输出经 patch_stdout
+        显示在提示符上方，此时不逐块 flush，按整行输出，避免把半行内容和提示符混在一起。
+        """
+        for kind, text in events:
+            if not self.echo or (kind == 'think' and not self.show_thinking):
+                continue
+            if last_kind is None:  # 第一次有内容显示时停止动画
+                timer.stop()
+            elif kind != last_kind:
+                print()  # 思考过程和回答之间换行
+            last_kind = kind
+            if kind == 'think':
+                print(f"\033[2m{text}\033[0m", end='', flush=flush)
+            else:
+                print(text, end='', flush=flush)
+        return last_kind
+
+    def _build_messages(self, query, system_info, context):
+        """构建发送给模型的消息"""
+        return [
             {
                 "role": "system",
                 "content": self.system_prompt
@@ -46,68 +106,223 @@ class ChatManager:
             }
         ]
 
-        timer = ThinkingTimer("AI 思考中")
+    def _stream_options(self, route):
+        """请求接口在流的最后一块返回实际 token 用量（接口拒绝该参数后不再发送）"""
+        if route.base_url in self._no_usage_option:
+            return {}
+        return {'stream_options': {'include_usage': True}}
+
+    def _reject_usage_option(self, route, options, error):
+        """请求因 stream_options 被拒绝（旧版兼容接口返回 400 / 422）时记下该接口，返回是否应重试"""
+        if not options or getattr(error, 'status_code', None) not in (400, 422):
+            return False
+        self._no_usage_option.add(route.base_url)
+        return True
+
+    def _create_stream(self, route, messages):
+        """发起流式请求"""
+        options = self._stream_options(route)
+        kwargs = dict(messages=messages, model=route.model, stream=True,
+                      temperature=route.temperature, max_tokens=route.max_tokens)
+        try:
+            return self._client_for(route).chat.completions.create(**kwargs, **options)
+        except Exception as e:
+            if not self._reject_usage_option(route, options, e):
+                raise
+        return self._client_for(route).chat.completions.create(**kwargs)
+
+    async def _create_stream_async(self, route, messages):
+        """异步发起流式请求"""
+        options = self._stream_options(route)
+        kwargs = dict(messages=messages, model=route.model, stream=True,
+                      temperature=route.temperature, max_tokens=route.max_tokens)
+        try:
+            return await self._async_client_for(route).chat.completions.create(**kwargs, **options)
+        except Exception as e:
+            if not self._reject_usage_option(route, options, e):
+                raise
+        return await self._async_client_for(route).chat.completions.create(**kwargs)
+
+    def _chunk_events(self, chunk, parser, timer, usage):
+        """解析一个流式响应块并计数，块中没有内容时返回 None
+
+        接口返回的 token 用量写入本次请求的 usage 字典。
+        """
+        chunk_usage = getattr(chunk, 'usage', None)
+        if chunk_usage is not None:  # 部分接口在最后一块返回实际 token 数
+            usage['prompt_tokens'] = getattr(chunk_usage, 'prompt_tokens', None)
+            usage['completion_tokens'] = getattr(chunk_usage, 'completion_tokens', None)
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        # 部分接口把思考过程放在单独的字段中
+        reasoning = getattr(delta, 'reasoning_content', None) or getattr(delta, 'reasoning', None)
+        content = delta.content
+        if not content and not reasoning:
+            return None
+        timer.first_token()
+        timer.add_tokens()  # 流式接口通常每块一个 token
+        events = parser.feed_reasoning(reasoning) if reasoning else []
+        if content:
+            events += parser.feed(content)
+        return events
+
+    @staticmethod
+    def _error_message(error):
+        """请求出错时返回给用户的提示"""
+        error_msg = str(error)
+        if "Connection refused" in error_msg:
+            return "无法连接到 Ollama 服务。请确保 Ollama 正在运行。"
+        return f"获取 AI 响应时出错: {error_msg}"
+
+    def _finish(self, route, timer, messages, usage, timings, failed, cancelled=False):
+        """显示路由、首字时间和输出速度，返回本次请求的耗时明细
+
+        Args:
+            usage: 本次请求中接口返回的 token 用量
+            timings: 本次请求发出的 HTTP 请求的耗时记录（见 HttpTransport.track）
+        """
+        timer.finish(tokens=usage.get('completion_tokens'))
+        latency = timer.end_time - timer.start_time
+        self.router.record(route, latency, ttft=timer.ttft, error=failed)
+        
+        timing = timings[-1] if timings else None
+        prompt_tokens = usage.get('prompt_tokens')
+        turn = {
+            'route': route.name,
+            'model': route.model,
+            'connect': timing.connect_time if timing else None,
+            'ttfb': timing.ttfb if timing else None,
+            'ttft': timer.ttft,
+            'last_token': timer.last_token_time - timer.start_time if timer.last_token_time else None,
+            'total': latency,
+            'prompt_tokens': prompt_tokens or sum(estimate_tokens(m['content']) for m in messages),
+            'completion_tokens': timer.tokens,
+            'tokens_estimated': prompt_tokens is None,
+            'tokens_per_second': timer.tokens_per_second,
+            'failed': failed,
+            'cancelled': cancelled,
+        }
+        parts = [ROUTE_NAMES.get(route.name, route.name), route.model, f"{latency:.2f}秒"]
+        if timer.summary():
+            parts.append(timer.summary())
+        if cancelled:
+            parts.append("已取消")
+        if self.echo:
+            print(f"\033[2m[{' · '.join(parts)}]\033[0m")
+        return turn
+
+    def get_response(self, query, system_info, context="", route=None, turn=None):
+        """获取 AI 响应
+
+        Args:
+            query: 用户问题
+            system_info: 系统信息
+            context: 历史上下文
+            route: 路由名，None 表示根据问题自动判断
+            turn: 传入字典时，请求结束后写入本次请求的耗时明细（见 _finish），
+                并发的请求各自传入，互不影响
+        """
+        route = self.router.resolve(route or self.router.classify(query))
+        messages = self._build_messages(query, system_info, context)
+
+        timer = ThinkingTimer("AI 思考中", show=self.echo)
         timer.start()
+        usage = {}
+        failed = False
+        timings, tracking = self.transport.track()
 
         try:
             # 创建聊天完成
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model='deepseek-r1:14b',
-                stream=True,
-                temperature=0.7,
-                max_tokens=2000
-            )
+            chat_completion = self._create_stream(route, messages)
             
-            full_response = ""
-            is_thinking = False  # 标记是否在思考模式
-            thinking_buffer = ""  # 用于缓存思考内容
+            parser = ThinkStreamParser()
+            last_kind = None  # 最后显示在屏幕上的内容类型
             
             for chunk in chat_completion:
-                if chunk.choices:
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        if not full_response:  # 第一个响应时停止计时
-                            timer.stop()
-                            
-                        # 检查是否进入思考模式
-                        if '<think>' in content:
-                            is_thinking = True
-                            # 只保留 <think> 之前的内容
-                            before_think = content.split('<think>')[0]
-                            if before_think:
-                                print(before_think, end='', flush=True)
-                                full_response += before_think
-                            continue
-                            
-                        # 检查是否退出思考模式
-                        if '</think>' in content:
-                            is_thinking = False
-                            # 只保留 </think> 之后的内容
-                            after_think = content.split('</think>')[1]
-                            if after_think:
-                                print(after_think, end='', flush=True)
-                                full_response += after_think
-                            continue
-                            
-                        # 根据是否在思考模式决定是否输出
-                        if not is_thinking:
-                            print(content, end='', flush=True)
-                            full_response += content
-                        else:
-                            thinking_buffer += content  # 缓存思考内容
+                events = self._chunk_events(chunk, parser, timer, usage)
+                if events is not None:
+                    last_kind = self._render(events, timer, last_kind)
+            
+            self._render(parser.close(), timer, last_kind)
+            self.last_reasoning = parser.reasoning
+            full_response = parser.answer
             
             if not full_response:
+                failed = True
                 return "AI 没有返回有效响应。"
                 
-            print()  # 确保最后有换行
+            if self.echo:
+                print()  # 确保最后有换行
             return full_response
             
         except Exception as e:
-            timer.stop()
-            error_msg = str(e)
-            if "Connection refused" in error_msg:
-                return "无法连接到 Ollama 服务。请确保 Ollama 正在运行。"
-            return f"获取 AI 响应时出错: {error_msg}"
+            failed = True
+            timer.finish()
+            return self._error_message(e)
+        finally:
+            self.transport.untrack(tracking)
+            result = self._finish(route, timer, messages, usage, timings, failed)
+            if turn is not None:
+                turn.update(result)
+
+    async def get_response_async(self, query, system_info, context="", route=None, turn=None):
+        """异步获取 AI 响应（参数同 get_response）
+
+        在事件循环中流式读取，不阻塞提示符。任务被取消时立即关闭 HTTP 流，
+        不再等待模型生成完毕，并抛出 CancelledError。
+        """
+        route = self.router.resolve(route or self.router.classify(query))
+        messages = self._build_messages(query, system_info, context)
+
+        # 异步模式下等待状态显示在提示符右侧，计时器只统计首字时间和输出速度
+        timer = ThinkingTimer(show=False)
+        timer.start()
+        usage = {}
+        failed = False
+        cancelled = False
+        stream = None
+        # 耗时记录按任务区分，同一事件循环中并发的请求不会拿到彼此的记录
+        timings, tracking = self.transport.track()
+
+        try:
+            stream = await self._create_stream_async(route, messages)
+
+            parser = ThinkStreamParser()
+            last_kind = None
+
+            async for chunk in stream:
+                events = self._chunk_events(chunk, parser, timer, usage)
+                if events is not None:
+                    last_kind = self._render(events, timer, last_kind, flush=False)
+
+            self._render(parser.close(), timer, last_kind, flush=False)
+            self.last_reasoning = parser.reasoning
+            full_response = parser.answer
+
+            if not full_response:
+                failed = True
+                return "AI 没有返回有效响应。"
+
+            if self.echo:
+                print()
+            return full_response
+
+        except asyncio.CancelledError:
+            failed = cancelled = True
+            if self.echo:
+                print()
+            raise
+        except Exception as e:
+            failed = True
+            return self._error_message(e)
         finally:
-            timer.stop() 
\ No newline at end of file
+            if stream is not None:
+                try:
+                    await stream.close()  # 断开 HTTP 流，服务端随之停止生成
+                except Exception:
+                    pass
+            self.transport.untrack(tracking)
+            result = self._finish(route, timer, messages, usage, timings, failed, cancelled=cancelled)
+            if turn is not None:
+                turn.update(result)
@@ -0,0 +1,156 @@
+import re
+
+from ..core.runner import ANSI_ESCAPE_RE
+from .context import ContextBuilder, estimate_tokens
+
+# 合并“相似行”时忽略其中的数字（时间戳、PID、计数等）
+_DIGITS_RE = re.compile(r'\d+')
+_COLUMN_SPLIT_RE = re.compile(r'\s{2,}|\t')
+_NUMERIC_RE = re.compile(r'[\d.,:/%+-]+')
+
+# 看起来像错误或异常状态的行，发送给 AI 时优先保留（导入时编译一次）
+ERROR_PATTERNS = (
+    r'\berr(or)?s?\b', r'\bfail(ed|ure|ing)?\b', r'\bfatal\b', r'\bpanic\b', r'\bcritical\b',
+    r'\bexception\b', r'\btraceback\b', r'\bdenied\b', r'\brefused\b', r'\bunreachable\b',
+    r'\btimed? ?out\b', r'\bnot found\b', r'\bno such\b', r'\bcannot\b', r"\bcan't\b",
+    r'\bsegfault\b', r'\bsegmentation fault\b', r'\boom\b', r'out of memory', r'\bkilled\b',
+    r'\bwarn(ing)?\b', r'\bunhealthy\b', r'\bcrashloopbackoff\b', r'\bimagepullbackoff\b',
+    r'\berrimagepull\b', r'\bevicted\b', r'\bnotready\b', r'\bexited \([1-9]\d*\)',
+    r'\brestarting\b', r'\binactive\b', r'\bdead\b', r'\bdegraded\b',
+    r'错误', r'失败', r'异常', r'拒绝', r'超时',
+)
+ERROR_RE = re.compile('|'.join(ERROR_PATTERNS), re.IGNORECASE)
+
+
+class OutputCompactor:
+    """命令输出压缩
+
+    发送给 AI 之前压缩命令输出：
+    1. 去掉颜色等控制序列，连续的相同行或只有数字不同的相似行合并为一行并注明行数；
+    2. 表格输出（docker ps、kubectl get、pip list、ps aux 等）行数较多时只保留表头、
+       首尾几行和看起来有问题的行；
+    3. 仍超出 token 预算时，按“开头几行、错误行、结尾”的优先级挑选行，省略处注明行数。
+    """
+    def __init__(self, max_tokens=800, table_rows=40, head_rows=5, tail_rows=5, head_lines=10):
+        self.max_tokens = max_tokens
+        self.table_rows = table_rows  # 表格超过该行数时压缩
+        self.head_rows = head_rows
+        self.tail_rows = tail_rows
+        self.head_lines = head_lines  # 截断时优先保留的开头行数
+        self.last_stats = None  # 最近一次压缩前后的 token 数
+
+    def compact(self, text, max_tokens=None):
+        """压缩输出，结果不超过 max_tokens（默认 self.max_tokens）"""
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+        if not text:
+            self.last_stats = (0, 0)
+            return text
+        original_tokens = estimate_tokens(text)
+
+        lines = ANSI_ESCAPE_RE.sub('', text).splitlines()
+        lines = self.collapse(lines)
+        if self._is_table(lines):
+            lines = self.compact_table(lines)
+        if sum(estimate_tokens(line) + 1 for line in lines) > max_tokens:
+            lines = self.select_lines(lines, max_tokens)
+        result = '\n'.join(lines)
+
+        # 单行极长（如压缩过的 JSON）时仍可能超出预算
+        result = ContextBuilder.truncate_middle(result, max_tokens)
+        self.last_stats = (original_tokens, estimate_tokens(result))
+        return result
+
+    @staticmethod
+    def collapse(lines):
+        """合并连续的相同行，以及连续 3 行以上只有数字不同的相似行"""
+        result = []
+        run_start = 0
+        for i in range(1, len(lines) + 1):
+            if i < len(lines) and _DIGITS_RE.sub('#', lines[i]) == _DIGITS_RE.sub('#', lines[run_start]):
+                continue
+            count = i - run_start
+            first = lines[run_start]
+            if count > 1 and all(line == first for line in lines[run_start + 1:i]):
+                result.append(f"{first}  [重复 {count} 次]")
+            elif count >= 3:
+                result.append(f"{first}  [及相似的 {count - 1} 行，最后一行：{lines[i - 1].strip()}]")
+            else:
+                result += lines[run_start:i]
+            run_start = i
+        return result
+
+    def _is_table(self, lines):
+        """是否是行数较多的表格输出：首行为表头（不含纯数字的列），其余大部分行的列数不少于表头"""
+        rows = [line for line in lines if line.strip()]
+        if len(rows) <= self.table_rows:
+            return False
+        header = rows[0].split()
+        if len(header) < 2 or any(_NUMERIC_RE.fullmatch(field) for field in header):
+            return False
+        columns = max(len(_COLUMN_SPLIT_RE.split(rows[0].strip())), 2)
+        matched = sum(1 for row in rows[1:] if len(row.split()) >= columns - 1)
+        return matched >= 0.9 * (len(rows) - 1)
+
+    def compact_table(self, lines):
+        """表格只保留表头、首尾几行和有问题的行"""
+        header_end = 1
+        # pip list 等在表头下有一行分隔线
+        if len(lines) > 1 and set(lines[1].strip()) <= set('-=+| '):
+            header_end = 2
+        header, rows = lines[:header_end], lines[header_end:]
+        if len(rows) <= self.head_rows + self.tail_rows:
+            return lines
+
+        keep = set(range(self.head_rows)) | set(range(len(rows) - self.tail_rows, len(rows)))
+        keep.update(i for i, row in enumerate(rows) if ERROR_RE.search(row))
+        result = list(header)
+        result += self._with_gaps(rows, sorted(keep))
+        result.append(f"[表格共 {len(rows)} 行，保留 {len(keep)} 行：首尾各 {self.head_rows} 行及有问题的行]")
+        return result
+
+    def select_lines(self, lines, max_tokens):
+        """超出预算时挑选行：开头几行、错误行、结尾的连续行"""
+        budget = max_tokens - 20  # 为省略说明留出余量
+        costs = [estimate_tokens(line) + 1 for line in lines]
+        keep = set()
+
+        def take(i):
+            nonlocal budget
+            if i in keep:
+                return True
+            if costs[i] > budget:
+                return False
+            keep.add(i)
+            budget -= costs[i]
+            return True
+
+        for i in range(min(self.head_lines, len(lines))):
+            take(i)
+        # 结尾通常是结果和报错，先保留最后几行，再按出现顺序保留错误行，剩余预算继续向前补全结尾
+        tail_start = len(lines)
+        for i in range(len(lines) - 1, max(len(lines) - 1 - self.head_lines, -1), -1):
+            if not take(i):
+                break
+            tail_start = i
+        for i, line in enumerate(lines):
+            if ERROR_RE.search(line):
+                take(i)
+        for i in range(tail_start - 1, -1, -1):
+            if not take(i):
+                break
+        return self._with_gaps(lines, sorted(keep))
+
+    @staticmethod
+    def _with_gaps(lines, indexes):
+        """按原顺序输出选中的行，省略处注明行数"""
+        result = []
+        previous = -1
+        for i in indexes:
+            if i - previous > 1:
+                result.append(f"...（省略 {i - previous - 1} 行）...")
+            result.append(lines[i])
+            previous = i
+        if len(lines) - 1 - previous > 0:
+            result.append(f"...（省略 {len(lines) - 1 - previous} 行）...")
+        return result
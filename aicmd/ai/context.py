@@ -0,0 +1,119 @@
+import re
+
+# 中日韩文字及全角符号大约 1 个字符 1 个 token，其余文本大约 4 个字符 1 个 token
+_WIDE_CHAR_RE = re.compile('[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """快速估算文本的 token 数（无需加载分词器）"""
+    if not text:
+        return 0
+    wide = len(_WIDE_CHAR_RE.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+class ContextBuilder:
+    """按 token 预算组装 AI 上下文
+
+    单条输出先经 OutputCompactor 压缩（合并重复行、精简表格、保留错误行）到 max_output_tokens；
+    整体按“失败的命令优先、越新越优先”的顺序放入预算，最后按时间顺序输出。
+    """
+    def __init__(self, max_tokens=3000, max_output_tokens=800):
+        self.max_tokens = max_tokens
+        self.max_output_tokens = max_output_tokens
+        from .compactor import OutputCompactor
+        self.compactor = OutputCompactor(max_tokens=max_output_tokens)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """根据配置创建"""
+        return cls(
+            max_tokens=settings.get('context.max_tokens', 3000),
+            max_output_tokens=settings.get('context.max_output_tokens', 800),
+        )
+
+    def build(self, entries, title="历史命令和执行结果："):
+        """组装上下文
+
+        Args:
+            entries: 记录列表，按时间顺序排列。命令记录为包含 command / output /
+                error / exit_code 的字典，对话记录为字符串
+            title: 上下文标题
+
+        Returns:
+            str: 不超过 max_tokens 的上下文文本
+        """
+        if not entries:
+            return ""
+
+        blocks = [self._render(entry) for entry in entries]
+        budget = self.max_tokens - estimate_tokens(title)
+
+        # 失败的命令优先，其次越新越优先
+        order = sorted(
+            range(len(entries)),
+            key=lambda i: (not self._is_failed(entries[i]), -i)
+        )
+        selected = set()
+        for i in order:
+            cost = estimate_tokens(blocks[i]) + 1
+            if cost <= budget:
+                selected.add(i)
+                budget -= cost
+
+        parts = [title]
+        omitted = len(entries) - len(selected)
+        if omitted:
+            parts.append(f"（因长度限制省略了 {omitted} 条记录）")
+        for i in sorted(selected):
+            parts.append(blocks[i])
+            parts.append("---")
+        return "\n".join(parts)
+
+    def limit(self, text, max_tokens=None):
+        """压缩单段文本（见 OutputCompactor）"""
+        return self.compactor.compact(text, max_tokens)
+
+    def _render(self, entry):
+        """把单条记录渲染为文本"""
+        if not isinstance(entry, dict):
+            return self.limit(str(entry))
+
+        lines = [f"执行命令: {entry.get('command', '')}"]
+        if entry.get('exit_code') is not None:
+            lines.append(f"退出码: {entry['exit_code']}")
+        if entry.get('output'):
+            lines.append(f"命令输出:\n{self.limit(entry['output'])}")
+        if entry.get('error'):
+            lines.append(f"错误信息:\n{self.limit(entry['error'])}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _is_failed(entry):
+        """是否是执行失败的命令"""
+        if not isinstance(entry, dict):
+            return False
+        exit_code = entry.get('exit_code')
+        return bool(entry.get('error')) or (exit_code is not None and exit_code != 0)
+
+    @staticmethod
+    def truncate_middle(text, max_tokens):
+        """超出预算时保留开头和结尾（结尾通常包含结果和报错，多保留一些）"""
+        tokens = estimate_tokens(text)
+        if tokens <= max_tokens:
+            return text
+
+        # 按实际的字符/token 比例换算字符预算
+        max_chars = max(int(len(text) * max_tokens / tokens), 1)
+        head_chars = max_chars // 3
+        tail_chars = max_chars - head_chars
+
+        head = text[:head_chars]
+        tail = text[-tail_chars:]
+        # 尽量在行边界截断
+        if '\n' in head:
+            head = head[:head.rfind('\n')]
+        if '\n' in tail:
+            tail = tail[tail.find('\n') + 1:]
+        omitted = len(text) - len(head) - len(tail)
+        return f"{head}\n...（省略 {omitted} 个字符）...\n{tail}"
@@ -0,0 +1,161 @@
+import threading
+
+from ..prompts.base import AGENT_MODE_PREFIX
+
+# 模型配置：未配置的字段沿用 default，fast 默认与 default 使用同一模型，
+# 在 config.json 的 models.profiles.fast.model 中指定小模型后即可生效
+DEFAULT_PROFILES = {
+    'default': {
+        'model': 'deepseek-r1:14b',
+        'base_url': '',
+        'api_key': '',
+        'temperature': 0.7,
+        'max_tokens': 2000,
+    },
+    'fast': {
+        'temperature': 0.3,
+        'max_tokens': 800,
+    },
+}
+
+# 请求类型 -> 模型配置
+DEFAULT_ROUTES = {
+    'qa': 'default',  # 问答
+    'agent_step': 'default',  # Agent 模式下规划下一步
+    'analyze_output': 'default',  # 分析较长的命令输出
+    'analyze_small_output': 'fast',  # 分析较短的命令输出
+    'extract_command': 'fast',  # 从回答中提取命令
+}
+
+ROUTE_NAMES = {
+    'qa': '问答',
+    'agent_step': 'Agent 下一步',
+    'analyze_output': '输出分析',
+    'analyze_small_output': '短输出分析',
+    'extract_command': '命令提取',
+}
+
+
+class Route:
+    """一次请求使用的模型和接口"""
+    def __init__(self, name, profile, model, base_url, api_key, temperature, max_tokens):
+        self.name = name
+        self.profile = profile
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+
+class ModelRouter:
+    """按请求类型选择模型和接口
+
+    路由表和模型配置来自 config.json 的 models 节：
+        models.routes.<请求类型> = <配置名>
+        models.profiles.<配置名> = {model, base_url, api_key, temperature, max_tokens}
+        models.fast_output_chars = 命令输出不超过该长度时使用 analyze_small_output 路由
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.fast_output_chars = settings.get('models.fast_output_chars', 2000)
+        self._stats = {}  # 路由 -> {'count', 'total', 'ttft_total', 'ttft_count', 'errors'}
+        self._lock = threading.Lock()
+
+    def classify(self, query):
+        """调用方没有指定路由时判断请求类型（分析命令输出的请求由调用方用 output_route 指定）
+
+        Args:
+            query: 发送给 AI 的问题（Agent 模式下带有 AGENT_MODE_PREFIX）
+
+        Returns:
+            str: 路由名
+        """
+        return 'agent_step' if query.startswith(AGENT_MODE_PREFIX) else 'qa'
+
+    def output_route(self, output):
+        """分析命令输出的请求使用的路由（按发送给 AI 的输出长度）"""
+        return 'analyze_small_output' if len(output) <= self.fast_output_chars else 'analyze_output'
+
+    def resolve(self, route_name):
+        """获取路由对应的模型配置"""
+        routes = dict(DEFAULT_ROUTES)
+        routes.update(self.settings.get('models.routes', {}) or {})
+        profile_name = routes.get(route_name, 'default')
+
+        profile = dict(DEFAULT_PROFILES['default'])
+        profile.update(self.settings.get('models.profiles.default', {}) or {})
+        if profile_name != 'default':
+            profile.update(DEFAULT_PROFILES.get(profile_name, {}))
+            profile.update(self.settings.get(f'models.profiles.{profile_name}', {}) or {})
+
+        return Route(
+            name=route_name,
+            profile=profile_name,
+            model=profile['model'],
+            base_url=profile['base_url'] or self._default_base_url(),
+            api_key=profile['api_key'] or self.settings.get('api.key') or 'ollama',
+            temperature=profile['temperature'],
+            max_tokens=profile['max_tokens'],
+        )
+
+    def _default_base_url(self):
+        """由 api.base_url 推导 OpenAI 兼容接口地址"""
+        base_url = (self.settings.get('api.base_url') or '').rstrip('/')
+        if not base_url:
+            return 'http://localhost:11434/v1/'
+        # 配置向导默认写入 Ollama 原生接口地址，对应的 OpenAI 兼容接口为 /v1
+        for suffix in ('/api/generate', '/api/chat'):
+            if base_url.endswith(suffix):
+                return base_url[:-len(suffix)] + '/v1/'
+        if base_url.endswith('/chat/completions'):
+            base_url = base_url[:-len('/chat/completions')]
+        return base_url + '/'
+
+    def record(self, route, latency, ttft=None, error=False):
+        """记录一次请求的耗时"""
+        with self._lock:
+            stats = self._stats.setdefault(route.name, {
+                'model': route.model,
+                'count': 0,
+                'total': 0.0,
+                'ttft_total': 0.0,
+                'ttft_count': 0,
+                'errors': 0,
+            })
+            stats['model'] = route.model
+            stats['count'] += 1
+            stats['total'] += latency
+            if ttft is not None:
+                stats['ttft_total'] += ttft
+                stats['ttft_count'] += 1
+            if error:
+                stats['errors'] += 1
+
+    def stats(self):
+        """各路由的请求次数和平均耗时"""
+        with self._lock:
+            result = {}
+            for name, s in self._stats.items():
+                result[name] = {
+                    'model': s['model'],
+                    'count': s['count'],
+                    'errors': s['errors'],
+                    'avg_latency': s['total'] / s['count'],
+                    'avg_ttft': s['ttft_total'] / s['ttft_count'] if s['ttft_count'] else None,
+                }
+            return result
+
+    def report(self):
+        """生成各路由耗时报告"""
+        stats = self.stats()
+        if not stats:
+            return "暂无 AI 请求记录"
+        lines = [f"{'路由':<16}{'模型':<24}{'次数':>6}{'平均耗时':>10}{'平均首字':>10}"]
+        for name, s in stats.items():
+            ttft = f"{s['avg_ttft']:.2f}秒" if s['avg_ttft'] is not None else '-'
+            lines.append(
+                f"{ROUTE_NAMES.get(name, name):<16}{s['model']:<24}{s['count']:>6}"
+                f"{s['avg_latency']:>9.2f}秒{ttft:>10}"
+            )
+        return "\n".join(lines)
@@ -1,15 +1,49 @@
+import codecs
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import quote_plus
 import re
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+import threading
 import time
 
+from ..utils.cache import DiskCache
+from ..utils.html_text import TextExtractor
+
+# 可以提取正文的内容类型
+_PAGE_TYPE_RE = re.compile(r'text/html|application/xhtml|text/plain', re.IGNORECASE)
+
 class SearchEngine:
-    """网络搜索引擎"""
-    def __init__(self):
+    """网络搜索引擎
+
+    同时查询多个来源并抓取结果页面，凑够结果或到达总时限即返回（见 search）。
+    所有请求共用一个带连接池的 requests.Session（保持长连接），页面抓取使用常驻的线程池。
+    搜索结果页和网页内容分别缓存（内存 LRU + 磁盘，各自的有效期）；缓存过期后带上
+    ETag / Last-Modified 发送条件请求，服务器返回 304 时直接沿用缓存并刷新有效期，
+    网络出错时退回过期的缓存。
+    """
+    # 搜索来源，对应 _search_<name> 方法
+    SOURCES = ('duckduckgo', 'segmentfault', 'csdn')
+
+    def __init__(self, cache_dir=None, use_cache=True, serp_ttl=3600, page_ttl=86400, workers=6,
+                 deadline=8.0, max_page_bytes=256 * 1024, content_chars=1000):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(10, workers))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        cache_dir = Path(cache_dir) if cache_dir else Path.home() / '.aicmd' / 'search_cache'
+        self.use_cache = use_cache
+        self.serp_cache = DiskCache(cache_dir / 'serp', max_entries=200, ttl=serp_ttl, memory_entries=32)
+        self.page_cache = DiskCache(cache_dir / 'pages', max_entries=1000, ttl=page_ttl, memory_entries=128)
         # 可信域名列表
         self.trusted_domains = {
             'stackoverflow.com': 0.9,
@@ -33,50 +67,176 @@ class SearchEngine:
         }
         self.max_results = 5
         self.timeout = 10
+        self.deadline = deadline  # 一次搜索的总时限（秒）
+        self.max_page_bytes = max_page_bytes  # 每个网页最多下载的字节数
+        self.content_chars = content_chars  # 每个网页保留的正文字符数
+
+    @classmethod
+    def from_settings(cls, settings):
+        """根据配置创建"""
+        return cls(
+            use_cache=settings.get('search.cache_enabled', True),
+            serp_ttl=settings.get('search.serp_ttl', 3600),
+            page_ttl=settings.get('search.page_ttl', 86400),
+            workers=settings.get('search.workers', 6),
+            deadline=settings.get('search.deadline', 8.0),
+            max_page_bytes=settings.get('search.max_page_bytes', 256 * 1024),
+        )
 
-    def search(self, query):
+    @property
+    def pool(self):
+        """抓取页面的常驻线程池（首次使用时创建）"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='aicmd-search')
+            return self._pool
+
+    def close(self):
+        """关闭连接池和线程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+        self.session.close()
+
+    def search(self, query, sources=None, want=None, deadline=None):
         """执行搜索
+
+        同时查询多个来源（DuckDuckGo、SegmentFault、CSDN），每得到一条候选结果就立即
+        抓取页面内容；凑够 want 条有内容的结果或到达总时限 deadline 后立即返回，
+        尚未开始的抓取会被取消（已开始的在后台完成，结果写入缓存供下次使用）。
         
         Args:
             query: 搜索查询字符串
+            sources: 使用的来源名称列表，None 表示全部（见 SOURCES）
+            want: 需要的结果数，默认 self.max_results
+            deadline: 总时限（秒），默认 self.deadline
             
         Returns:
-            list: 搜索结果列表，每个结果包含 url, title, content 和 credibility
+            list: 搜索结果列表，每个结果包含 url, title, snippet, content, credibility 和 source，
+                按可信度排序
         """
+        want = want or self.max_results
+        end = time.monotonic() + (deadline or self.deadline)
+        pending = {}
+        for name in sources or self.SOURCES:
+            pending[self.pool.submit(getattr(self, f"_search_{name}"), query)] = ('source', name)
+
+        results = []
+        seen = set()
         try:
-            # 构建搜索 URL
-            search_url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
-            
-            # 发送请求
-            response = requests.get(search_url, headers=self.headers, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # 解析结果
-            results = self._parse_results(response.text)
-            
-            # 并行获取页面内容
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                futures = [
-                    executor.submit(self._fetch_content, result)
-                    for result in results[:self.max_results]
-                ]
-                
-                detailed_results = []
-                for future in futures:
+            while pending and len(results) < want:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, name = pending.pop(future)
                     try:
-                        result = future.result(timeout=self.timeout)
-                        if result:
-                            detailed_results.append(result)
+                        value = future.result()
                     except Exception as e:
-                        print(f"获取页面内容时出错: {str(e)}")
-            
-            # 按可信度排序
-            detailed_results.sort(key=lambda x: x.get('credibility', 0), reverse=True)
-            return detailed_results
+                        print(f"搜索 {name} 时出错: {str(e)}")
+                        continue
+                    if kind == 'source':
+                        # 来源返回了候选结果：去重后逐条抓取页面内容
+                        for candidate in value:
+                            if candidate['url'] in seen or candidate['credibility'] <= 0:
+                                continue
+                            seen.add(candidate['url'])
+                            candidate['source'] = name
+                            pending[self.pool.submit(self._fetch_content, candidate)] = ('page', candidate['url'])
+                    elif value:
+                        results.append(value)
+        finally:
+            for future in pending:
+                future.cancel()
 
-        except Exception as e:
-            print(f"搜索时出错: {str(e)}")
-            return []
+        # 按可信度排序（相同可信度时先返回的在前）
+        results.sort(key=lambda x: x.get('credibility', 0), reverse=True)
+        return results[:want]
+
+    def _search_duckduckgo(self, query):
+        """DuckDuckGo 候选结果"""
+        search_url = f"https://html.duckduckgo.com/html/?q={quote_plus(query)}"
+        html = self._get(search_url, self.serp_cache)
+        return self._parse_results(html)
+
+    def _search_segmentfault(self, query):
+        """SegmentFault 候选结果"""
+        from ..network.network_query import search_segmentfault
+        return self._from_network_query(search_segmentfault(query, self.session, self.timeout))
+
+    def _search_csdn(self, query):
+        """CSDN 候选结果"""
+        from ..network.network_query import search_csdn
+        return self._from_network_query(search_csdn(query, self.session, self.timeout))
+
+    def _from_network_query(self, items):
+        """把 network_query 的结果（title / link / summary）转换为统一格式"""
+        results = []
+        for item in items[:self.max_results]:
+            if not item.get('link'):
+                continue
+            results.append({
+                'url': item['link'],
+                'title': item.get('title', ''),
+                'snippet': item.get('summary', ''),
+                'credibility': self._calculate_credibility(item['link']),
+            })
+        return results
+
+    def _get(self, url, cache, reader=None):
+        """GET 请求，带缓存和条件请求
+
+        Args:
+            url: 请求地址
+            cache: 使用的 DiskCache
+            reader: 读取响应的函数 reader(response)，指定时以流式请求，由 reader 决定读取
+                多少内容（如提取正文）；None 表示读取并缓存完整的响应文本
+
+        Returns:
+            str: 响应文本（或 reader 的结果）
+        """
+        entry = cache.get_entry(url) if self.use_cache else None
+        if cache.is_fresh(entry):
+            cache.hits += 1
+            return entry['value']
+        cache.misses += 1
+
+        headers = {}
+        meta = (entry or {}).get('meta') or {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=reader is not None)
+            try:
+                if response.status_code == 304 and entry is not None:
+                    cache.touch(url)  # 内容未变化，刷新有效期
+                    return entry['value']
+                response.raise_for_status()
+                value = reader(response) if reader else response.text
+            finally:
+                response.close()  # 未读完的流式响应不放回连接池
+        except requests.RequestException:
+            if entry is not None:
+                return entry['value']  # 网络出错时使用过期的缓存
+            raise
+
+        if self.use_cache:
+            cache.set(url, value, meta={
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            })
+        return value
+
+    def cache_report(self):
+        """缓存统计文本"""
+        serp, page = self.serp_cache, self.page_cache
+        return (f"搜索缓存：结果页命中 {serp.hits} 次，未命中 {serp.misses} 次；"
+                f"网页命中 {page.hits} 次，未命中 {page.misses} 次")
 
     def _parse_results(self, html):
         """解析搜索结果页面
@@ -119,25 +279,40 @@ class SearchEngine:
             dict: 包含详细内容的结果
         """
         try:
-            response = requests.get(
-                result['url'], 
-                headers=self.headers, 
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            
-            # 提取正文内容（简单实现，可以使用更复杂的算法）
-            content = re.sub(r'<[^>]+>', ' ', response.text)
-            content = re.sub(r'\s+', ' ', content).strip()
-            content = content[:1000]  # 限制长度
-            
-            result['content'] = content
+            result['content'] = self._get(result['url'], self.page_cache, self._read_page)
             return result
             
         except Exception as e:
             print(f"获取 {result['url']} 的内容时出错: {str(e)}")
             return None
 
+    def _read_page(self, response):
+        """流式读取网页并提取正文
+
+        不是网页的内容（PDF、图片、压缩包等）直接放弃；边下载边提取，读到 max_page_bytes
+        或回答 / 代码内容已经足够时停止下载。
+        """
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not _PAGE_TYPE_RE.search(content_type):
+            raise ValueError(f"不是网页（{content_type.split(';')[0]}）")
+
+        charset = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        extractor = TextExtractor(limit=self.content_chars)
+        received = 0
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if received >= self.max_page_bytes or extractor.full:
+                break
+        extractor.feed(decoder.decode(b'', final=True))
+        extractor.close()
+        return extractor.text()
+
     def _calculate_credibility(self, url):
         """计算 URL 的可信度
         
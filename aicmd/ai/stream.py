@@ -0,0 +1,94 @@
+class ThinkStreamParser:
+    """<think> 标签的流式解析器
+
+    状态机逐块处理模型输出，把内容分为回答（answer）和思考过程（think）两类。
+    标签可能被拆分在相邻的两个块中，因此块尾可能是标签开头的部分会暂存到下一块再判断。
+    内容用列表累积，避免反复拼接字符串。
+    """
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self.thinking = False
+        self._pending = ''
+        self._answer = []
+        self._reasoning = []
+
+    def feed(self, chunk):
+        """处理一块输出
+
+        Args:
+            chunk: 模型返回的文本片段
+
+        Returns:
+            list: (类型, 文本) 列表，类型为 'answer' 或 'think'
+        """
+        if not chunk:
+            return []
+        if not self._pending and '<' not in chunk:
+            # 常见情况：块中不可能包含标签
+            if self.thinking:
+                self._reasoning.append(chunk)
+                return [('think', chunk)]
+            self._answer.append(chunk)
+            return [('answer', chunk)]
+
+        data = self._pending + chunk if self._pending else chunk
+        self._pending = ''
+        events = []
+        pos = 0
+        while True:
+            tag = self.CLOSE_TAG if self.thinking else self.OPEN_TAG
+            index = data.find(tag, pos)
+            if index == -1:
+                keep = self._partial_tag_length(data, tag, pos)
+                end = len(data) - keep
+                self._emit(events, data[pos:end])
+                self._pending = data[end:]
+                return events
+            self._emit(events, data[pos:index])
+            pos = index + len(tag)
+            self.thinking = not self.thinking
+
+    def feed_reasoning(self, text):
+        """处理接口单独返回的思考内容（如 reasoning_content 字段）"""
+        if not text:
+            return []
+        self._reasoning.append(text)
+        return [('think', text)]
+
+    def close(self):
+        """输出结束：把暂存的内容按当前状态输出"""
+        events = []
+        if self._pending:
+            self._emit(events, self._pending)
+            self._pending = ''
+        return events
+
+    @property
+    def answer(self):
+        """回答内容（不含思考过程）"""
+        return ''.join(self._answer)
+
+    @property
+    def reasoning(self):
+        """思考过程"""
+        return ''.join(self._reasoning)
+
+    def _emit(self, events, text):
+        if not text:
+            return
+        if self.thinking:
+            self._reasoning.append(text)
+            events.append(('think', text))
+        else:
+            self._answer.append(text)
+            events.append(('answer', text))
+
+    @staticmethod
+    def _partial_tag_length(data, tag, start):
+        """data 结尾与 tag 开头重合的最大长度（不含完整的 tag）"""
+        for length in range(min(len(tag) - 1, len(data) - start), 0, -1):
+            if data.endswith(tag[:length]):
+                return length
+        return 0
@@ -0,0 +1,206 @@
+import contextvars
+import threading
+import time
+from collections import deque
+
+_transport = None
+_transport_lock = threading.Lock()
+# 当前任务（线程）中正在收集的耗时记录列表，见 HttpTransport.track
+_tracked_timings = contextvars.ContextVar('aicmd_tracked_timings', default=None)
+
+
+def _import_httpx():
+    """导入 httpx（新版 openai 改为依赖 httpx2）"""
+    try:
+        import httpx
+    except ImportError:
+        import httpx2 as httpx
+    return httpx
+
+
+class RequestTiming:
+    """单次 HTTP 请求的耗时记录"""
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.start = time.perf_counter()
+        self.connect_time = None  # 建立连接耗时（TCP + TLS），复用连接时为 None
+        self.ttfb = None  # 从开始发送请求到收到响应头的耗时
+        self.status_code = None
+        self._connect_start = None
+        self._send_start = None
+
+    @property
+    def reused(self):
+        """是否复用了已有连接"""
+        return self.connect_time is None
+
+    def trace(self, event, info):
+        """httpcore 跟踪回调，记录连接和首字节时间"""
+        now = time.perf_counter()
+        if event == 'connection.connect_tcp.started':
+            self._connect_start = now
+        elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+            if self._connect_start is not None:
+                self.connect_time = now - self._connect_start
+        elif event.endswith('send_request_headers.started'):
+            self._send_start = now
+        elif event.endswith('receive_response_headers.complete'):
+            self.ttfb = now - (self._send_start or self.start)
+
+    async def atrace(self, event, info):
+        """异步客户端使用的跟踪回调"""
+        self.trace(event, info)
+
+    def summary(self):
+        """简短的耗时描述"""
+        parts = ["复用连接" if self.reused else f"建连 {self.connect_time:.3f}秒"]
+        if self.ttfb is not None:
+            parts.append(f"首字节 {self.ttfb:.3f}秒")
+        return "，".join(parts)
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'method': self.method,
+            'url': self.url,
+            'status_code': self.status_code,
+            'connect_time': self.connect_time,
+            'ttfb': self.ttfb,
+            'reused': self.reused,
+        }
+
+
+class HttpTransport:
+    """共享的 HTTP 连接池
+
+    长连接复用、限制连接数，并为连接、读取分别设置超时。ChatManager 和
+    Settings.validate_api 共用同一个实例，连续的对话不再重复建立连接。
+    每个请求的建连耗时和首字节时间记录在 timings 中；需要某次调用自己发出的请求的记录时
+    用 track() 收集（按 asyncio 任务和线程区分，并发的调用互不影响）。
+    """
+    def __init__(self, connect_timeout=5.0, read_timeout=120.0, max_connections=10,
+                 max_keepalive_connections=5, keepalive_expiry=60.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timings = deque(maxlen=100)
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """根据配置创建"""
+        return cls(
+            connect_timeout=settings.get('network.connect_timeout', 5.0),
+            read_timeout=settings.get('network.read_timeout', 120.0),
+            max_connections=settings.get('network.max_connections', 10),
+            max_keepalive_connections=settings.get('network.max_keepalive_connections', 5),
+            keepalive_expiry=settings.get('network.keepalive_expiry', 60.0),
+        )
+
+    @property
+    def last_timing(self):
+        """最近一次请求的耗时记录"""
+        return self.timings[-1] if self.timings else None
+
+    def track(self):
+        """开始收集当前任务（线程）中此后发出的请求的耗时记录
+
+        Returns:
+            tuple: (耗时记录列表, 传给 untrack 的令牌)
+        """
+        timings = []
+        return timings, _tracked_timings.set(timings)
+
+    def untrack(self, token):
+        """停止收集"""
+        _tracked_timings.reset(token)
+
+    @property
+    def client(self):
+        """同步 HTTP 客户端（首次使用时创建）"""
+        with self._lock:
+            if self._client is None:
+                httpx = _import_httpx()
+                self._client = httpx.Client(
+                    limits=self._limits(httpx),
+                    timeout=self._timeout(httpx),
+                    event_hooks={'request': [self._on_request], 'response': [self._on_response]},
+                )
+            return self._client
+
+    @property
+    def async_client(self):
+        """异步 HTTP 客户端（首次使用时创建，与同步客户端配置相同）"""
+        with self._lock:
+            if self._async_client is None:
+                httpx = _import_httpx()
+                self._async_client = httpx.AsyncClient(
+                    limits=self._limits(httpx),
+                    timeout=self._timeout(httpx),
+                    event_hooks={'request': [self._on_request_async], 'response': [self._on_response_async]},
+                )
+            return self._async_client
+
+    def _limits(self, httpx):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _timeout(self, httpx):
+        return httpx.Timeout(
+            self.read_timeout,
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+        )
+
+    def _on_request(self, request):
+        """请求发出前：挂上耗时记录和跟踪回调"""
+        timing = RequestTiming(request.method, str(request.url))
+        request.extensions['trace'] = timing.trace
+        request.extensions['aicmd_timing'] = timing
+        self.timings.append(timing)
+        tracked = _tracked_timings.get()
+        if tracked is not None:
+            tracked.append(timing)
+
+    async def _on_request_async(self, request):
+        self._on_request(request)
+        request.extensions['trace'] = request.extensions['aicmd_timing'].atrace
+
+    async def _on_response_async(self, response):
+        self._on_response(response)
+
+    def _on_response(self, response):
+        """收到响应头后：补全首字节时间和状态码"""
+        timing = response.request.extensions.get('aicmd_timing')
+        if timing is not None:
+            timing.status_code = response.status_code
+            if timing.ttfb is None:
+                timing.ttfb = time.perf_counter() - timing.start
+
+    def close(self):
+        """关闭同步连接池（异步连接池随事件循环结束）"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            self._async_client = None
+
+
+def get_transport(settings=None):
+    """获取进程内共享的 HttpTransport"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            if settings is None:
+                from ..config.settings import Settings
+                settings = Settings()
+            _transport = HttpTransport.from_settings(settings)
+        return _transport
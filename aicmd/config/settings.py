@@ -2,9 +2,7 @@ import os
 import json
 from pathlib import Path
 from colorama import Fore, Style, init
-import openai
 import time
-import requests
 
 # 初始化 colorama
 init()
@@ -20,11 +18,57 @@ class Settings:
             },
             'display': {
                 'emoji_support': True,
-                'color_support': True
+                'color_support': True,
+                'show_thinking': False  # 是否显示模型的思考过程（<think> 内容）
             },
             'history': {
                 'max_entries': 1000,
                 'save_file': True
+            },
+            'context': {
+                'max_tokens': 3000,  # 发送给 AI 的历史上下文 token 上限
+                'max_output_tokens': 800  # 单条命令输出的 token 上限
+            },
+            'network': {
+                'connect_timeout': 5.0,  # 建立连接超时（秒）
+                'read_timeout': 120.0,  # 读取超时（秒），推理模型首字节可能较慢
+                'max_connections': 10,
+                'max_keepalive_connections': 5,
+                'keepalive_expiry': 60.0  # 空闲连接保留时间（秒）
+            },
+            'models': {
+                'fast_output_chars': 2000,  # 命令输出不超过该长度时使用 fast 模型分析
+                'routes': {},  # 请求类型 -> 模型配置名，见 aicmd/ai/router.py
+                'profiles': {}  # 模型配置名 -> {model, base_url, api_key, temperature, max_tokens}
+            },
+            'cache': {
+                'enabled': True,  # 问答模式的回答缓存
+                'max_entries': 200,
+                'ttl': 86400  # 缓存有效期（秒）
+            },
+            'metrics': {
+                'enabled': True,  # 把每轮对话和命令的耗时追加到 metrics.jsonl
+                'file': ''  # 默认 ~/.aicmd/metrics.jsonl
+            },
+            'fanout': {
+                'hosts_file': '',  # 主机列表，默认 ~/.aicmd/hosts，每行一个主机
+                'workers': 20,  # 同时连接的主机数
+                'timeout': 60.0,  # 单台主机的超时（秒）
+                'command_template': []  # 连接命令，默认 ssh -o BatchMode=yes {host} {command}
+            },
+            'search': {
+                'cache_enabled': True,  # 缓存搜索结果页和网页内容（~/.aicmd/search_cache）
+                'serp_ttl': 3600,  # 搜索结果页缓存有效期（秒）
+                'page_ttl': 86400,  # 网页内容缓存有效期（秒）
+                'workers': 6,  # 同时进行的搜索和网页抓取数
+                'deadline': 8.0,  # 一次搜索的总时限（秒），到时返回已得到的结果
+                'max_page_bytes': 262144  # 每个网页最多下载的字节数
+            },
+            'completion': {
+                'fuzzy': True,  # 模糊匹配（关闭后只做前缀匹配）
+                'while_typing': False,  # 边输入边补全（开启后上箭头不再按前缀搜索历史）
+                'budget_ms': 30,  # 每次补全的时间预算（毫秒），超时返回已找到的结果
+                'max_results': 50
             }
         }
         self.load_config()
@@ -32,6 +76,8 @@ class Settings:
     def validate_api(self, api_key, base_url):
         """验证 API 配置是否可用"""
         try:
+            from ..ai.transport import get_transport
+            
             print(f"\n{Fore.YELLOW}正在验证 API 配置...{Style.RESET_ALL}")
             
             headers = {
@@ -50,8 +96,10 @@ class Settings:
                 "max_tokens": 10
             }
             
+            # 使用与 ChatManager 共享的连接池，验证时建立的连接后续可直接复用
+            transport = get_transport(self)
             start_time = time.time()
-            response = requests.post(
+            response = transport.client.post(
                 base_url,
                 json=payload,
                 headers=headers
@@ -59,8 +107,10 @@ class Settings:
             
             response.raise_for_status()
             latency = time.time() - start_time
+            timing = transport.last_timing
+            detail = f"（{timing.summary()}）" if timing else ""
             
-            print(f"{Fore.GREEN}✓ API 连接成功！延迟: {latency:.2f}秒{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}✓ API 连接成功！延迟: {latency:.2f}秒{detail}{Style.RESET_ALL}")
             return True
             
         except Exception as e:
@@ -136,10 +186,12 @@ class Settings:
             return False
             
     def check_api_config(self):
-        """检查 API 配置是否完整"""
-        api_key = self.get('api.key')
-        base_url = self.get('api.base_url')
-        return bool(api_key and base_url)
+        """检查 API 配置是否完整
+
+        只要求接口地址：Ollama 等本地接口不需要 API Key（配置向导写入空的 api.key），
+        请求时由 ModelRouter 补上占位的 Key。
+        """
+        return bool(self.get('api.base_url'))
 
     def clear_api_config(self):
         """清除 API 配置"""
@@ -1,6 +1,18 @@
-# 核心模块初始化
-from .assistant import Assistant
-from .command import CommandExecutor
-from .terminal import Terminal
+# 核心模块初始化（按需导入，减少启动耗时）
+import importlib
 
-__all__ = ['Assistant', 'CommandExecutor', 'Terminal'] 
\ No newline at end of file
+_LAZY_ATTRS = {
+    'Assistant': '.assistant',
+    'CommandExecutor': '.command',
+    'Terminal': '.terminal',
+}
+
+__all__ = ['Assistant', 'CommandExecutor', 'Terminal']
+
+
+def __getattr__(name):
+    """首次访问时才导入对应模块"""
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
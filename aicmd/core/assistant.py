@@ -3,25 +3,71 @@ import sys
 import json
 import platform
 import time
-from .terminal import Terminal
+from .base import BaseTerminal
 from .command import CommandExecutor
-from ..ai.chat import ChatManager
-from ..ai.search import SearchEngine
+from .fanout import FanoutExecutor
+from .policy import get_policy
+from ..ai.context import ContextBuilder
+from ..config.settings import Settings
+from ..prompts.base import AGENT_MODE_PREFIX
+from ..ai.cache import ResponseCache
+from ..utils.metrics import get_metrics
 
 class Assistant:
     """aiCMD主控制器"""
-    def __init__(self, agent_mode=False):
+    def __init__(self, agent_mode=False, use_cache=True, headless=False, hosts_file=None):
+        """
+        Args:
+            agent_mode: 是否为 Agent 模式
+            use_cache: 是否使用问答缓存
+            headless: 无交互终端（批量模式）：不创建 prompt_toolkit 会话，不保留对话上下文
+            hosts_file: 多主机执行（@ 命令）的主机列表文件，默认 ~/.aicmd/hosts
+        """
         try:
             self.agent_mode = agent_mode
+            self.echo = True  # 是否在屏幕上显示回答
+            self.keep_context = not headless  # 批量模式下各问题相互独立
             # 初始化各个组件
-            self.terminal = Terminal(callback=self.handle_ai_query)
+            if headless:
+                self.terminal = BaseTerminal(callback=self.handle_ai_query, agent_mode=agent_mode)
+            else:
+                from .terminal import Terminal
+                self.terminal = Terminal(callback=self.handle_ai_query)
             self.executor = CommandExecutor()
-            self.chat = ChatManager()
-            self.search = SearchEngine()
+            
+            # AI 对话和搜索组件按需创建，避免启动时加载 openai / requests
+            self._chat = None
+            self._search = None
             
             # 历史记录
             self.command_history = []
             self.context = []
+            self.settings = Settings()
+            self.context_builder = ContextBuilder.from_settings(self.settings)
+            self.terminal.configure_completion(self.settings)
+            
+            # 问答模式的回答缓存（问题以 ! 开头时跳过缓存）
+            self.response_cache = ResponseCache.from_settings(self.settings, enabled=use_cache)
+            
+            # 每轮对话和每条命令的耗时统计（/stats 查看）
+            self.metrics = get_metrics(self.settings)
+            
+            # 终端中执行的命令结果也记入上下文
+            self.terminal.on_result = self.record_result
+            # 支持事件循环的终端在后台任务中请求 AI，提示符不被阻塞
+            self.terminal.async_callback = self.handle_ai_query_async
+            # Agent 模式下分析命令输出的请求按输出长度选择路由
+            self.terminal.output_route = self.output_route
+            # 以 @ 开头的命令通过 ssh 在多台主机上执行
+            self.terminal.fanout = FanoutExecutor.from_settings(self.settings, hosts_file=hosts_file)
+            
+            # 内置命令（以 / 开头输入，不发送给 AI）：命令名 -> (处理函数, 可接受的参数)
+            self.builtin_commands = {
+                'routes': (self.show_routes, ()),
+                'cache': (self.show_cache, ('clear',)),
+                'think': (self.toggle_thinking, ()),
+                'stats': (self.show_stats, ()),
+            }
             
             # 系统信息
             self.environment_info = self.collect_system_info()
@@ -30,6 +76,23 @@ class Assistant:
             print(f"初始化失败: {str(e)}")
             raise
 
+    @property
+    def chat(self):
+        """AI 对话管理器（首次使用时创建）"""
+        if self._chat is None:
+            from ..ai.chat import ChatManager
+            self._chat = ChatManager(settings=self.settings)
+            self._chat.echo = self.echo
+        return self._chat
+
+    @property
+    def search(self):
+        """网络搜索引擎（首次使用时创建）"""
+        if self._search is None:
+            from ..ai.search import SearchEngine
+            self._search = SearchEngine.from_settings(self.settings)
+        return self._search
+
     def run(self):
         """运行主循环"""
         try:
@@ -68,91 +131,262 @@ class Assistant:
             if stderr:
                 print(stderr, file=sys.stderr)
 
-    def handle_ai_query(self, query):
-        """处理 AI 查询"""
+    def record_result(self, result):
+        """记录终端中执行的命令结果"""
+        self.context.append({
+            "command": result.command,
+            "output": result.output,
+            "error": "",
+            "exit_code": result.exit_code
+        })
+        self.metrics.record_command(result, source='terminal')
+
+    def show_routes(self, args=''):
+        """显示各模型路由的请求次数和耗时"""
+        if self._chat is None:
+            print("暂无 AI 请求记录")
+            return
+        print(self.chat.router.report())
+
+    def show_cache(self, args=''):
+        """显示回答缓存统计，/cache clear 清空缓存"""
+        if args == 'clear':
+            self.response_cache.clear()
+            print("回答缓存已清空")
+            return
+        print(self.response_cache.report())
+
+    def show_stats(self, args=''):
+        """显示本次会话的 AI 对话和命令耗时统计"""
+        print(self.metrics.report())
+
+    def toggle_thinking(self, args=''):
+        """切换是否显示模型的思考过程"""
+        self.chat.show_thinking = not self.chat.show_thinking
+        print("已开启思考过程显示" if self.chat.show_thinking else "已隐藏思考过程")
+
+    def handle_builtin(self, query):
+        """处理内置命令，返回是否已处理
+
+        只有整个输入就是内置命令（最多带一个已知参数）时才处理，
+        /cache 失效怎么排查 这样以命令名开头的问题照常发给 AI。
+        """
+        name, _, args = query.strip().partition(' ')
+        args = args.strip()
+        builtin = self.builtin_commands.get(name)
+        if builtin is None:
+            return False
+        handler, known_args = builtin
+        if args and args not in known_args:
+            return False
+        handler(args)
+        return True
+
+    def output_route(self, output):
+        """分析命令输出的请求使用的路由（见 ModelRouter.output_route）"""
+        return self.chat.router.output_route(output)
+
+    def handle_ai_query(self, query, route=None):
+        """处理 AI 查询（route 为请求使用的路由名，None 表示根据问题自动判断）"""
+        if self.handle_builtin(query):
+            return
         try:
-            context = self._build_full_context()
-            
-            if self.agent_mode:
-                query = f"[AGENT_MODE] {query}"
-            
-            response = self.chat.get_response(
-                query,
-                self.environment_info,
-                context
-            )
-            
+            self.answer(query, route=route)
+        except Exception as e:
+            print(f"AI 查询失败: {str(e)}")
+
+    async def handle_ai_query_async(self, query, route=None):
+        """异步处理 AI 查询（终端事件循环中使用，可被取消）"""
+        if self.handle_builtin(query):
+            return
+        try:
+            await self.answer_async(query, route=route)
+        except Exception as e:
+            print(f"AI 查询失败: {str(e)}")
+
+    def answer(self, query, route=None):
+        """回答一个问题（不处理内置命令）
+
+        Returns:
+            dict: 问题、回答、建议的命令、是否来自缓存、是否失败和本轮耗时明细
+        """
+        query, prepared, cacheable, response = self._lookup_cache(query)
+        turn = None
+        if response is None:
+            response, turn = self._ask_ai(query, prepared, cache=cacheable, route=route)
+        return self._result(query, response, turn)
+
+    async def answer_async(self, query, route=None):
+        """异步回答一个问题（返回值同 answer），可在同一事件循环中并发调用"""
+        query, prepared, cacheable, response = self._lookup_cache(query)
+        turn = None
+        if response is None:
+            response, turn = await self._ask_ai_async(query, prepared, cache=cacheable, route=route)
+        return self._result(query, response, turn)
+
+    def _result(self, query, response, turn):
+        """turn 为本轮的耗时明细，来自缓存的回答为 None"""
+        return {
+            'query': query,
+            'response': response,
+            'command': self._handle_response(query, response),
+            'cached': turn is None,
+            'failed': bool(turn and turn.get('failed')),
+            'turn': turn,
+        }
+
+    def _lookup_cache(self, query):
+        """构建问题和上下文，查找缓存的回答
+
+        Returns:
+            tuple: (去掉 ! 前缀的问题, _prepare_prompt 的结果, 回答是否可缓存, 缓存的回答或 None)
+        """
+        # 以 ! 开头表示跳过缓存，重新询问 AI
+        bypass_cache = query.startswith('!')
+        if bypass_cache:
+            query = query[1:].lstrip()
+        prepared = self._prepare_prompt(query)
+        
+        # 问答模式中不依赖上下文的问题可以缓存，追问（如“这个报错怎么解决”）每次都询问 AI
+        cacheable = not self.agent_mode and not self.response_cache.is_follow_up(query)
+        response = None
+        if cacheable and not bypass_cache:
+            response = self.response_cache.get(query, self.environment_info)
+            if response is not None and self.echo:
+                print(response)
+                print(f"\033[2m[缓存命中 · 命中 {self.response_cache.hits} 次 / "
+                      f"未命中 {self.response_cache.misses} 次，输入 !问题 可跳过缓存]\033[0m")
+        return query, prepared, cacheable, response
+
+    def _handle_response(self, query, response):
+        """记录回答并处理其中建议的命令，返回建议的命令（没有时为 None）"""
+        if self.keep_context:
             self.context.append(f"用户: {query}")
             self.context.append(f"AI: {response}")
+        
+        command = self.extract_command(response) if '```' in response else None
+        if command:
+            verdict = get_policy().check(command)
+            if not verdict:
+                # 危险命令不预输入、不加入历史记录
+                if self.echo:
+                    print(f"\n⚠️ AI 建议的命令已被安全策略拦截（{verdict.reason}）：{command}")
+                return None
+        if not command or not self.echo:
+            return command
+        
+        if self.agent_mode:
+            print(f"\nAI 建议执行命令：{command}")
+            
+            if 'Set-ExecutionPolicy' in command or 'chocolatey' in command.lower():
+                print("\n⚠️ 注意：此命令需要在管理员权限的 PowerShell 中执行")
+                print("请打开管理员权限的 PowerShell 并复制命令执行")
+                if hasattr(self.terminal, 'add_to_history'):
+                    self.terminal.add_to_history(command)
+                return command
             
-            if self.agent_mode and '```' in response:
-                command = self.extract_command(response)
-                if command:
-                    print(f"\nAI 建议执行命令：{command}")
+            print("提示：按↑键获取命令，按回车执行")
+            
+            # 将命令添加到历史记录并预输入
+            if hasattr(self.terminal, 'session'):
+                try:
+                    # 添加到历史记录
+                    self.terminal.add_to_history(command)
                     
-                    if 'Set-ExecutionPolicy' in command or 'chocolatey' in command.lower():
-                        print("\n⚠️ 注意：此命令需要在管理员权限的 PowerShell 中执行")
-                        print("请打开管理员权限的 PowerShell 并复制命令执行")
-                        if hasattr(self.terminal, 'add_to_history'):
-                            self.terminal.add_to_history(command)
-                        return
+                    # 获取当前应用实例
+                    app = self.terminal.session.app
                     
-                    print("提示：按↑键获取命令，按回车执行")
+                    # 在主线程中更新缓冲区
+                    def update_buffer():
+                        app.current_buffer.text = command
+                        app.current_buffer.cursor_position = len(command)
                     
-                    # 将命令添加到历史记录并预输入
-                    if hasattr(self.terminal, 'session'):
-                        try:
-                            # 添加到历史记录
-                            self.terminal.add_to_history(command)
-                            
-                            # 获取当前应用实例
-                            app = self.terminal.session.app
-                            
-                            # 在主线程中更新缓冲区
-                            def update_buffer():
-                                app.current_buffer.text = command
-                                app.current_buffer.cursor_position = len(command)
-                            
-                            # 如果应用正在运行，使用 call_from_executor
-                            if app.is_running:
-                                app.loop.call_soon_threadsafe(update_buffer)
-                            
-                        except Exception as e:
-                            print(f"\n预输入命令失败: {e}")
-                            print(f"你可以手动复制命令：{command}")
-            else:
-                if '```' in response:
-                    command = self.extract_command(response)
-                    if command:
-                        print(f"\nAI 建议的命令：{command}")
-                        print("提示：你可以直接复制此命令或使用上箭头键获取此命令")
-                        if hasattr(self.terminal, 'add_to_history'):
-                            self.terminal.add_to_history(command)
-                            
-        except Exception as e:
-            print(f"AI 查询失败: {str(e)}")
+                    # 如果应用正在运行，使用 call_from_executor
+                    if app.is_running:
+                        app.loop.call_soon_threadsafe(update_buffer)
+                    
+                except Exception as e:
+                    print(f"\n预输入命令失败: {e}")
+                    print(f"你可以手动复制命令：{command}")
+        else:
+            print(f"\nAI 建议的命令：{command}")
+            print("提示：你可以直接复制此命令或使用上箭头键获取此命令")
+            if hasattr(self.terminal, 'add_to_history'):
+                self.terminal.add_to_history(command)
+        return command
 
-    def _build_full_context(self):
-        """构建完整的历史上下文"""
-        context_parts = []
-        
-        # 添加命令历史和执行结果
-        if self.context:
-            context_parts.append("历史命令和执行结果：")
-            for item in self.context[-10:]:  # 保留最近10条记录
-                if isinstance(item, dict):
-                    # 命令执行记录
-                    context_parts.append(f"执行命令: {item['command']}")
-                    if item['output']:
-                        context_parts.append(f"命令输出:\n{item['output']}")
-                    if item['error']:
-                        context_parts.append(f"错误信息:\n{item['error']}")
-                else:
-                    # 对话记录
-                    context_parts.append(item)
-                context_parts.append("---")
+    def _ask_ai(self, query, prepared, cache=False, route=None):
+        """请求 AI 回答，成功时写入缓存
+
+        Returns:
+            tuple: (回答, 本轮耗时明细)
+        """
+        prompt, context, context_time = prepared
+        turn = {}
+        response = self.chat.get_response(
+            prompt,
+            self.environment_info,
+            context,
+            route=route,
+            turn=turn
+        )
+        turn = self._record_turn(context_time, turn)
+        self._store_response(query, response, turn, cache)
+        return response, turn
+
+    async def _ask_ai_async(self, query, prepared, cache=False, route=None):
+        """异步请求 AI 回答，成功时写入缓存（返回值同 _ask_ai）
+
+        耗时明细保存在本次调用自己的 turn 字典中，并发的查询互不影响。
+        """
+        prompt, context, context_time = prepared
+        turn = {}
+        try:
+            response = await self.chat.get_response_async(
+                prompt,
+                self.environment_info,
+                context,
+                route=route,
+                turn=turn
+            )
+        finally:
+            turn = self._record_turn(context_time, turn)  # 被取消的请求也记录
+        self._store_response(query, response, turn, cache)
+        return response, turn
+
+    def _prepare_prompt(self, query):
+        """构建发送给 AI 的问题和历史上下文
+
+        Returns:
+            tuple: (问题, 上下文, 构建耗时)
+        """
+        start = time.perf_counter()
+        context = self._build_full_context()
+        # 查询本身也可能带有很长的命令输出（Agent 模式）
+        prompt = self.context_builder.limit(query, self.context_builder.max_output_tokens * 2)
         
-        return "\n".join(context_parts)
+        if self.agent_mode:
+            prompt = f"{AGENT_MODE_PREFIX}{prompt}"
+        return prompt, context, time.perf_counter() - start
+
+    def _record_turn(self, context_time, turn):
+        """记录一轮对话的耗时明细，返回记录（请求没有发出时为空字典）"""
+        if not turn:
+            return {}
+        return self.metrics.record_turn(
+            mode='agent' if self.agent_mode else 'qa',
+            context_build=context_time,
+            **turn
+        )
+
+    def _store_response(self, query, response, turn, cache):
+        """请求成功时缓存回答"""
+        if cache and not turn.get('failed'):
+            self.response_cache.put(query, self.environment_info, response)
+
+    def _build_full_context(self):
+        """构建完整的历史上下文（受 token 预算限制）"""
+        return self.context_builder.build(self.context[-50:])
 
     def build_context(self):
         """构建上下文信息"""
@@ -6,6 +6,10 @@ class BaseTerminal:
         self.output_history = []
         self.chat_history = []
         self.agent_mode = agent_mode
+        self.on_result = None  # 命令执行完成后的回调，参数为 CommandResult
+        self.async_callback = None  # AI 查询的协程版本回调（事件循环终端使用）
+        self.fanout = None  # 多主机执行器（FanoutExecutor），以 @ 开头的命令使用
+        self.output_route = None  # 分析命令输出时选择路由的回调，参数为发送给 AI 的输出
         self.emoji = {
             '👋': '👋',
             '💡': '💡',
@@ -13,4 +17,12 @@ class BaseTerminal:
             '🤖': '🤖',  # 基础机器人
             '🤖️️️Q': '🤖️️️Q',  # 问答模式
             '🤖️️️A': '🤖️️️A',  # Agent模式
-        } 
\ No newline at end of file
+        }
+
+    def route_for_output(self, output):
+        """分析命令输出的请求使用的路由，没有设置回调时为 None（由路由器自动判断）"""
+        return self.output_route(output) if self.output_route else None
+
+    def configure_completion(self, settings):
+        """根据配置（completion.*）设置补全，有补全功能的终端覆盖此方法"""
+        pass
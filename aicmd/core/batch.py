@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+
+def parse_record(line, index):
+    """解析一行输入
+
+    每行可以是 JSON 对象（{"id": ..., "query": "..."}）、JSON 字符串或纯文本问题，
+    没有 id 时使用行号。空行返回 None。
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        data = line
+    if isinstance(data, str):
+        return {'id': index, 'query': data}
+    if isinstance(data, dict) and isinstance(data.get('query'), str):
+        record = dict(data)
+        record.setdefault('id', index)
+        return record
+    return {'id': index, 'query': None, 'error': '无法识别的输入行，需要 {"query": "..."} 或纯文本'}
+
+
+class BatchRunner:
+    """批量问答
+
+    在一个事件循环中并发处理多个问题，由 jobs 个工作任务从队列中取问题处理，共用同一个
+    Assistant（同一个连接池和客户端）。输入可以是逐行读取的 stdin，由单独的读取任务在线程池中
+    读取后放入队列，不阻塞进行中的请求；每个问题完成后立即写出一行 JSON 结果（按完成顺序），
+    输入来得慢时已完成的结果也不必等到下一行输入。
+    """
+    def __init__(self, assistant, jobs=4, output=None):
+        self.assistant = assistant
+        self.jobs = max(1, jobs)
+        self.output = output or sys.stdout
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, records):
+        """处理全部记录，返回失败的数量"""
+        queue = asyncio.Queue(maxsize=self.jobs)
+        producer = asyncio.ensure_future(self._produce(records, queue))
+        workers = [asyncio.ensure_future(self._work(queue)) for _ in range(self.jobs)]
+        try:
+            await producer
+            for _ in workers:
+                await queue.put(None)  # 通知工作任务输入已结束
+            await asyncio.gather(*workers)
+        finally:
+            for task in [producer] + workers:
+                task.cancel()
+        return self.failed
+
+    async def _produce(self, records, queue):
+        """在线程池中逐条读取输入并放入队列（队列满时等待，读取不会超前太多）"""
+        loop = asyncio.get_event_loop()
+        iterator = iter(records)
+        while True:
+            record = await loop.run_in_executor(None, next, iterator, None)
+            if record is None:
+                return
+            await queue.put(record)
+
+    async def _work(self, queue):
+        """逐个处理队列中的问题，每个完成后立即写出结果"""
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            self._write(await self._run_one(record))
+
+    async def _run_one(self, record):
+        """处理一个问题，返回结果字典"""
+        result = {
+            'id': record.get('id'),
+            'query': record.get('query'),
+            'mode': 'agent' if self.assistant.agent_mode else 'qa',
+        }
+        if record.get('error'):
+            result.update(failed=True, error=record['error'])
+            return result
+
+        start = time.perf_counter()
+        try:
+            answer = await self.assistant.answer_async(record['query'])
+        except Exception as e:
+            result.update(failed=True, error=str(e), elapsed=round(time.perf_counter() - start, 4))
+            return result
+
+        turn = answer['turn'] or {}
+        result.update(
+            response=answer['response'],
+            command=answer['command'],
+            cached=answer['cached'],
+            failed=answer['failed'],
+            route=turn.get('route'),
+            model=turn.get('model'),
+            ttft=turn.get('ttft'),
+            tokens_per_second=turn.get('tokens_per_second'),
+            elapsed=round(time.perf_counter() - start, 4),
+        )
+        return result
+
+    def _write(self, result):
+        self.completed += 1
+        if result.get('failed'):
+            self.failed += 1
+        self.output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self.output.flush()
+
+
+def _stdin_records(start=0):
+    """逐行读取 stdin 中的问题（id 默认为序号，从 start 开始）"""
+    for index, line in enumerate(sys.stdin, start):
+        record = parse_record(line, index)
+        if record is not None:
+            yield record
+
+
+def run_batch(queries, agent_mode=False, read_stdin=False, jobs=4, output=None, use_cache=True):
+    """非交互模式入口
+
+    Args:
+        queries: 命令行给出的问题列表
+        agent_mode: 是否为 Agent 模式（只给出建议的命令，不会执行）
+        read_stdin: 是否从 stdin 逐行读取更多问题（JSONL 或纯文本）
+        jobs: 最大并发请求数
+        output: 结果 JSONL 文件路径，None 表示写到 stdout
+        use_cache: 是否使用问答缓存
+
+    Returns:
+        int: 退出码（0 全部成功，1 有问题失败，2 配置错误）
+    """
+    from .assistant import Assistant
+
+    assistant = Assistant(agent_mode=agent_mode, use_cache=use_cache, headless=True)
+    if not assistant.settings.check_api_config():
+        print("错误：尚未配置 AI 接口，请先以交互模式运行 ai 完成配置", file=sys.stderr)
+        return 2
+
+    # 只有一个问题且结果输出到终端时，像交互模式一样流式显示回答
+    if len(queries) == 1 and not read_stdin and output is None:
+        answer = assistant.answer(queries[0])
+        return 1 if answer['failed'] else 0
+
+    assistant.echo = False
+    records = [{'id': index, 'query': query} for index, query in enumerate(queries)]
+    if read_stdin:
+        records = itertools.chain(records, _stdin_records(len(records)))
+
+    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    try:
+        runner = BatchRunner(assistant, jobs=jobs, output=out)
+        failed = asyncio.run(runner.run(records))
+    finally:
+        if output:
+            out.close()
+    print(f"完成 {runner.completed} 个问题，失败 {failed} 个", file=sys.stderr)
+    return 1 if failed else 0
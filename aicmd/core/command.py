@@ -2,6 +2,11 @@ import subprocess
 import os
 import sys
 from ..utils.translator import CommandTranslator
+from .runner import CommandRunner
+from .policy import get_policy
+from .shell_ast import ShellSyntaxError, parse
+from ..utils.metrics import get_metrics
+from ..utils.ls_colors import get_ls_colorizer
 
 class CommandExecutor:
     """命令执行器"""
@@ -9,6 +14,8 @@ class CommandExecutor:
         self.translator = CommandTranslator()
         self.internal_commands = {'dir', 'cd', 'type', 'copy', 'move', 'del', 'rd', 'md', 'cls', 'echo'}
         self.parser = CommandParser()
+        self.runner = CommandRunner(max_output=1024 * 1024)
+        self.last_result = None  # 最近一次命令的执行结果（退出码、耗时等）
         
         # ANSI 颜色代码
         self.colors = {
@@ -19,107 +26,89 @@ class CommandExecutor:
             'reset': '\033[0m'      # 重置
         }
     
-    def _colorize_output(self, output, command):
-        """为输出添加颜色"""
-        if not output:
+    def _colorize_output(self, output, command, directory='.'):
+        """为输出添加颜色
+
+        Args:
+            output: 命令输出
+            command: 命令名（ls 或 dir）
+            directory: 被列出的目录（短格式 ls 输出按该目录的文件类型着色）
+        """
+        if not output or command not in ('ls', 'dir'):
             return output
+        
+        # Linux 下的 ls 输出：一次 scandir 快照 + LS_COLORS
+        if os.name != 'nt':
+            return get_ls_colorizer().colorize(output, directory)
+        
+        # 启用 Windows 的 ANSI 支持
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
+        
+        colored_lines = []
+        for line in output.splitlines():
+            # 跳过空行
+            if not line.strip():
+                colored_lines.append(line)
+                continue
             
-        # 处理 ls 和 dir 命令的输出
-        if command.strip().startswith(('ls', 'dir')):
-            lines = output.splitlines()
-            colored_lines = []
-            
-            # 启用 Windows 的 ANSI 支持
-            if os.name == 'nt':
-                import ctypes
-                kernel32 = ctypes.windll.kernel32
-                kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
-            
-            for line in lines:
-                # 跳过空行
-                if not line.strip():
-                    colored_lines.append(line)
-                    continue
-                    
-                # Linux 下的 ls 输出格式处理
-                if os.name != 'nt':
-                    parts = line.split()
-                    if not parts:
-                        continue
-                        
-                    # 处理长格式（ls -l）输出
-                    if line[0] in 'dl-':
-                        if line.startswith('d'):  # 目录
-                            colored_lines.append(f"{self.colors['dir']}{line}{self.colors['reset']}")
-                        elif 'x' in parts[0]:  # 可执行文件
-                            colored_lines.append(f"{self.colors['exe']}{line}{self.colors['reset']}")
-                        elif line.startswith('l'):  # 符号链接
-                            colored_lines.append(f"{self.colors['link']}{line}{self.colors['reset']}")
-                        else:  # 普通文件
-                            colored_lines.append(f"{self.colors['file']}{line}{self.colors['reset']}")
-                    # 处理简单格式（ls）输出
-                    else:
-                        filename = line
-                        path = os.path.join(os.getcwd(), filename)
-                        if os.path.exists(path):
-                            if os.path.isdir(path):  # 目录
-                                colored_lines.append(f"{self.colors['dir']}{filename}{self.colors['reset']}")
-                            elif os.access(path, os.X_OK):  # 可执行文件
-                                colored_lines.append(f"{self.colors['exe']}{filename}{self.colors['reset']}")
-                            elif os.path.islink(path):  # 符号链接
-                                colored_lines.append(f"{self.colors['link']}{filename}{self.colors['reset']}")
-                            else:  # 普通文件
-                                colored_lines.append(f"{self.colors['file']}{filename}{self.colors['reset']}")
-                        else:
-                            colored_lines.append(f"{self.colors['file']}{filename}{self.colors['reset']}")
-                else:
-                    # Windows 的 dir 输出格式处理
-                    if '<DIR>' in line:  # 目录
-                        colored_lines.append(f"{self.colors['dir']}{line}{self.colors['reset']}")
-                    elif any(line.lower().endswith(ext) for ext in ('.exe', '.bat', '.cmd', '.sh')):  # 可执行文件
-                        colored_lines.append(f"{self.colors['exe']}{line}{self.colors['reset']}")
-                    else:  # 普通文件
-                        colored_lines.append(f"{self.colors['file']}{line}{self.colors['reset']}")
-            
-            return '\n'.join(colored_lines)
-        return output
+            # Windows 的 dir 输出格式处理
+            if '<DIR>' in line:  # 目录
+                colored_lines.append(f"{self.colors['dir']}{line}{self.colors['reset']}")
+            elif any(line.lower().endswith(ext) for ext in ('.exe', '.bat', '.cmd', '.sh')):  # 可执行文件
+                colored_lines.append(f"{self.colors['exe']}{line}{self.colors['reset']}")
+            else:  # 普通文件
+                colored_lines.append(f"{self.colors['file']}{line}{self.colors['reset']}")
+        
+        return '\n'.join(colored_lines)
 
     def execute(self, command):
         """执行命令"""
         try:
-            # 首先解析命令
-            parsed_cmd = self.parser.parse(command)
-            if not parsed_cmd:
+            # 首先解析命令（危险命令或语法错误时返回 None）
+            tree = self.parser.parse(command)
+            if tree is None:
                 return "无效的命令", "命令解析失败"
 
             # 获取命令和参数
-            cmd_parts = parsed_cmd.strip().split()
-            cmd = cmd_parts[0]
-            args = cmd_parts[1:] if len(cmd_parts) > 1 else []
+            first = tree.first_command
+            cmd = first.name if first else ''
+            parsed_cmd = command.strip()
 
             # 特殊处理 cd 命令
-            if cmd in ['cd']:
-                return self._handle_cd(args)
+            if cmd == 'cd' and tree.is_simple():
+                return self._handle_cd(first.args)
 
-            # 检查是否是 Linux 命令需要转换
-            if self.translator.is_linux_command(parsed_cmd):
-                parsed_cmd = self.translator.to_windows(parsed_cmd)
+            # Windows 下把 Linux 命令转换为对应的 Windows 命令
+            if os.name == 'nt' and self.translator.is_linux_command(tree):
+                parsed_cmd = self.translator.to_windows(tree)
+                tree = self.parser.parse(parsed_cmd) or tree
             
             # 执行命令
-            if os.name == 'nt' and parsed_cmd.split()[0] in self.internal_commands:
+            if os.name == 'nt' and tree.first_command and tree.first_command.name in self.internal_commands:
                 stdout, stderr = self._execute_windows_internal(parsed_cmd)
             else:
                 stdout, stderr = self._execute_shell(parsed_cmd)
                 
-            # 为输出添加颜色
-            if stdout and cmd in ['ls', 'dir']:
-                stdout = self._colorize_output(stdout, cmd)
+            # 为输出添加颜色（整条命令的输出来自最后一条命令）
+            last = tree.last_command
+            if stdout and last and last.name in ('ls', 'dir'):
+                stdout = self._colorize_output(stdout, last.name, self._listed_directory(last.args))
             
             return stdout, stderr
                 
         except Exception as e:
             return "", f"命令执行错误: {str(e)}"
 
+    @staticmethod
+    def _listed_directory(args):
+        """ls 列出的目录：只有一个非选项参数且为目录时是该目录，否则是当前目录"""
+        paths = [arg for arg in args if not arg.startswith('-')]
+        if len(paths) == 1 and os.path.isdir(os.path.expanduser(paths[0])):
+            return os.path.expanduser(paths[0])
+        return '.'
+
     def _handle_cd(self, args):
         """处理 cd 命令"""
         try:
@@ -172,24 +161,17 @@ class CommandExecutor:
 
     def _execute_shell(self, command):
         """Unix 命令执行"""
-        process = subprocess.Popen(
+        self.last_result = self.runner.run(
             command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
+            echo=False,
+            use_pty=False,  # 需要分开 stdout / stderr
             env=dict(os.environ, LANG='en_US.UTF-8')  # 确保正确的字符编码
         )
-        stdout, stderr = process.communicate()
-        return stdout, stderr
+        get_metrics().record_command(self.last_result, source='executor')
+        return self.last_result.stdout, self.last_result.stderr
 
 class CommandParser:
     """命令解析器"""
-    def __init__(self):
-        self.special_chars = {'"', "'", '|', '>', '<', '&', ';'}
-    
     def parse(self, command):
         """解析命令
         
@@ -197,68 +179,23 @@ class CommandParser:
             command: 要解析的命令字符串
             
         Returns:
-            str: 处理后的命令，如果命令无效则返回 None
+            CommandList: 语法树（见 shell_ast），如果命令无效或危险则返回 None
         """
-        if not command:
+        if not command or not command.strip():
             return None
             
         command = command.strip()
+        try:
+            tree = parse(command)
+        except ShellSyntaxError:
+            return None
         
         # 检查危险命令
         if self._is_dangerous(command):
             return None
-            
-        # 处理引号和转义字符
-        command = self._handle_quotes(command)
         
-        return command
+        return tree
     
     def _is_dangerous(self, command):
-        """检查是否是危险命令"""
-        dangerous_commands = {
-            'rm -rf /',
-            'rm -rf *',
-            'format',
-            'mkfs',
-            ':(){:|:&};:',  # fork 炸弹
-            '> /dev/sda',
-            'dd if=/dev/zero'
-        }
-        
-        cmd_lower = command.lower()
-        return any(dc in cmd_lower for dc in dangerous_commands)
-    
-    def _handle_quotes(self, command):
-        """处理命令中的引号"""
-        result = []
-        in_quotes = False
-        quote_char = None
-        escaped = False
-        
-        for char in command:
-            if escaped:
-                result.append(char)
-                escaped = False
-                continue
-                
-            if char == '\\':
-                escaped = True
-                continue
-                
-            if char in {'"', "'"}:
-                if not in_quotes:
-                    in_quotes = True
-                    quote_char = char
-                elif char == quote_char:
-                    in_quotes = False
-                    quote_char = None
-                result.append(char)
-                continue
-                
-            if not in_quotes and char in self.special_chars:
-                # 处理特殊字符
-                result.append(f' {char} ')
-            else:
-                result.append(char)
-                
-        return ''.join(result) 
\ No newline at end of file
+        """检查是否是危险命令（见 policy.CommandPolicy）"""
+        return not get_policy().check(command)
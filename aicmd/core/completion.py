@@ -0,0 +1,350 @@
+import bisect
+import os
+import re
+import time
+from collections import namedtuple
+
+from ..utils.command_index import CommandIndex
+from ..utils.dir_cache import get_dir_cache
+from ..utils.fuzzy import fuzzy_match
+from .policy import WRAPPERS
+
+# 补全候选：positions 为 display 中匹配字符的位置
+Candidate = namedtuple('Candidate', 'text start_position display meta score positions')
+
+# 这些符号之后是新的命令
+COMMAND_SEPARATORS = ('|', '&', ';', '(', '`')
+# 只接受目录参数的命令
+DIRECTORY_COMMANDS = {'cd', 'pushd', 'rmdir'}
+# 每检查这么多个候选看一次是否超时
+_CHECK_EVERY = 256
+# 补全不加引号的路径时需要用反斜杠转义的字符
+_SHELL_SPECIAL_RE = re.compile(r'([ \t\n\'"\\$`|&;()<>*?\[\]{}!#])')
+# 双引号内需要用反斜杠转义的字符
+_DOUBLE_QUOTED_SPECIAL_RE = re.compile(r'([$`"\\])')
+
+
+class _Narrowing:
+    """增量过滤：输入在上一次的基础上追加字符时，只需在上一次匹配到的候选中查找
+
+    source 是候选列表的快照（历史记录或命令索引变化时会换成新的列表对象）。
+    """
+    def __init__(self):
+        self.pattern = None
+        self.source = None
+        self.matched = None
+
+    def candidates(self, pattern, source):
+        if (self.matched is not None and self.source is source
+                and self.pattern and pattern.startswith(self.pattern)):
+            return self.matched
+        return source
+
+    def update(self, pattern, source, matched):
+        """matched 为 None 表示这次没有检查完（超时），下次不能在其中查找"""
+        self.pattern, self.source, self.matched = pattern, source, matched
+
+
+class CompletionEngine:
+    """统一的补全引擎
+
+    历史命令、PATH 中的命令和路径三类候选统一用 fzf 风格的子序列匹配打分后排序：
+    历史命令匹配整行，按得分加上使用频率和最近程度（frecency）排序；命令位置（行首、管道
+    和 ; && 之后、sudo 等包装命令之后）补全命令名，同样参考历史中该命令的使用情况；其他
+    参数位置以及含 / 的词补全路径（目录列表来自 DirectoryCache）。
+
+    每次补全有时间预算：历史记录按最近使用顺序检查，超过预算时返回已找到的结果；输入在
+    上一次的基础上追加字符时只在上一次的匹配结果中查找，边输入边补全也不会卡顿。
+    """
+    def __init__(self, history_index=None, command_index=None, dir_cache=None,
+                 budget=0.03, max_results=50, history_limit=20, fuzzy=True, frecency_weight=10.0):
+        self.history_index = history_index
+        self.command_index = command_index or CommandIndex()  # PATH 命令索引（磁盘缓存 + 后台增量刷新）
+        self.dir_cache = dir_cache or get_dir_cache()  # 目录列表缓存（逐级补全时复用）
+        self.budget = budget  # 每次补全的时间预算（秒）
+        self.max_results = max_results
+        self.history_limit = history_limit  # 每次最多补全的历史命令数
+        self.fuzzy = fuzzy  # False 时只做前缀匹配
+        self.frecency_weight = frecency_weight
+        self.last_stats = None  # (耗时, 是否因超时提前结束)
+        self._history_filter = _Narrowing()
+        self._command_filter = _Narrowing()
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """根据配置（completion.*）创建"""
+        return cls(
+            budget=settings.get('completion.budget_ms', 30) / 1000.0,
+            max_results=settings.get('completion.max_results', 50),
+            fuzzy=settings.get('completion.fuzzy', True),
+            **kwargs
+        )
+
+    def complete(self, text):
+        """补全光标前的文本
+
+        Returns:
+            list: 按得分从高到低排列的 Candidate
+        """
+        started = time.monotonic()
+        deadline = started + self.budget
+        word, command_position = self._current_word(text)
+        value, quote = self._unquote(word)
+        results = []
+        truncated = False
+
+        # 历史记录按最近使用顺序检查，先用掉预算中的一部分
+        query = text.lstrip()
+        if query and self.history_index is not None:
+            history, truncated = self._complete_history(query, len(text), started + self.budget / 2)
+            results += history
+
+        if command_position and value == word and '/' not in word and not word.startswith(('.', '~')):
+            commands, commands_truncated = self._complete_commands(word, deadline)
+            results += commands
+            truncated = truncated or commands_truncated
+        else:
+            results += self._complete_paths(text, value, -len(word), deadline)
+
+        seen = set()
+        ranked = []
+        for candidate in sorted(results, key=lambda c: (-c.score, len(c.text), c.text)):
+            if candidate.text not in seen:
+                seen.add(candidate.text)
+                if candidate.meta in ('dir', 'file'):
+                    # 只转义最终返回的路径（大目录有成千上万个候选）
+                    candidate = candidate._replace(text=self._quote_path(candidate.text, quote, candidate.meta == 'dir'))
+                ranked.append(candidate)
+                if len(ranked) >= self.max_results:
+                    break
+        self.last_stats = (time.monotonic() - started, truncated)
+        return ranked
+
+    def prefetch(self, text):
+        """选中目录补全项后，在后台预读该目录及其子目录，下一级补全可以直接使用缓存"""
+        word, _ = self._current_word(text)
+        path, _ = self._unquote(word)
+        self.dir_cache.prefetch(self._resolve_dir(path.rstrip('/') or '/'))
+
+    def _complete_history(self, query, length, deadline):
+        """历史命令：整行匹配，替换整行
+
+        前缀匹配的命令已经足够时只给它们打分，否则按最近使用顺序模糊查找全部历史。
+        """
+        index = self.history_index
+        prefixed = index.search(query, limit=self.history_limit)
+        if not self.fuzzy or len(prefixed) >= self.history_limit:
+            recent = None
+            candidates = prefixed
+        else:
+            recent = index.recent()
+            candidates = self._history_filter.candidates(query, recent)
+
+        matched = []
+        scored = []
+        truncated = False
+        for i, cmd in enumerate(candidates):
+            if i % _CHECK_EVERY == 0 and i and time.monotonic() > deadline:
+                truncated = True
+                break
+            if cmd == query:
+                continue
+            match = fuzzy_match(query, cmd)
+            if match is None:
+                continue
+            matched.append(cmd)
+            score, positions = match
+            score += self.frecency_weight * index.frecency(cmd)
+            scored.append(Candidate(cmd, -length, cmd, 'history', score, positions))
+
+        if recent is not None:
+            self._history_filter.update(query, recent, None if truncated else matched)
+        scored.sort(key=lambda c: -c.score)
+        return scored[:self.history_limit], truncated
+
+    def _complete_commands(self, word, deadline):
+        """命令名：前缀匹配的命令不够 max_results 个且模式不少于两个字符时，在全部命令中模糊查找"""
+        self.command_index.maybe_refresh()
+        if not word:
+            return [], False
+        prefixed = self.command_index.lookup(word)
+        if not self.fuzzy or len(word) < 2 or len(prefixed) >= self.max_results:
+            return [
+                candidate._replace(score=candidate.score + self._command_frecency(candidate.text))
+                for candidate in self._prefix_candidates(word, [(cmd, 'command') for cmd in prefixed])
+            ], False
+
+        commands = self.command_index.commands
+        matched = []
+        results = []
+        truncated = False
+        for i, cmd in enumerate(self._command_filter.candidates(word, commands)):
+            if i % _CHECK_EVERY == 0 and i and time.monotonic() > deadline:
+                truncated = True
+                break
+            match = fuzzy_match(word, cmd)
+            if match is None:
+                continue
+            matched.append(cmd)
+            score, positions = match
+            results.append(Candidate(cmd, -len(word), cmd, 'command', score + self._command_frecency(cmd), positions))
+
+        self._command_filter.update(word, commands, None if truncated else matched)
+        return results, truncated
+
+    def _command_frecency(self, name):
+        if self.history_index is None:
+            return 0.0
+        return self.frecency_weight * self.history_index.command_frecency(name)
+
+    def _complete_paths(self, text, path, start_position, deadline):
+        """路径：匹配最后一个 / 之后的部分，保留用户输入的目录写法
+
+        以模式开头的条目不少于 max_results 个时只列出这些条目（二分查找），否则模糊匹配全部条目。
+
+        Args:
+            path: 去掉引号和转义后的词，返回的补全文本同样未转义（由 complete 转义）
+            start_position: 替换的起始位置（光标前原始的词的长度的相反数）
+        """
+        directory, sep, pattern = path.rpartition('/')
+        prefix = directory + sep
+        entries = self.dir_cache.list(self._resolve_dir(prefix or '.'))
+        if not entries:
+            return []
+
+        dirs_only = text.split(None, 1)[0] in DIRECTORY_COMMANDS if text.strip() else False
+        show_hidden = pattern.startswith('.')
+        lo = bisect.bisect_left(entries, (pattern,))
+        hi = bisect.bisect_left(entries, (pattern + '\U0010ffff',), lo)
+        prefix_only = not self.fuzzy or hi - lo >= self.max_results
+        if prefix_only:
+            entries = entries[lo:hi]
+
+        items = []
+        for name, is_dir in entries:
+            if dirs_only and not is_dir:
+                continue
+            if name.startswith('.') and not show_hidden:
+                continue
+            items.append((prefix + name + ('/' if is_dir else ''), 'dir' if is_dir else 'file'))
+
+        if prefix_only:
+            return self._prefix_candidates(pattern, items, start_position, len(prefix))
+
+        results = []
+        for i, (completion, meta) in enumerate(items):
+            if i % _CHECK_EVERY == 0 and i and time.monotonic() > deadline:
+                break
+            display = completion[len(prefix):]
+            match = fuzzy_match(pattern, display.rstrip('/'))
+            if match is None:
+                continue
+            score, positions = match
+            if meta == 'dir':
+                score += 1  # 得分相同时目录在前
+            results.append(Candidate(completion, start_position, display, meta, score, positions))
+        return results
+
+    @staticmethod
+    def _prefix_candidates(pattern, items, start_position=None, strip=0):
+        """以 pattern 开头的候选：得分只取决于开头的字符，所有候选相同，只计算一次
+
+        Args:
+            items: [(补全文本, 类型), ...]
+            strip: 显示时去掉补全文本开头的字符数（路径的目录部分）
+        """
+        if not items:
+            return []
+        if start_position is None:
+            start_position = -len(pattern)
+        score, positions = fuzzy_match(pattern, items[0][0][strip:])
+        return [
+            Candidate(text, start_position, text[strip:], meta, score + (meta == 'dir'), positions)
+            for text, meta in items
+        ]
+
+    @staticmethod
+    def _current_word(text):
+        """光标前的词（保留引号和转义，引号内和转义的空格不分词），以及它是否处在命令名的位置"""
+        start = 0
+        cut = -1  # 词中最后一个不在引号内的命令分隔符
+        quote = None
+        escaped = False
+        for i, ch in enumerate(text):
+            if escaped:
+                escaped = False
+            elif ch == '\\' and quote != "'":
+                escaped = True
+            elif quote:
+                if ch == quote:
+                    quote = None
+            elif ch in '\'"':
+                quote = ch
+            elif ch in ' \t':
+                start = i + 1
+                cut = -1
+            elif ch in COMMAND_SEPARATORS:
+                cut = i
+        word = text[start:]
+        head = text[:start].rstrip()
+
+        # ls|gr 这种没有空格的写法
+        if cut >= 0:
+            return text[cut + 1:], True
+
+        if not head or head.endswith(COMMAND_SEPARATORS) or head.endswith('$('):
+            return word, True
+        last = head.rsplit(None, 1)[-1]
+        return word, last in WRAPPERS
+
+    @staticmethod
+    def _unquote(word):
+        """去掉词中的引号和转义
+
+        Returns:
+            tuple: (实际的文本, 未闭合的引号字符或 None)，例如 "sp -> ('sp', '"')
+        """
+        chars = []
+        quote = None
+        i = 0
+        while i < len(word):
+            ch = word[i]
+            if ch == '\\' and quote != "'" and i + 1 < len(word):
+                # 双引号内只有 $ ` " \ 之前的反斜杠是转义
+                if quote is None or word[i + 1] in '$`"\\':
+                    i += 1
+                    ch = word[i]
+            elif quote and ch == quote:
+                quote = None
+                ch = ''
+            elif not quote and ch in '\'"':
+                quote = ch
+                ch = ''
+            chars.append(ch)
+            i += 1
+        return ''.join(chars), quote
+
+    @staticmethod
+    def _quote_path(path, quote, is_dir):
+        """按 shell 语法转义补全的路径
+
+        用户已经输入了未闭合的引号时在引号内补全，文件补全后闭合引号，目录保持引号打开以便继续补全下一级；
+        否则用反斜杠转义空格和元字符（开头的 ~ 不转义，以保留家目录展开）。
+        """
+        if quote == "'":
+            return "'" + path.replace("'", "'\\''") + ('' if is_dir else "'")
+        if quote == '"':
+            return '"' + _DOUBLE_QUOTED_SPECIAL_RE.sub(r'\\\1', path) + ('' if is_dir else '"')
+        home = '~' if path.startswith('~') else ''
+        return home + _SHELL_SPECIAL_RE.sub(r'\\\1', path[len(home):])
+
+    @staticmethod
+    def _resolve_dir(path):
+        """把补全中输入的目录（~、绝对路径、相对路径或空）转换为实际路径"""
+        if path.startswith('~'):
+            return os.path.expanduser(path)
+        elif path.startswith('/'):
+            return path
+        elif path:
+            return os.path.join(os.getcwd(), path)
+        return os.getcwd()
@@ -0,0 +1,256 @@
+import fnmatch
+import hashlib
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .runner import ANSI_ESCAPE_RE, CommandResult, OutputTail
+
+# 默认通过 ssh 执行；{host} 和 {command} 会被替换。BatchMode 避免在无人值守时卡在密码提示上
+DEFAULT_COMMAND_TEMPLATE = [
+    'ssh', '-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10', '{host}', '{command}'
+]
+
+
+def load_hosts(path):
+    """读取主机列表文件：每行一个主机，# 开头为注释"""
+    hosts = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line and line not in hosts:
+                    hosts.append(line)
+    except OSError:
+        pass
+    return hosts
+
+
+class HostResult:
+    """单台主机的执行结果"""
+    def __init__(self, host, output='', exit_code=None, wall_time=0.0, error=None):
+        self.host = host
+        self.output = output
+        self.exit_code = exit_code
+        self.wall_time = wall_time
+        self.error = error  # 无法启动、超时或被取消
+
+    @property
+    def success(self):
+        return self.exit_code == 0 and self.error is None
+
+    def fingerprint(self):
+        """输出指纹：去掉颜色和行尾空白后的输出 + 退出码，用于合并相同结果"""
+        text = ANSI_ESCAPE_RE.sub('', self.output)
+        text = '\n'.join(line.rstrip() for line in text.strip().splitlines())
+        key = f"{self.exit_code}\0{self.error or ''}\0{text}"
+        return hashlib.sha1(key.encode('utf-8', errors='replace')).hexdigest()
+
+
+class FanoutResult:
+    """一次批量执行的结果，按输出指纹分组"""
+    def __init__(self, command, results, wall_time):
+        self.command = command
+        self.results = results
+        self.wall_time = wall_time
+        self.groups = OrderedDict()  # 指纹 -> [HostResult, ...]，按主机数从多到少
+        groups = {}
+        for result in results:
+            groups.setdefault(result.fingerprint(), []).append(result)
+        for key, members in sorted(groups.items(), key=lambda item: -len(item[1])):
+            self.groups[key] = members
+
+    @property
+    def failed_hosts(self):
+        return [r.host for r in self.results if not r.success]
+
+    def summary(self, max_group_chars=2000, max_hosts=10):
+        """去重后的摘要：每组相同输出只保留一份，供显示和 AI 分析"""
+        lines = [
+            f"在 {len(self.results)} 台主机上执行，{len(self.groups)} 种不同结果，"
+            f"失败 {len(self.failed_hosts)} 台，耗时 {self.wall_time:.2f}秒"
+        ]
+        for index, members in enumerate(self.groups.values(), 1):
+            sample = members[0]
+            hosts = [m.host for m in members]
+            shown = ', '.join(hosts[:max_hosts])
+            if len(hosts) > max_hosts:
+                shown += f" 等（另 {len(hosts) - max_hosts} 台）"
+            status = sample.error or f"退出码 {sample.exit_code}"
+            lines.append(f"--- 结果 {index}：{len(hosts)} 台主机，{status}：{shown}")
+            output = ANSI_ESCAPE_RE.sub('', sample.output).strip()
+            if len(output) > max_group_chars:
+                head = max_group_chars // 3
+                tail = max_group_chars - head
+                output = f"{output[:head]}\n[已省略 {len(output) - max_group_chars} 个字符]\n{output[-tail:]}"
+            if output:
+                lines.append(output)
+        return '\n'.join(lines)
+
+    def to_command_result(self, command):
+        """转换为 CommandResult：输出为去重后的摘要，有主机失败时退出码为 1"""
+        return CommandResult(
+            command,
+            output=self.summary(),
+            exit_code=1 if self.failed_hosts else 0,
+            wall_time=self.wall_time,
+        )
+
+
+class FanoutExecutor:
+    """批量执行器
+
+    通过 ssh 在多台主机上执行同一条命令：线程池限制同时连接的主机数，每台主机的输出
+    逐行回调（用于实时显示），只保留尾部；执行结束后按输出指纹分组，相同的输出只保留一份。
+
+    连接方式由 command_template 决定（argv 列表，{host}、{command} 会被替换），
+    例如 ['sh', '-c', '{command}'] 可以用本地子进程模拟多台主机。
+    """
+    def __init__(self, hosts=None, hosts_file=None, workers=20, command_template=None,
+                 timeout=60.0, max_output=64 * 1024):
+        self._hosts = list(hosts) if hosts else None
+        self.hosts_file = Path(hosts_file) if hosts_file else Path.home() / '.aicmd' / 'hosts'
+        self.workers = workers
+        self.command_template = list(command_template or DEFAULT_COMMAND_TEMPLATE)
+        self.timeout = timeout
+        self.max_output = max_output
+        self._pool = None
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def from_settings(cls, settings, hosts_file=None):
+        """根据配置创建"""
+        return cls(
+            hosts_file=hosts_file or settings.get('fanout.hosts_file') or None,
+            workers=settings.get('fanout.workers', 20),
+            command_template=settings.get('fanout.command_template') or None,
+            timeout=settings.get('fanout.timeout', 60.0),
+        )
+
+    @property
+    def hosts(self):
+        """全部主机（未直接指定时每次从主机列表文件读取）"""
+        if self._hosts is not None:
+            return list(self._hosts)
+        return load_hosts(self.hosts_file)
+
+    def select_hosts(self, patterns):
+        """按逗号分隔的主机名或通配符选择主机，patterns 为空时返回全部主机"""
+        hosts = self.hosts
+        if not patterns:
+            return hosts
+        selected = []
+        for pattern in patterns.split(','):
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+            matches = fnmatch.filter(hosts, pattern)
+            if not matches and not any(c in pattern for c in '*?['):
+                matches = [pattern]  # 不在列表中的主机名也允许直接指定
+            selected += [h for h in matches if h not in selected]
+        return selected
+
+    def build_argv(self, host, command):
+        """生成某台主机的执行命令"""
+        return [part.replace('{host}', host).replace('{command}', command) for part in self.command_template]
+
+    def run(self, command, hosts=None, on_output=None):
+        """在多台主机上执行命令
+
+        Args:
+            command: shell 命令
+            hosts: 主机列表，None 表示全部主机
+            on_output: 每行输出的回调 on_output(host, line)，在工作线程中调用
+
+        Returns:
+            FanoutResult: 执行结果
+        """
+        hosts = self.hosts if hosts is None else hosts
+        self._cancelled.clear()
+        start = time.monotonic()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='aicmd-fanout')
+        futures = [self._pool.submit(self._run_host, host, command, on_output) for host in hosts]
+        results = [future.result() for future in futures]
+        return FanoutResult(command, results, time.monotonic() - start)
+
+    def cancel(self):
+        """取消执行：结束所有进行中的连接，尚未开始的主机不再执行"""
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            self._kill(process)
+
+    def close(self):
+        """关闭线程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    @staticmethod
+    def _kill(process):
+        """结束子进程及其派生的进程（否则仍持有输出管道，读取不会结束）"""
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except OSError:
+            pass
+
+    def _run_host(self, host, command, on_output):
+        if self._cancelled.is_set():
+            return HostResult(host, error='已取消')
+        start = time.monotonic()
+        try:
+            process = subprocess.Popen(
+                self.build_argv(host, command),
+                stdin=subprocess.DEVNULL,  # 不能让 ssh 读取终端输入
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=os.name == 'posix',  # 终端的 Ctrl+C 不直接发给子进程，由 cancel() 处理
+            )
+        except OSError as e:
+            return HostResult(host, error=f"无法执行：{e}", wall_time=time.monotonic() - start)
+
+        with self._lock:
+            self._processes[host] = process
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            self._kill(process)
+
+        watchdog = threading.Timer(self.timeout, kill_on_timeout) if self.timeout else None
+        if watchdog:
+            watchdog.daemon = True
+            watchdog.start()
+        tail = OutputTail(self.max_output)
+        try:
+            for raw in process.stdout:
+                line = raw.decode('utf-8', errors='replace')
+                tail.write(line)
+                if on_output:
+                    on_output(host, line.rstrip('\n'))
+            exit_code = process.wait()
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            process.stdout.close()
+            with self._lock:
+                self._processes.pop(host, None)
+
+        error = None
+        if timed_out.is_set():
+            error = f"超时（{self.timeout:g}秒）"
+        elif self._cancelled.is_set() and exit_code != 0:
+            error = '已取消'
+        return HostResult(host, tail.getvalue(), exit_code, time.monotonic() - start, error)
@@ -0,0 +1,343 @@
+import json
+import posixpath
+import re
+from pathlib import Path
+
+from .shell_ast import ShellSyntaxError, parse
+
+# 包装命令：真正执行的是后面的命令
+WRAPPERS = {'sudo', 'doas', 'env', 'nohup', 'time', 'nice', 'ionice', 'exec', 'command', 'builtin', 'xargs', 'timeout', 'stdbuf'}
+# 包装命令中带参数的选项
+WRAPPER_OPTIONS_WITH_VALUE = {'-u', '-g', '-n', '-c', '-C', '-h', '-p', '-s', '-I', '-L', '-P', '-d', '-E', '-k'}
+# 用 -c 执行字符串的 shell
+SHELLS = {'sh', 'bash', 'zsh', 'dash', 'ksh', 'fish'}
+_ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+_FORK_BOMB_RE = re.compile(r'(\S+)\s*\(\s*\)\s*\{[^}]*\1\s*\|\s*\1\s*&')
+
+# 根目录、家目录和系统目录
+SYSTEM_PATH = (
+    r'/|/\*|~|~/\*?|\$HOME/?\*?|\$\{HOME\}/?\*?|'
+    r'/(bin|boot|dev|etc|home|lib|lib32|lib64|opt|proc|root|run|sbin|srv|sys|usr|var)(/\*?)?'
+)
+# 当前目录和上级目录（整个删除时才危险，修改权限很常见）
+WORKING_PATH = r'\*|\.|\./\*|\.\.'
+# 磁盘等块设备
+BLOCK_DEVICE = r'/dev/(sd[a-z]+|hd[a-z]+|vd[a-z]+|xvd[a-z]+|nvme\d+n\d+|mmcblk\d+|disk\d+|md\d+|dm-\d+|mapper/\S+)(p?\d+)?'
+_BLOCK_DEVICE_RE = re.compile(f"(?:{BLOCK_DEVICE})$")
+_SYSTEM_PATH_RE = re.compile(f"(?:{SYSTEM_PATH})$")
+# find 执行命令的动作
+FIND_EXEC_ACTIONS = {'-exec', '-execdir', '-ok', '-okdir'}
+
+
+class Rule:
+    """一条拒绝规则
+
+    匹配单条简单命令的 argv：命令名（去掉路径后）匹配 command，且每组 flags 中至少出现一个
+    （短选项可以合并书写，如 -rf / -fr），且有参数（规范化路径后）匹配 args。
+    flags / args 为空表示不检查。
+    """
+    def __init__(self, name, command, reason, flags=(), args=None):
+        self.name = name
+        self.command = re.compile(f"(?:{command})$")
+        self.reason = reason
+        self.flags = [set(group) for group in flags]
+        self.args = re.compile(f"(?:{args})$") if args else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """从策略文件中的 {"name", "command", "reason", "flags", "args"} 创建"""
+        return cls(
+            data.get('name') or data['command'],
+            data['command'],
+            data.get('reason') or '策略文件禁止',
+            flags=data.get('flags') or (),
+            args=data.get('args'),
+        )
+
+    def matches(self, name, flags, args):
+        if not self.command.match(name):
+            return False
+        if any(not (group & flags) for group in self.flags):
+            return False
+        if self.args is not None and not any(self.args.match(arg) for arg in args):
+            return False
+        return True
+
+
+# 内置规则（导入时编译）
+BUILTIN_RULES = [
+    Rule('rm-root', 'rm', '递归删除根目录、家目录、系统目录或当前目录',
+         flags=[('r', 'R', 'recursive')], args=f"{SYSTEM_PATH}|{WORKING_PATH}"),
+    Rule('rm-no-preserve-root', 'rm', '使用 --no-preserve-root 删除', flags=[('no-preserve-root',)]),
+    Rule('chmod-root', 'chmod|chown|chgrp', '递归修改根目录、家目录或系统目录的权限',
+         flags=[('R', 'recursive')], args=SYSTEM_PATH),
+    Rule('dd-device', 'dd', '直接写入磁盘设备', args=f"of={BLOCK_DEVICE}"),
+    Rule('mkfs', r'mkfs(\.\w+)?|mke2fs|mkswap|wipefs|blkdiscard', '格式化或擦除磁盘'),
+    Rule('shred-device', 'shred', '擦除磁盘设备', args=BLOCK_DEVICE),
+    Rule('format', 'format(\\.com)?', '格式化磁盘（Windows）', args=r'[A-Za-z]:\\?'),
+    Rule('fdisk', 'fdisk|sfdisk|parted|sgdisk', '修改磁盘分区表', args=BLOCK_DEVICE),
+]
+
+
+class Verdict:
+    """检查结果"""
+    def __init__(self, allowed=True, rule=None, reason=None, segment=None):
+        self.allowed = allowed
+        self.rule = rule  # 命中的规则名
+        self.reason = reason
+        self.segment = segment  # 命中的那一段命令
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        return f"Verdict(allowed={self.allowed}, rule={self.rule!r})"
+
+
+ALLOWED = Verdict()
+
+
+def split_commands(command, depth=0):
+    """把命令行切分为简单命令（包括子 shell、$(...)、`...` 命令替换中的命令，以及通过
+    here-document 或 <<< 交给 shell 执行的命令）
+
+    Returns:
+        list: [(argv, 写入的重定向目标列表), ...]
+    """
+    try:
+        tree = parse(command)
+    except ShellSyntaxError:
+        return [(command.split(), [])]  # 引号不成对，退回按空白切分
+
+    segments = []
+    for simple in tree.commands():
+        targets = [r.target.value for r in simple.redirects if r.writes and r.target]
+        segments.append((simple.argv, targets))
+        if depth < 3:
+            for substitution in simple.substitutions():
+                segments += split_commands(substitution, depth + 1)
+            argv = unwrap(simple.argv)
+            if argv and posixpath.basename(argv[0]) in SHELLS:
+                for redirect in simple.redirects:
+                    script = redirect.here_text
+                    if script is not None:
+                        segments += split_commands(script, depth + 1)
+    return segments
+
+
+def unwrap(argv):
+    """去掉变量赋值和 sudo / env / xargs 等包装命令，返回真正执行的 argv"""
+    i = 0
+    while i < len(argv):
+        word = argv[i]
+        if _ASSIGNMENT_RE.match(word):
+            i += 1
+            continue
+        if posixpath.basename(word) not in WRAPPERS:
+            break
+        i += 1
+        # 跳过包装命令自己的选项
+        while i < len(argv) and argv[i].startswith('-'):
+            i += 2 if argv[i] in WRAPPER_OPTIONS_WITH_VALUE else 1
+        # timeout 的时长参数
+        if posixpath.basename(word) == 'timeout' and i < len(argv):
+            i += 1
+    return argv[i:]
+
+
+def parse_options(args):
+    """提取选项：-rf 拆为 r、f，--force 记为 force；其余为普通参数"""
+    flags = set()
+    positional = []
+    for arg in args:
+        if arg.startswith('--') and len(arg) > 2:
+            flags.add(arg[2:].split('=', 1)[0])
+        elif arg.startswith('-') and len(arg) > 1 and not arg[1:2].isdigit():
+            flags.update(arg[1:])
+        else:
+            positional.append(arg)
+    return flags, positional
+
+
+def shell_script(argv):
+    """sh -c、bash -lc、bash -c -- 等形式执行的字符串，不是这种形式时返回 None
+
+    -c 可以和其他短选项合写；-o / -O 后面是选项名；-- 之后的第一个词是要执行的字符串。
+    """
+    run_string = False
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--':
+            i += 1
+            break
+        if not arg.startswith(('-', '+')) or len(arg) == 1:
+            break
+        i += 1
+        if arg.startswith('--'):
+            continue
+        if arg[0] == '-' and 'c' in arg[1:]:
+            run_string = True
+        if 'o' in arg[1:] or 'O' in arg[1:]:
+            i += 1
+    if run_string and i < len(argv):
+        return argv[i]
+    return None
+
+
+def find_deletes(argv):
+    """find 是否从根目录、家目录或系统目录开始查找并删除（-delete 或 -exec rm）"""
+    paths = []
+    for arg in argv[1:]:
+        if arg in ('-H', '-L', '-P') and not paths:
+            continue
+        if arg.startswith('-') or arg in ('(', '!'):
+            break
+        paths.append(normalize_path(arg))
+    if not any(_SYSTEM_PATH_RE.match(path) for path in paths):
+        return False
+
+    for i, arg in enumerate(argv):
+        if arg == '-delete':
+            return True
+        if arg in FIND_EXEC_ACTIONS:
+            command = unwrap(argv[i + 1:])
+            if command and posixpath.basename(command[0]) == 'rm':
+                return True
+    return False
+
+
+def normalize_path(arg):
+    """规范化路径参数：合并多余的斜杠，去掉 ./ 和结尾的斜杠（保留根目录）"""
+    if '/' not in arg:
+        return arg
+    star = arg.endswith('/*')
+    path = posixpath.normpath(arg[:-2] if star else arg)
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+    if star:
+        path = path.rstrip('/') + '/*'
+    return path
+
+
+class CommandPolicy:
+    """危险命令策略
+
+    用 shell_ast 把命令行切分为简单命令（处理引号、转义、管道、;、&&、重定向、命令替换），去掉 sudo、env
+    等包装命令，展开 sh -c 和 eval 的字符串后逐段检查：先看允许列表，再按命令名查内置规则和策略文件中的
+    规则。只检查命令结构，不会因为普通文本中出现 format 之类的单词而拒绝。
+
+    策略文件 ~/.aicmd/policy.json：
+        {
+            "allow": ["^rm -rf \\\\./build$"],       // 正则，匹配 argv 拼接结果的命令段放行
+            "deny": ["^shutdown\\\\b",               // 正则，或者规则对象（见 Rule.from_dict）
+                     {"name": "no-reboot", "command": "reboot|poweroff", "reason": "禁止重启"}],
+            "disable": ["chmod-root"]               // 停用的内置规则
+        }
+    """
+    def __init__(self, rules=None, allow=(), deny=(), disable=()):
+        rules = list(BUILTIN_RULES if rules is None else rules)
+        self.disabled = set(disable)
+        self.rules = [rule for rule in rules if rule.name not in self.disabled]
+        self.allow_re = self._combine(allow)
+        self.deny_patterns = list(deny)
+        self.deny_re = self._combine(deny)
+
+    @classmethod
+    def from_file(cls, path=None):
+        """读取策略文件（不存在或格式错误时只使用内置规则）"""
+        path = Path(path) if path else Path.home() / '.aicmd' / 'policy.json'
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"警告：无法读取安全策略文件 {path}: {e}")
+            return cls()
+
+        rules = list(BUILTIN_RULES)
+        deny = []
+        try:
+            for item in data.get('deny', []):
+                if isinstance(item, dict):
+                    rules.append(Rule.from_dict(item))
+                else:
+                    deny.append(item)
+            return cls(rules, allow=data.get('allow', []), deny=deny, disable=data.get('disable', []))
+        except (KeyError, TypeError, re.error) as e:
+            print(f"警告：安全策略文件 {path} 有误，只使用内置规则: {e}")
+            return cls()
+
+    @staticmethod
+    def _combine(patterns):
+        """把多个正则合并为一个（每个正则一个命名分组，用于确定命中的是哪一条）"""
+        if not patterns:
+            return None
+        return re.compile('|'.join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(patterns)))
+
+    def check(self, command, depth=0):
+        """检查命令
+
+        Returns:
+            Verdict: 结果，可直接作为布尔值（True 表示允许）
+        """
+        if _FORK_BOMB_RE.search(command):
+            return Verdict(False, 'fork-bomb', 'fork 炸弹', command)
+
+        for argv, redirects in split_commands(command):
+            verdict = self._check_segment(argv, redirects, depth)
+            if not verdict.allowed:
+                return verdict
+        return ALLOWED
+
+    def _check_segment(self, argv, redirects, depth):
+        for target in redirects:
+            if _BLOCK_DEVICE_RE.match(target):
+                return Verdict(False, 'redirect-device', '重定向写入磁盘设备', f"> {target}")
+
+        argv = unwrap(argv)
+        if not argv:
+            return ALLOWED
+        text = ' '.join(argv)
+        if self.allow_re is not None and self.allow_re.search(text):
+            return ALLOWED
+
+        name = posixpath.basename(argv[0])
+        # sh -c '...' 和 eval '...' 检查其中的命令
+        script = None
+        if name in SHELLS:
+            script = shell_script(argv)
+        elif name == 'eval' and len(argv) > 1:
+            script = ' '.join(argv[1:])
+        if script is not None and depth < 3:
+            verdict = self.check(script, depth + 1)
+            if not verdict.allowed:
+                return verdict
+
+        if self.deny_re is not None:
+            match = self.deny_re.search(text)
+            if match:
+                pattern = self.deny_patterns[int(match.lastgroup[1:])]
+                return Verdict(False, pattern, '策略文件禁止', text)
+
+        flags, args = parse_options(argv[1:])
+        args = [normalize_path(arg) for arg in args]
+        for rule in self.rules:
+            if rule.matches(name, flags, args):
+                return Verdict(False, rule.name, rule.reason, text)
+        # find 的动作是 -delete 这样的单个词，不能按短选项拆开，单独检查
+        if name == 'find' and 'find-delete' not in self.disabled and find_deletes(argv):
+            return Verdict(False, 'find-delete', '在根目录、家目录或系统目录中查找并删除', text)
+        return ALLOWED
+
+
+_policy = None
+
+
+def get_policy():
+    """进程内共用的策略（首次使用时读取策略文件）"""
+    global _policy
+    if _policy is None:
+        _policy = CommandPolicy.from_file()
+    return _policy
@@ -0,0 +1,319 @@
+import codecs
+import os
+import re
+import selectors
+import subprocess
+import sys
+import time
+from collections import deque
+
+# 终端控制序列（颜色、光标移动等），保存到输出尾部前去除
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07')
+
+
+class OutputTail:
+    """固定容量的输出缓冲区，只保留最近的 max_chars 个字符"""
+    def __init__(self, max_chars=64 * 1024):
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self._chunks = deque()
+        self._size = 0
+
+    def write(self, text):
+        """追加文本，超出容量时丢弃最早的内容"""
+        if not text:
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        self.total_chars += len(text)
+
+        while self._size > self.max_chars:
+            first = self._chunks[0]
+            excess = self._size - self.max_chars
+            if len(first) <= excess:
+                self._chunks.popleft()
+                self._size -= len(first)
+            else:
+                self._chunks[0] = first[excess:]
+                self._size -= excess
+
+    @property
+    def dropped_chars(self):
+        """被丢弃的字符数"""
+        return self.total_chars - self._size
+
+    def getvalue(self):
+        """获取缓冲区内容，有内容被丢弃时在开头注明"""
+        text = ''.join(self._chunks)
+        if self.dropped_chars:
+            return f"[输出过长，已省略前 {self.dropped_chars} 个字符]\n{text}"
+        return text
+
+
+class CommandResult:
+    """单条命令的执行结果"""
+    def __init__(self, command, output='', stdout='', stderr='', exit_code=None, wall_time=0.0, rusage=None):
+        self.command = command
+        self.output = output  # stdout 与 stderr 按到达顺序合并（PTY 模式下只有该字段）
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_code = exit_code
+        self.wall_time = wall_time
+        self.rusage = rusage or {}
+
+    @property
+    def success(self):
+        """命令是否执行成功"""
+        return self.exit_code == 0
+
+    def summary(self):
+        """简短的执行摘要，如：退出码 0，耗时 0.52秒，CPU 0.10秒"""
+        parts = [f"退出码 {self.exit_code}", f"耗时 {self.wall_time:.2f}秒"]
+        if self.rusage:
+            cpu = self.rusage.get('user_time', 0.0) + self.rusage.get('system_time', 0.0)
+            parts.append(f"CPU {cpu:.2f}秒")
+        return "，".join(parts)
+
+    def to_dict(self):
+        """转换为字典（不含输出内容）"""
+        return {
+            'command': self.command,
+            'exit_code': self.exit_code,
+            'wall_time': round(self.wall_time, 4),
+            'rusage': self.rusage,
+        }
+
+
+class CommandRunner:
+    """命令运行器
+
+    交互式终端下通过 PTY 执行命令：子进程认为自己连着真实终端，保留颜色和交互能力，
+    键盘输入原样转发给子进程。非终端环境（或调用方要求分开 stdout/stderr）时使用管道，
+    通过 selector 同时读取两个流。两种模式都边执行边回显，只保留输出尾部，内存占用恒定，
+    并记录退出码、耗时和资源占用。
+    """
+    READ_SIZE = 65536
+
+    def __init__(self, max_output=64 * 1024):
+        self.max_output = max_output
+
+    @staticmethod
+    def pty_available():
+        """当前环境是否可以使用 PTY"""
+        try:
+            return os.name == 'posix' and sys.stdin.isatty() and sys.stdout.isatty()
+        except (AttributeError, ValueError):
+            return False
+
+    def run(self, command, echo=True, use_pty=None, env=None):
+        """执行命令
+
+        Args:
+            command: shell 命令字符串
+            echo: 是否实时回显输出
+            use_pty: 是否使用 PTY，None 表示自动判断
+            env: 子进程环境变量，None 表示继承当前环境
+
+        Returns:
+            CommandResult: 执行结果
+        """
+        if use_pty is None:
+            use_pty = self.pty_available()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        start = time.monotonic()
+        if os.name != 'posix':
+            result = self._run_communicate(command, echo, env)
+        elif use_pty:
+            result = self._run_pty(command, echo, env)
+        else:
+            result = self._run_pipes(command, echo, env)
+        result.wall_time = time.monotonic() - start
+        return result
+
+    def _run_communicate(self, command, echo, env):
+        """Windows 等不支持对管道使用 selector 的平台：等待命令结束后一次性读取"""
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace',
+            env=env,
+        )
+        stdout, stderr = process.communicate()
+        if echo:
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+        tails = [OutputTail(self.max_output) for _ in range(3)]
+        tails[0].write(stdout + stderr)
+        tails[1].write(stdout)
+        tails[2].write(stderr)
+        return CommandResult(
+            command,
+            output=tails[0].getvalue(),
+            stdout=tails[1].getvalue(),
+            stderr=tails[2].getvalue(),
+            exit_code=process.returncode,
+        )
+
+    def _run_pipes(self, command, echo, env):
+        """通过管道执行命令，分别保留 stdout 和 stderr"""
+        merged = OutputTail(self.max_output)
+        tails = {'stdout': OutputTail(self.max_output), 'stderr': OutputTail(self.max_output)}
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+
+        with selectors.DefaultSelector() as selector:
+            for name, stream, target in (('stdout', process.stdout, sys.stdout), ('stderr', process.stderr, sys.stderr)):
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                selector.register(stream, selectors.EVENT_READ, (target, decoder, tails[name]))
+
+            try:
+                self._drain(selector, merged, echo)
+            except KeyboardInterrupt:
+                # 用户中断：结束子进程，再把残留输出读完
+                if process.poll() is None:
+                    process.terminate()
+                self._drain(selector, merged, echo, deadline=time.monotonic() + 1.0)
+                merged.write('^C\n')
+
+            for key in list(selector.get_map().values()):
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+
+        exit_code, rusage = self._wait(process.pid)
+        process.returncode = exit_code
+        return CommandResult(
+            command,
+            output=merged.getvalue(),
+            stdout=tails['stdout'].getvalue(),
+            stderr=tails['stderr'].getvalue(),
+            exit_code=exit_code,
+            rusage=rusage,
+        )
+
+    def _drain(self, selector, merged, echo, deadline=None):
+        """读取所有已注册的流直到 EOF（或超过 deadline）"""
+        while selector.get_map():
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+            for key, _ in selector.select(timeout):
+                target, decoder, tail = key.data
+                data = os.read(key.fd, self.READ_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    text = decoder.decode(b'', final=True)
+                else:
+                    text = decoder.decode(data)
+                    if echo:
+                        self._echo(target, data, text)
+                tail.write(text)
+                merged.write(text)
+
+    def _run_pty(self, command, echo, env):
+        """通过 PTY 执行命令，转发键盘输入，输出合并为一个流"""
+        import pty
+        import termios
+        import tty
+
+        tail = OutputTail(self.max_output)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        pid, master_fd = pty.fork()
+        if pid == 0:
+            # 子进程：执行命令
+            try:
+                if env is None:
+                    os.execv('/bin/sh', ['/bin/sh', '-c', command])
+                else:
+                    os.execve('/bin/sh', ['/bin/sh', '-c', command], env)
+            finally:
+                os._exit(127)
+
+        self._copy_winsize(master_fd)
+        stdin_fd = sys.stdin.fileno()
+        old_attrs = termios.tcgetattr(stdin_fd)
+        try:
+            # 原始模式：按键（包括 Ctrl+C）原样交给子进程所在终端处理
+            tty.setraw(stdin_fd)
+            with selectors.DefaultSelector() as selector:
+                selector.register(master_fd, selectors.EVENT_READ)
+                selector.register(stdin_fd, selectors.EVENT_READ)
+                while True:
+                    events = selector.select()
+                    if any(key.fd == stdin_fd for key, _ in events):
+                        data = os.read(stdin_fd, 1024)
+                        if data:
+                            os.write(master_fd, data)
+                        else:
+                            selector.unregister(stdin_fd)
+                    if any(key.fd == master_fd for key, _ in events):
+                        try:
+                            data = os.read(master_fd, self.READ_SIZE)
+                        except OSError:  # Linux 上子进程关闭终端后读取会返回 EIO
+                            data = b''
+                        if not data:
+                            break
+                        if echo:
+                            os.write(sys.stdout.fileno(), data)
+                        text = decoder.decode(data).replace('\r\n', '\n')
+                        tail.write(ANSI_ESCAPE_RE.sub('', text))
+        finally:
+            termios.tcsetattr(stdin_fd, termios.TCSAFLUSH, old_attrs)
+            os.close(master_fd)
+
+        tail.write(decoder.decode(b'', final=True))
+        exit_code, rusage = self._wait(pid)
+        return CommandResult(command, output=tail.getvalue(), exit_code=exit_code, rusage=rusage)
+
+    @staticmethod
+    def _copy_winsize(master_fd):
+        """把当前终端窗口大小同步给 PTY"""
+        try:
+            import fcntl
+            import termios
+            winsize = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b'\0' * 8)
+            fcntl.ioctl(master_fd, termios.TIOCSWINSZ, winsize)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _wait(pid):
+        """等待子进程结束，返回 (退出码, 资源占用)
+
+        被信号终止时退出码为负的信号编号，与 subprocess 保持一致。
+        """
+        _, status, usage = os.wait4(pid, 0)
+        if os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        rusage = {
+            'user_time': usage.ru_utime,
+            'system_time': usage.ru_stime,
+            'max_rss_kb': usage.ru_maxrss,
+        }
+        return exit_code, rusage
+
+    @staticmethod
+    def _echo(target, data, text):
+        """回显输出，优先写原始字节以保留颜色等控制序列"""
+        buffer = getattr(target, 'buffer', None)
+        if buffer is not None:
+            buffer.write(data)
+            buffer.flush()
+        else:
+            target.write(text)
+            target.flush()
@@ -0,0 +1,547 @@
+import functools
+import re
+
+# 控制符和重定向符，按长度优先匹配
+_OPERATOR_RE = re.compile(r'&&|\|\||;;|\|&|<<<|<<-|&>>|<<|>>|>&|<&|>\||<>|&>|[;|&()<>\n]')
+_OPERATOR_CHARS = frozenset(';|&()<>\n')
+_WHITESPACE = frozenset(' \t\r')
+_ASSIGNMENT_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*=')
+_ARRAY_ASSIGNMENT_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\+?=')
+# [[ ... ]] 中这些符号是比较和逻辑运算，不是重定向、命令列表或子 shell
+_TEST_OPERATORS = frozenset({'<', '>', '(', ')', '&&', '||'})
+
+# 控制符：分隔命令列表
+LIST_OPERATORS = frozenset({';', ';;', '&', '&&', '||', '\n'})
+PIPE_OPERATORS = frozenset({'|', '|&'})
+REDIRECT_OPERATORS = frozenset({'<', '>', '>>', '>|', '<>', '<<', '<<-', '<<<', '>&', '<&', '&>', '&>>'})
+# 写入目标文件的重定向
+WRITE_OPERATORS = frozenset({'>', '>>', '>|', '<>', '&>', '&>>'})
+# here-document：正文从下一行开始，到只有结束符的一行为止
+HEREDOC_OPERATORS = frozenset({'<<', '<<-'})
+# 出现在命令开头的保留字，不属于 argv
+RESERVED_WORDS = frozenset({'!', '{', '}', 'if', 'then', 'else', 'elif', 'fi', 'do', 'done', 'while', 'until', 'esac'})
+# 双引号中反斜杠可以转义的字符
+_DQUOTE_ESCAPES = frozenset('$`"\\\n')
+
+
+class ShellSyntaxError(ValueError):
+    """命令行语法错误（引号或括号不成对）"""
+
+
+class Word:
+    """一个 shell 单词
+
+    raw 为原文（含引号），value 为去掉引号和转义后的值（不展开变量和通配符），
+    substitutions 为其中 $(...) 和 `...` 命令替换的内容。作为 << 的结束符时，
+    heredoc 为 here-document 的原文（正文和结束符所在的行），整体作为数据，不解析其中的命令。
+    """
+    __slots__ = ('raw', 'value', 'substitutions', 'quoted', 'heredoc')
+
+    def __init__(self, raw, value, substitutions=(), quoted=False):
+        self.raw = raw
+        self.value = value
+        self.substitutions = tuple(substitutions)
+        self.quoted = quoted
+        self.heredoc = None
+
+    def __repr__(self):
+        return f"Word({self.raw!r})"
+
+
+class Operator:
+    """控制符或重定向符；fd 为重定向前的文件描述符（如 2>&1 中的 2）"""
+    __slots__ = ('op', 'fd')
+
+    def __init__(self, op, fd=None):
+        self.op = op
+        self.fd = fd
+
+    def __repr__(self):
+        return f"Operator({(self.fd or '') + self.op!r})"
+
+
+class Redirect:
+    """重定向"""
+    def __init__(self, op, target, fd=None):
+        self.op = op
+        self.target = target  # Word，缺少目标时为 None
+        self.fd = fd
+
+    @property
+    def writes(self):
+        """是否写入目标文件（>&1 之类复制描述符的不算）"""
+        if self.op == '>&':
+            return self.target is not None and not self.target.value.isdigit() and self.target.value != '-'
+        return self.op in WRITE_OPERATORS
+
+    @property
+    def here_text(self):
+        """here-document 的正文或 <<< 的字符串（作为命令的标准输入），其他重定向为 None"""
+        if self.target is None:
+            return None
+        if self.op == '<<<':
+            return self.target.value
+        if self.op not in HEREDOC_OPERATORS or self.target.heredoc is None:
+            return None
+        lines = self.target.heredoc.split('\n')
+        if self.op == '<<-':
+            lines = [line.lstrip('\t') for line in lines]
+        if lines[-1] == self.target.value:  # 去掉结束符所在的行
+            lines.pop()
+        return '\n'.join(lines)
+
+    def to_string(self):
+        target = self.target.raw if self.target else ''
+        separator = '' if self.op.endswith('&') else ' '
+        return f"{self.fd or ''}{self.op}{separator}{target}"
+
+
+class SimpleCommand:
+    """简单命令：变量赋值 + 单词 + 重定向"""
+    def __init__(self):
+        self.assignments = []
+        self.words = []
+        self.redirects = []
+
+    @property
+    def argv(self):
+        """参数列表（去掉开头的保留字，如 then / do / {）"""
+        values = [word.value for word in self.words]
+        i = 0
+        while i < len(values) and values[i] in RESERVED_WORDS:
+            i += 1
+        return values[i:]
+
+    @property
+    def name(self):
+        """命令名，没有时为空字符串"""
+        argv = self.argv
+        return argv[0] if argv else ''
+
+    @property
+    def args(self):
+        return self.argv[1:]
+
+    def substitutions(self):
+        """其中所有命令替换的内容"""
+        for word in self.assignments + self.words + [r.target for r in self.redirects if r.target]:
+            yield from word.substitutions
+
+    def is_empty(self):
+        return not (self.assignments or self.words or self.redirects)
+
+    def to_string(self):
+        parts = [word.raw for word in self.assignments + self.words]
+        parts += [redirect.to_string() for redirect in self.redirects]
+        return ' '.join(parts)
+
+
+class Subshell:
+    """( ... ) 子 shell"""
+    def __init__(self, body):
+        self.body = body
+        self.redirects = []
+
+    def to_string(self, render=None):
+        parts = [f"({self.body.to_string(render)})"]
+        parts += [redirect.to_string() for redirect in self.redirects]
+        return ' '.join(parts)
+
+
+class Pipeline:
+    """管道：commands[i] 与 commands[i + 1] 之间的符号为 pipes[i]（| 或 |&）
+
+    pipes[i] 为空字符串表示两条命令直接相连，没有管道（如 f() { ...; } 中的函数名和函数体、
+    case 的模式和其后的命令）。
+    """
+    def __init__(self):
+        self.commands = []
+        self.pipes = []
+
+    def heredocs(self):
+        """其中 here-document 的原文（按出现顺序）"""
+        return [
+            redirect.target.heredoc
+            for command in self.commands
+            for redirect in command.redirects
+            if redirect.target is not None and redirect.target.heredoc is not None
+        ]
+
+    def to_string(self, render=None):
+        parts = []
+        for i, command in enumerate(self.commands):
+            if i:
+                pipe = self.pipes[i - 1]
+                parts.append(f" {pipe} " if pipe else ' ')
+            if isinstance(command, Subshell):
+                parts.append(command.to_string(render))
+            else:
+                parts.append(render(command) if render else command.to_string())
+        return ''.join(parts)
+
+
+class CommandList:
+    """命令列表：items 为 [(Pipeline, 分隔符), ...]，最后一项的分隔符可以为 None"""
+    def __init__(self):
+        self.items = []
+
+    def commands(self):
+        """按顺序遍历所有简单命令（包括子 shell 中的）"""
+        for pipeline, _ in self.items:
+            for command in pipeline.commands:
+                if isinstance(command, Subshell):
+                    yield from command.body.commands()
+                else:
+                    yield command
+
+    @property
+    def first_command(self):
+        return next(self.commands(), None)
+
+    @property
+    def last_command(self):
+        """最后一条简单命令（其输出即整条命令的输出）"""
+        command = None
+        for command in self.commands():
+            pass
+        return command
+
+    def is_simple(self):
+        """是否只有一条简单命令（没有管道、列表和子 shell）"""
+        return (len(self.items) == 1 and len(self.items[0][0].commands) == 1
+                and isinstance(self.items[0][0].commands[0], SimpleCommand))
+
+    def to_string(self, render=None):
+        """重新生成命令行
+
+        Args:
+            render: 生成单条简单命令的函数 render(SimpleCommand) -> str，用于改写命令
+                （如转换为 Windows 命令），None 表示原样输出
+        """
+        parts = []
+        heredocs = []  # 本行的 here-document，在换行之后输出
+        for pipeline, separator in self.items:
+            parts.append(pipeline.to_string(render))
+            heredocs += pipeline.heredocs()
+            if separator == '\n':
+                parts.append('\n')
+                if heredocs:
+                    parts.append('\n'.join(heredocs) + '\n')
+                    heredocs = []
+            elif separator in (';', ';;'):
+                parts.append(f"{separator} ")
+            elif separator:
+                parts.append(f" {separator} ")
+        if heredocs:
+            parts.append('\n' + '\n'.join(heredocs))
+        return ''.join(parts).strip()
+
+
+def tokenize(text):
+    """把命令行切分为 Word 和 Operator（单次线性扫描）
+
+    支持单双引号、反斜杠转义和续行、$(...)、`...`、${...}、# 注释、2>&1 之类带描述符的重定向、
+    here-document（<< 之后的正文不切分，记录在结束符单词的 heredoc 中）、数组赋值 a=(1 2)
+    和 [[ ... ]] 中的 < > ( ) && ||（作为普通单词）。
+
+    Raises:
+        ShellSyntaxError: 引号或括号不成对
+    """
+    tokens = []
+    heredocs = []  # 等待读取正文的 (操作符, 结束符单词)
+    in_test = False  # 是否在 [[ ... ]] 中
+    n = len(text)
+    i = 0
+    while i < n:
+        ch = text[i]
+        if ch in _WHITESPACE:
+            i += 1
+            continue
+        if ch == '#':
+            # 注释到行尾
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if ch in _OPERATOR_CHARS:
+            op = _OPERATOR_RE.match(text, i).group()
+            if in_test and op in _TEST_OPERATORS:
+                tokens.append(Word(op, op))
+                i += len(op)
+                continue
+            tokens.append(Operator(op))
+            i += len(op)
+            if op == '\n':
+                for heredoc_op, delimiter in heredocs:
+                    i = _read_heredoc(text, i, heredoc_op, delimiter)
+                heredocs = []
+            continue
+
+        start = i
+        value = []
+        substitutions = []
+        quoted = False
+        while i < n:
+            ch = text[i]
+            if ch == '(' and _ARRAY_ASSIGNMENT_RE.fullmatch(text, start, i):
+                # 数组赋值：括号中的内容属于这个单词
+                end = _find_closing(text, i)
+                value.append(text[i:end + 1])
+                i = end + 1
+                continue
+            if ch in _WHITESPACE or ch in _OPERATOR_CHARS:
+                break
+            if ch == '\\':
+                if i + 1 < n:
+                    if text[i + 1] != '\n':  # 续行
+                        value.append(text[i + 1])
+                    i += 2
+                else:
+                    value.append(ch)
+                    i += 1
+            elif ch == "'":
+                end = text.find("'", i + 1)
+                if end < 0:
+                    raise ShellSyntaxError("单引号不成对")
+                value.append(text[i + 1:end])
+                quoted = True
+                i = end + 1
+            elif ch == '"':
+                i = _scan_double_quoted(text, i + 1, value, substitutions)
+                quoted = True
+            elif ch == '`':
+                end = _find_backquote(text, i + 1)
+                substitutions.append(text[i + 1:end])
+                value.append(text[i:end + 1])
+                i = end + 1
+            elif ch == '$' and i + 1 < n and text[i + 1] in '({':
+                end = _find_closing(text, i + 1)
+                if text[i + 1] == '(':
+                    substitutions.append(text[i + 2:end])
+                value.append(text[i:end + 1])
+                i = end + 1
+            else:
+                value.append(ch)
+                i += 1
+
+        raw = text[start:i]
+        value = ''.join(value)
+        # 紧挨着重定向符的数字是文件描述符（2>&1、2>err.log）
+        if i < n and text[i] in '<>' and raw.isdigit():
+            op = _OPERATOR_RE.match(text, i).group()
+            tokens.append(Operator(op, fd=raw))
+            i += len(op)
+            continue
+        word = Word(raw, value, substitutions, quoted)
+        if raw == '[[':
+            in_test = True
+        elif raw == ']]':
+            in_test = False
+        if tokens and isinstance(tokens[-1], Operator) and tokens[-1].op in HEREDOC_OPERATORS:
+            heredocs.append((tokens[-1].op, word))
+        tokens.append(word)
+    return tokens
+
+
+def _read_heredoc(text, i, op, delimiter):
+    """读取 here-document（i 为正文开始的位置），返回结束符所在行之后的位置
+
+    没有结束符时正文一直到命令末尾（与 bash 相同）。
+    """
+    n = len(text)
+    start = i
+    while i < n:
+        end = text.find('\n', i)
+        if end < 0:
+            end = n
+        line = text[i:end]
+        if (line.lstrip('\t') if op == '<<-' else line) == delimiter.value:
+            delimiter.heredoc = text[start:end]
+            return min(end + 1, n)
+        i = end + 1
+    delimiter.heredoc = text[start:]
+    return n
+
+
+def _scan_double_quoted(text, i, value, substitutions):
+    """扫描双引号中的内容（i 为左引号之后的位置），返回右引号之后的位置"""
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            return i + 1
+        if ch == '\\' and i + 1 < n and text[i + 1] in _DQUOTE_ESCAPES:
+            if text[i + 1] != '\n':
+                value.append(text[i + 1])
+            i += 2
+        elif ch == '`':
+            end = _find_backquote(text, i + 1)
+            substitutions.append(text[i + 1:end])
+            value.append(text[i:end + 1])
+            i = end + 1
+        elif ch == '$' and i + 1 < n and text[i + 1] in '({':
+            end = _find_closing(text, i + 1)
+            if text[i + 1] == '(':
+                substitutions.append(text[i + 2:end])
+            value.append(text[i:end + 1])
+            i = end + 1
+        else:
+            value.append(ch)
+            i += 1
+    raise ShellSyntaxError("双引号不成对")
+
+
+def _find_backquote(text, i):
+    """查找结束的反引号"""
+    n = len(text)
+    while i < n:
+        if text[i] == '\\':
+            i += 2
+            continue
+        if text[i] == '`':
+            return i
+        i += 1
+    raise ShellSyntaxError("反引号不成对")
+
+
+def _find_closing(text, i):
+    """查找与 text[i]（( 或 {）配对的右括号，跳过其中引号内的内容"""
+    opening = text[i]
+    closing = ')' if opening == '(' else '}'
+    depth = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == "'":
+            end = text.find("'", i + 1)
+            if end < 0:
+                raise ShellSyntaxError("单引号不成对")
+            i = end + 1
+            continue
+        if ch == '"':
+            i = _scan_double_quoted(text, i + 1, [], [])
+            continue
+        if ch == opening:
+            depth += 1
+        elif ch == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ShellSyntaxError(f"{opening} 不成对")
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def parse_list(self, nested=False):
+        result = CommandList()
+        pipeline = Pipeline()
+        command = SimpleCommand()
+        target_for = None  # 等待目标单词的重定向
+        cases = 0  # 未结束的 case 语句数（其中的 ) 结束模式，不是子 shell）
+
+        def append(node):
+            # 和前一条命令之间没有管道符时直接相连
+            if len(pipeline.pipes) < len(pipeline.commands):
+                pipeline.pipes.append('')
+            pipeline.commands.append(node)
+
+        def finish_command():
+            nonlocal command
+            if not command.is_empty():
+                append(command)
+            command = SimpleCommand()
+
+        def at_command_start():
+            return all(word.value in RESERVED_WORDS for word in command.words)
+
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            self.pos += 1
+            if isinstance(token, Word):
+                if target_for is None and not token.quoted and at_command_start():
+                    if token.value == 'case':
+                        cases += 1
+                    elif token.value == 'esac' and cases:
+                        cases -= 1
+                if target_for is not None:
+                    target_for.target = token
+                    target_for = None
+                elif not command.words and _ASSIGNMENT_RE.match(token.raw):
+                    command.assignments.append(token)
+                else:
+                    command.words.append(token)
+                continue
+
+            op = token.op
+            target_for = None
+            if op in REDIRECT_OPERATORS:
+                redirect = Redirect(op, None, token.fd)
+                owner = command
+                if command.is_empty() and pipeline.commands and isinstance(pipeline.commands[-1], Subshell):
+                    owner = pipeline.commands[-1]  # ( ... ) > file
+                owner.redirects.append(redirect)
+                target_for = redirect
+            elif op in PIPE_OPERATORS:
+                finish_command()
+                pipeline.pipes.append(op)
+            elif op in LIST_OPERATORS:
+                finish_command()
+                if pipeline.commands:
+                    result.items.append((pipeline, op))
+                pipeline = Pipeline()
+            elif op == '(' and cases and (command.is_empty() or command.words[-1].value == 'in'):
+                # case 模式前可选的 (
+                command.words.append(Word('(', '('))
+            elif op == '(' and self._next_op() == ')' and len(command.words) == 1:
+                # 函数定义 f() { ...; }：函数名和函数体是相连的两条命令
+                self.pos += 1
+                name = command.words[0]
+                command.words[0] = Word(name.raw + '()', name.value + '()')
+                finish_command()
+            elif op == '(':
+                finish_command()
+                append(Subshell(self.parse_list(nested=True)))
+            elif op == ')' and cases and command.words:
+                # case 模式结束，之后是这个分支的命令
+                last = command.words[-1]
+                command.words[-1] = Word(last.raw + ')', last.value + ')', last.substitutions, last.quoted)
+                finish_command()
+            elif op == ')':
+                if nested:
+                    break
+                raise ShellSyntaxError(") 不成对")
+        else:
+            if nested:
+                raise ShellSyntaxError("( 不成对")
+
+        finish_command()
+        if pipeline.commands:
+            result.items.append((pipeline, None))
+        # 多余的管道符（如 "ls |"）不影响已有的命令
+        for pipeline, _ in result.items:
+            del pipeline.pipes[max(len(pipeline.commands) - 1, 0):]
+        return result
+
+    def _next_op(self):
+        """下一个符号是控制符时返回它"""
+        if self.pos < len(self.tokens) and isinstance(self.tokens[self.pos], Operator):
+            return self.tokens[self.pos].op
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def parse(command):
+    """解析命令行，返回 CommandList
+
+    结果会被缓存，执行器、转换器、安全检查和着色共用同一棵语法树，调用方不应修改。
+
+    Raises:
+        ShellSyntaxError: 引号或括号不成对
+    """
+    return _Parser(tokenize(command)).parse_list()
@@ -1,157 +1,72 @@
+import asyncio
+import functools
 import os
+import signal
 import sys
+import threading
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import Completer, Completion
-from prompt_toolkit.history import FileHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.patch_stdout import patch_stdout
 from colorama import Fore, Style, init
 from ..utils.emoji import EmojiSupport
+from ..utils.history_index import IndexedFileHistory
 from prompt_toolkit.formatted_text import FormattedText
 from prompt_toolkit.styles import Style as PromptStyle
 import glob
 import time
 import platform
 from .base import BaseTerminal  # 从 base.py 导入基类
+from .runner import CommandRunner, CommandResult
+from .completion import CompletionEngine
+from ..ai.context import ContextBuilder
+from ..prompts.base import COMMAND_RESULT_PROMPT
 
 # 初始化 colorama
 init()
 
 class SimpleCompleter(Completer):
-    """简单的补全器实现"""
-    def __init__(self, session):
-        self.commands = self._get_commands()
+    """补全器：把 CompletionEngine 的候选转换为 prompt_toolkit 的补全项"""
+    def __init__(self, session, engine=None):
         self.session = session  # 保存 session 引用
-        self.completion_cache = set()  # 添加缓存集合
-    
-    def _get_commands(self):
-        """获取系统命令"""
-        commands = {'cd', 'ls', 'pwd', 'exit', 'help'}
-        try:
-            paths = os.environ.get('PATH', '').split(os.pathsep)
-            for path in paths:
-                if os.path.exists(path):
-                    for item in os.listdir(path):
-                        full_path = os.path.join(path, item)
-                        if os.path.isfile(full_path) and os.access(full_path, os.X_OK):
-                            commands.add(item)
-        except Exception as e:
-            print(f"Warning: Error getting commands: {e}")
-        return sorted(commands)
-    
+        self.engine = engine or CompletionEngine(history_index=session.history.index)
+
+    @property
+    def command_index(self):
+        return self.engine.command_index
+
+    @property
+    def dir_cache(self):
+        return self.engine.dir_cache
+
     def get_completions(self, document, complete_event):
-        """获取补全项"""
-        word = document.get_word_before_cursor()
-        text_before_cursor = document.text_before_cursor
-        
-        # 先检查是否是历史命令补全
-        if word and not text_before_cursor.startswith(('cd ', 'ls ')):
-            # 从会话历史记录中查找匹配的命令
-            history = self.session.history.get_strings()
-            for cmd in reversed(history):  # 倒序遍历，最新的命令优先
-                if cmd.startswith(word) and cmd not in self.completion_cache:
-                    self.completion_cache.add(cmd)  # 添加到缓存
-                    yield Completion(
-                        cmd,
-                        start_position=-len(word),
-                        display_meta='history'
-                    )
-        
-        # 然后是路径补全
-        if text_before_cursor.startswith('cd ') or text_before_cursor.startswith('ls '):
-            # 路径补全
-            cmd_parts = text_before_cursor.split(maxsplit=1)
-            path = cmd_parts[1] if len(cmd_parts) > 1 else ''
-            
-            # 处理删除后的路径
-            if '/' in path:
-                # 获取最后一个 / 之前的路径作为基础目录
-                base_path = path.rsplit('/', 1)[0]
-                search_pattern = path.rsplit('/', 1)[1]
-            else:
-                base_path = ''
-                search_pattern = path
-            
-            # 获取要补全的目录
-            if base_path.startswith('~'):
-                base_dir = os.path.expanduser(base_path)
-            elif base_path.startswith('/'):
-                base_dir = base_path
-            elif base_path:
-                base_dir = os.path.join(os.getcwd(), base_path)
-            else:
-                base_dir = os.getcwd()
-            
-            try:
-                # 确保基础目录存在
-                if not os.path.exists(base_dir):
-                    base_dir = os.getcwd()
-                
-                # 列出目录内容
-                items = os.listdir(base_dir)
-                
-                # 过滤和排序
-                items = [
-                    item for item in items
-                    if item.startswith(search_pattern) and not item.startswith('.')
-                ]
-                
-                # 先显示目录，再显示文件
-                dirs = []
-                files = []
-                for item in sorted(items):
-                    full_path = os.path.join(base_dir, item)
-                    if os.path.isdir(full_path):
-                        dirs.append((item, full_path))
-                    else:
-                        files.append((item, full_path))
-                
-                # 生成补全项
-                for item, full_path in dirs + files:
-                    display = item + ('/' if os.path.isdir(full_path) else '')
-                    
-                    # 计算补全文本
-                    if base_path:
-                        if base_path.startswith('/'):
-                            completion = os.path.join(base_path, item)
-                        elif base_path.startswith('~'):
-                            completion = os.path.join(base_path, item)
-                        else:
-                            rel_path = os.path.relpath(full_path, os.getcwd())
-                            completion = rel_path
-                    else:
-                        if path.startswith('/'):
-                            completion = full_path
-                        elif path.startswith('~'):
-                            completion = os.path.join('~', item)
-                        else:
-                            completion = './' + item
-                    
-                    # 确保使用 Unix 风格路径
-                    completion = completion.replace('\\', '/')
-                    
-                    # 确保目录以 / 结尾
-                    if os.path.isdir(full_path) and not completion.endswith('/'):
-                        completion += '/'
-                    
-                    yield Completion(
-                        completion,
-                        start_position=-len(path),
-                        display=display,
-                        display_meta='dir' if os.path.isdir(full_path) else 'file'
-                    )
-                    
-            except Exception as e:
-                pass
-                
-        else:
-            # 命令补全
-            for cmd in self.commands:
-                if cmd.startswith(word):
-                    yield Completion(
-                        cmd,
-                        start_position=-len(word)
-                    )
+        """获取补全项（匹配的字符加下划线显示）"""
+        try:
+            candidates = self.engine.complete(document.text_before_cursor)
+        except Exception:
+            return  # 补全出错时不显示补全项，不能打断输入
+        for candidate in candidates:
+            yield Completion(
+                candidate.text,
+                start_position=candidate.start_position,
+                display=self._highlight(candidate.display, candidate.positions),
+                display_meta=candidate.meta
+            )
+
+    def prefetch(self, text):
+        """选中目录补全项后，在后台预读该目录及其子目录"""
+        self.engine.prefetch(text)
+
+    @staticmethod
+    def _highlight(text, positions):
+        if not positions:
+            return text
+        matched = set(positions)
+        return FormattedText([
+            ('class:fuzzymatch.inside.character' if i in matched else '', ch)
+            for i, ch in enumerate(text)
+        ])
 
 class UnixTerminal(BaseTerminal):
     """Unix 终端实现"""
@@ -166,7 +81,7 @@ class UnixTerminal(BaseTerminal):
         
         # 创建会话
         self.session = PromptSession(
-            history=FileHistory(history_file),
+            history=IndexedFileHistory(history_file),
             auto_suggest=AutoSuggestFromHistory(),
             key_bindings=self._create_key_bindings(),
             style=self._create_style(),
@@ -182,14 +97,32 @@ class UnixTerminal(BaseTerminal):
         
         # 设置补全器
         self.session.completer = self.completer
+        self.complete_while_typing = False  # 由 configure_completion 根据配置开启
         
-        # 创建输出捕获管道
-        self.output_pipe = os.pipe() if hasattr(os, 'pipe') else None
+        # 命令运行器（流式读取输出，只保留尾部供 AI 分析）
+        self.runner = CommandRunner()
+        self.context_builder = ContextBuilder()
         
         # 添加历史记录跟踪
         self.command_history = []
         self.output_history = []
+        self.result_history = []
         self.chat_history = []
+        
+        # 后台进行中的 AI 查询
+        self.ai_task = None
+        self.ai_task_started = 0.0
+
+    def configure_completion(self, settings):
+        """根据配置（completion.*）设置补全"""
+        self.completer.engine = CompletionEngine.from_settings(
+            settings,
+            history_index=self.session.history.index,
+            command_index=self.completer.command_index,
+        )
+        self.complete_while_typing = settings.get('completion.while_typing', False)
+        # prompt_toolkit 开启历史前缀搜索（上箭头）时不会边输入边补全，二者只能选一
+        self.session.enable_history_search = not self.complete_while_typing
 
     def _create_key_bindings(self):
         """创建按键绑定"""
@@ -200,7 +133,10 @@ class UnixTerminal(BaseTerminal):
         
         @bindings.add('c-c')
         def _(event):
-            """处理 Ctrl+C"""
+            """处理 Ctrl+C：有进行中的 AI 回答时取消回答，否则双击退出"""
+            if self.cancel_ai_task():
+                print("已取消 AI 回答")
+                return
             current_time = time.time()
             if current_time - self.last_ctrl_c_time < 0.5:  # 0.5秒内双击
                 print(f"\n{self.emoji.get('👋')} 再见！")
@@ -277,6 +213,7 @@ class UnixTerminal(BaseTerminal):
                 
                 # 如果是目录，立即开始新的补全
                 if completion.text.endswith('/'):
+                    self.completer.prefetch(b.document.text_before_cursor)
                     b.start_completion(select_first=False)
                 else:
                     b.complete_state = None
@@ -292,6 +229,7 @@ class UnixTerminal(BaseTerminal):
                 
                 # 如果是目录，立即开始新的补全
                 if completion.text.endswith('/'):
+                    self.completer.prefetch(b.document.text_before_cursor)
                     b.start_completion(select_first=False)
                 else:
                     b.insert_text(' ')
@@ -335,42 +273,50 @@ class UnixTerminal(BaseTerminal):
         ])
 
     def _capture_output(self, command):
-        """捕获命令输出"""
-        if not self.output_pipe:
-            # 如果不支持 pipe，直接执行
-            return os.popen(command).read()
-            
-        # 保存原始文件描述符
-        stdout_fd = os.dup(1)
-        stderr_fd = os.dup(2)
+        """执行命令，实时回显输出并返回输出尾部"""
+        return self._run_command(command).output
+
+    def _run_command(self, command):
+        """执行命令并记录结果（退出码、耗时、资源占用）"""
+        if command.startswith('@') and self.fanout is not None:
+            result = self._run_fanout(command)
+        else:
+            result = self.runner.run(command)
+        self.result_history.append(result)
+        self.output_history.append(result.output)
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def _run_fanout(self, command):
+        """在多台主机上执行命令：@ 命令（全部主机）或 @主机1,web* 命令
+
+        各主机的输出带主机名前缀实时显示，结束后显示按输出去重的摘要，
+        记入上下文的也只是摘要。
+        """
+        spec = command[1:]
+        if spec.startswith(' '):
+            target, remote_command = '', spec
+        else:
+            target, _, remote_command = spec.partition(' ')
+        remote_command = remote_command.strip()
+        hosts = self.fanout.select_hosts(target)
+        if not remote_command or not hosts:
+            message = "用法：@ 命令 或 @主机1,web* 命令" if not remote_command else \
+                f"没有可用的主机，请在 {self.fanout.hosts_file} 中每行填写一个主机"
+            print(message)
+            return CommandResult(command, output=message, exit_code=1)
         
-        # 重定向输出到管道
-        os.dup2(self.output_pipe[1], 1)
-        os.dup2(self.output_pipe[1], 2)
+        print(f"{Fore.CYAN}在 {len(hosts)} 台主机上执行：{remote_command}{Style.RESET_ALL}")
+        print_lock = threading.Lock()
         
-        try:
-            # 执行命令
-            os.system(command)
-            
-            # 刷新输出
-            sys.stdout.flush()
-            sys.stderr.flush()
-            
-            # 读取输出
-            os.close(self.output_pipe[1])
-            output = os.read(self.output_pipe[0], 65536).decode('utf-8', errors='replace')
-            
-            # 创建新的管道
-            self.output_pipe = os.pipe()
-            
-            return output
-            
-        finally:
-            # 恢复原始文件描述符
-            os.dup2(stdout_fd, 1)
-            os.dup2(stderr_fd, 2)
-            os.close(stdout_fd)
-            os.close(stderr_fd)
+        def on_output(host, line):
+            with print_lock:
+                print(f"{Fore.CYAN}[{host}]{Style.RESET_ALL} {line}")
+        
+        fanout_result = self.fanout.run(remote_command, hosts=hosts, on_output=on_output)
+        print(fanout_result.summary())
+        return fanout_result.to_command_result(command)
 
     def _build_context(self):
         """构建上下文信息"""
@@ -382,13 +328,14 @@ class UnixTerminal(BaseTerminal):
         context.append(f"Python版本: {sys.version.split()[0]}")
         context.append("")
         
-        # 添加最近的命令历史和输出
+        # 添加最近的命令历史和输出（受 token 预算限制）
         context.append("=== 最近操作 ===")
-        for i, (cmd, output) in enumerate(zip(self.command_history[-5:], self.output_history[-5:])):
-            context.append(f"命令[{i+1}]: {cmd}")
-            if output.strip():
-                context.append(f"输出[{i+1}]:\n{output.strip()}")
-            context.append("")
+        entries = [
+            {'command': r.command, 'output': r.output, 'exit_code': r.exit_code}
+            for r in self.result_history[-20:]
+        ]
+        context.append(self.context_builder.build(entries, title=""))
+        context.append("")
         
         # 添加聊天历史
         if self.chat_history:
@@ -404,13 +351,27 @@ class UnixTerminal(BaseTerminal):
         """运行终端"""
         try:
             self.show_welcome()
+            asyncio.run(self._run_async())
+        except Exception as e:
+            print(f"{Fore.RED}运行时错误: {str(e)}{Style.RESET_ALL}")
+            sys.exit(1)
+
+    async def _run_async(self):
+        """事件循环中的主循环
+
+        AI 回答在后台任务中流式输出到提示符上方，等待回答时仍可输入和执行命令；
+        命令在线程池中执行，不阻塞正在进行的 AI 回答。
+        """
+        loop = asyncio.get_event_loop()
+        with patch_stdout(raw=True):
             while True:
                 try:
-                    command = self.session.prompt(
+                    command = await self.session.prompt_async(
                         self.get_prompt(),
+                        rprompt=self._ai_status,
                         enable_suspend=True,
                         enable_open_in_editor=True,
-                        complete_while_typing=False,
+                        complete_while_typing=self.complete_while_typing,
                         complete_in_thread=True
                     )
                     
@@ -429,24 +390,29 @@ class UnixTerminal(BaseTerminal):
                     self.command_history.append(command)
                         
                     if command.startswith('/') or is_chinese:
-                        # AI 问答模式
+                        # AI 问答模式：在后台任务中请求，立即回到提示符
                         query = command[1:] if command.startswith('/') else command
-                        if self.callback:
-                            context = self._build_context()
-                            response = self.callback(query)
-                            
-                            # 如果是 Agent 模式，等待用户执行命令后再继续
-                            if hasattr(self, 'agent_mode') and self.agent_mode:
-                                continue  # 直接返回到命令行，让用户执行命令
+                        self._start_ai_task(query)
                     else:
-                        # 执行命令并记录输出
-                        output = self._capture_output(command)
-                        self.output_history.append(output)
-                        print(output, end='')
+                        # 执行命令（输出已实时回显）并记录结果
+                        fanout = command.startswith('@') and self.fanout is not None
+                        if fanout:
+                            # 批量执行期间 Ctrl+C 只取消执行，不退出程序
+                            loop.add_signal_handler(signal.SIGINT, self.fanout.cancel)
+                        try:
+                            result = await loop.run_in_executor(None, self._run_command, command)
+                        finally:
+                            if fanout:
+                                loop.remove_signal_handler(signal.SIGINT)
                         
                         # 如果是 Agent 模式，将结果发送给 AI 分析
-                        if hasattr(self, 'agent_mode') and self.agent_mode and self.callback:
-                            self.callback(f"命令 '{command}' 已执行，输出为：\n{output}\n请分析结果并告诉我下一步该怎么做。")
+                        if hasattr(self, 'agent_mode') and self.agent_mode:
+                            output = self._compact_output(result.output)
+                            self._start_ai_task(COMMAND_RESULT_PROMPT.format(
+                                command=command,
+                                summary=result.summary(),
+                                output=output
+                            ), route=self.route_for_output(output))
                             
                 except KeyboardInterrupt:
                     print('^C')
@@ -454,10 +420,64 @@ class UnixTerminal(BaseTerminal):
                 except EOFError:
                     print(f"\n{self.emoji.get('👋')} 再见！")
                     break
-                    
-        except Exception as e:
-            print(f"{Fore.RED}运行时错误: {str(e)}{Style.RESET_ALL}")
-            sys.exit(1)
+            
+            self.cancel_ai_task()
+
+    def _compact_output(self, output):
+        """压缩发送给 AI 的命令输出，明显缩短时提示压缩前后的 token 数"""
+        compacted = self.context_builder.limit(output)
+        before, after = self.context_builder.compactor.last_stats or (0, 0)
+        if before > after * 2:
+            print(f"\033[2m[输出已压缩：约 {before} → {after} token]\033[0m")
+        return compacted
+
+    def _start_ai_task(self, query, route=None):
+        """在后台任务中处理 AI 查询，正在进行的上一个查询会被取消
+
+        Args:
+            route: 请求使用的路由名，None 表示根据问题自动判断
+        """
+        if self.async_callback is None and self.callback is None:
+            return
+        if self.cancel_ai_task():
+            print("已取消上一个 AI 回答")
+        
+        if self.async_callback is not None:
+            coro = self.async_callback(query, route=route)
+        else:
+            coro = self._run_callback_in_executor(query, route)
+        self.ai_task = asyncio.ensure_future(coro)
+        self.ai_task_started = time.perf_counter()
+        self.ai_task.add_done_callback(self._on_ai_task_done)
+
+    async def _run_callback_in_executor(self, query, route=None):
+        """没有异步回调时，在线程池中调用同步回调"""
+        await asyncio.get_event_loop().run_in_executor(None, functools.partial(self.callback, query, route=route))
+
+    def cancel_ai_task(self):
+        """取消正在进行的 AI 查询，返回是否有查询被取消"""
+        task = self.ai_task
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def _on_ai_task_done(self, task):
+        """AI 任务结束：显示未处理的异常"""
+        if task is self.ai_task:
+            self.ai_task = None
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            print(f"{Fore.RED}AI 查询失败: {str(error)}{Style.RESET_ALL}")
+
+    def _ai_status(self):
+        """提示符右侧的 AI 状态（等待回答时显示已用时间）"""
+        if self.ai_task is None or self.ai_task.done():
+            return ''
+        elapsed = time.perf_counter() - self.ai_task_started
+        return FormattedText([('class:ai', f'AI 回答中 {elapsed:.1f}秒 · Ctrl+C 取消')])
 
     def _get_shortened_path(self, path):
         """获取简化的路径"""
@@ -6,12 +6,13 @@ from prompt_toolkit.completion import Completer, Completion
 from prompt_toolkit.formatted_text import FormattedText, HTML
 from prompt_toolkit.styles import Style as PromptStyle
 from prompt_toolkit.key_binding import KeyBindings
-from prompt_toolkit.history import FileHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from colorama import init, Fore, Style
 from ..utils.emoji import EmojiSupport
+from ..utils.history_index import IndexedFileHistory
 import time
 from .base import BaseTerminal  # 从 base.py 导入基类
+from ..ai.context import ContextBuilder
 import platform
 
 # 初始化 colorama 以支持 Windows 彩色输出
@@ -30,7 +31,7 @@ class WindowsTerminal(BaseTerminal):
         
         # 创建会话
         self.session = PromptSession(
-            history=FileHistory(history_file),
+            history=IndexedFileHistory(history_file),
             auto_suggest=AutoSuggestFromHistory(),
             key_bindings=self._create_key_bindings(),
             style=self._create_style(),
@@ -47,6 +48,8 @@ class WindowsTerminal(BaseTerminal):
         # 设置补全器
         self.session.completer = self.completer
         
+        self.context_builder = ContextBuilder()
+        
         # 添加历史记录跟踪
         self.command_history = []
         self.output_history = []
@@ -57,7 +60,7 @@ class WindowsTerminal(BaseTerminal):
         class WindowsCompleter(Completer):
             def __init__(self, session):
                 self.session = session  # 保存 session 引用
-                self.completion_cache = set()  # 添加缓存集合
+                self.history_limit = 20  # 每次最多补全的历史命令数
                 
             def get_completions(self, document, complete_event):
                 word = document.get_word_before_cursor()
@@ -65,16 +68,13 @@ class WindowsTerminal(BaseTerminal):
                 
                 # 先检查是否是历史命令补全
                 if word and not text_before_cursor.startswith(('cd ', 'dir ')):
-                    # 从会话历史记录中查找匹配的命令
-                    history = self.session.history.get_strings()
-                    for cmd in reversed(history):  # 倒序遍历，最新的命令优先
-                        if cmd.startswith(word) and cmd not in self.completion_cache:
-                            self.completion_cache.add(cmd)  # 添加到缓存
-                            yield Completion(
-                                cmd,
-                                start_position=-len(word),
-                                display_meta='history'
-                            )
+                    # 从历史索引中查找匹配的命令（按使用频率和最近程度排序）
+                    for cmd in self.session.history.index.search(word, limit=self.history_limit):
+                        yield Completion(
+                            cmd,
+                            start_position=-len(word),
+                            display_meta='history'
+                        )
                 
                 # 然后是路径补全
                 if text_before_cursor.startswith('cd ') or text_before_cursor.startswith('dir '):
@@ -317,11 +317,12 @@ class WindowsTerminal(BaseTerminal):
         context.append("")
         
         context.append("=== 最近操作 ===")
-        for i, (cmd, output) in enumerate(zip(self.command_history[-5:], self.output_history[-5:])):
-            context.append(f"命令[{i+1}]: {cmd}")
-            if output.strip():
-                context.append(f"输出[{i+1}]:\n{output.strip()}")
-            context.append("")
+        entries = [
+            {'command': cmd, 'output': output}
+            for cmd, output in zip(self.command_history[-20:], self.output_history[-20:])
+        ]
+        context.append(self.context_builder.build(entries, title=""))
+        context.append("")
         
         if self.chat_history:
             context.append("=== 对话历史 ===")
@@ -378,7 +379,9 @@ class WindowsTerminal(BaseTerminal):
                         
                         # 如果是 Agent 模式，将结果发送给 AI 分析
                         if hasattr(self, 'agent_mode') and self.agent_mode and self.callback:
-                            self.callback(f"命令 '{command}' 已执行，输出为：\n{output}\n请分析结果并告诉我下一步该怎么做。")
+                            output = self.context_builder.limit(output)
+                            self.callback(f"命令 '{command}' 已执行，输出为：\n{output}\n请分析结果并告诉我下一步该怎么做。",
+                                          route=self.route_for_output(output))
                             
                 except KeyboardInterrupt:
                     print('^C')
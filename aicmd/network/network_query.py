@@ -2,10 +2,13 @@
 import requests
 from bs4 import BeautifulSoup
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
-def search_segmentfault(query):
+def search_segmentfault(query, session=None, timeout=10):
     """
     通过 SegmentFault 搜索相关技术问题
+
+    session 为共用的 requests.Session（保持长连接），未指定时使用 requests.get
     """
     # 对查询关键词进行编码
     encoded_query = urllib.parse.quote(query)
@@ -22,7 +25,7 @@ def search_segmentfault(query):
     
     results = []
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = (session or requests).get(url, headers=headers, timeout=timeout)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
             # 根据 SegmentFault 的 HTML 结构选择合适的 CSS 选择器
@@ -48,9 +51,9 @@ def search_segmentfault(query):
     
     return results
 
-def search_csdn(query):
+def search_csdn(query, session=None, timeout=10):
     """
-    通过 CSDN 搜索相关技术问题
+    通过 CSDN 搜索相关技术问题（session 同 search_segmentfault）
     """
     encoded_query = urllib.parse.quote(query)
     # 假设 CSDN 搜索使用如下 URL（CSDN 搜索地址可能有多种，此处仅供示例）
@@ -66,7 +69,7 @@ def search_csdn(query):
     
     results = []
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = (session or requests).get(url, headers=headers, timeout=timeout)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
             # 根据 CSDN 的 HTML 结构提取搜索结果（选择器可能需要根据实际情况修改）
@@ -94,8 +97,12 @@ def search_problem(query):
     综合查询技术问题解决方案，分别从 SegmentFault 和 CSDN 上搜集结果
     """
     print(f"正在查询问题：{query}")
-    results_segmentfault = search_segmentfault(query)
-    results_csdn = search_csdn(query)
+    # 两个站点同时查询，总耗时取决于较慢的一个而不是两者之和
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_segmentfault = executor.submit(search_segmentfault, query)
+        future_csdn = executor.submit(search_csdn, query)
+        results_segmentfault = future_segmentfault.result()
+        results_csdn = future_csdn.result()
     
     return {
         "segmentfault": results_segmentfault,
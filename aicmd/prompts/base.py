@@ -1,3 +1,9 @@
+# Agent 模式下发送给 AI 的问题前缀
+AGENT_MODE_PREFIX = "[AGENT_MODE] "
+
+# Agent 模式下把命令执行结果回传给 AI 的消息
+COMMAND_RESULT_PROMPT = "命令 '{command}' 已执行（{summary}），输出为：\n{output}\n请分析结果并告诉我下一步该怎么做。"
+
 SYSTEM_PROMPT = """
 你是 aiCMD，一个专注于云计算运维的AI助手。
 
@@ -1,7 +1,91 @@
-from .core import Assistant
+import argparse
 import sys
 
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(prog='ai', description='aiCMD - AI 驱动的命令行助手')
+    parser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help='打印启动阶段各模块的导入耗时后退出'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='不使用问答缓存，每个问题都重新询问 AI'
+    )
+    
+    parser.add_argument(
+        '--hosts',
+        metavar='文件',
+        help='多主机执行（@ 命令）的主机列表文件，默认 ~/.aicmd/hosts'
+    )
+    
+    # 非交互模式：供脚本和定时任务调用
+    batch = parser.add_argument_group('非交互模式')
+    batch.add_argument(
+        '-q', '--query',
+        action='append',
+        default=[],
+        metavar='问题',
+        help='直接提问后退出，可重复指定多个问题'
+    )
+    batch.add_argument(
+        '--agent',
+        action='append',
+        nargs='?',
+        const='',
+        metavar='目标',
+        help='以 Agent 模式给出完成目标的命令（只建议，不执行）；不带目标时对 --stdin 的问题使用 Agent 模式'
+    )
+    batch.add_argument(
+        '--stdin',
+        action='store_true',
+        help='从标准输入逐行读取问题（JSONL：{"id": ..., "query": "..."}，或纯文本）'
+    )
+    batch.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=4,
+        help='最大并发请求数（默认 4）'
+    )
+    batch.add_argument(
+        '-o', '--output',
+        metavar='文件',
+        help='结果写入 JSONL 文件（默认输出到标准输出）'
+    )
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    
+    if args.startup_profile:
+        from .utils.startup import StartupProfiler
+        print(StartupProfiler().report())
+        return
+    
+    if args.query or args.agent is not None or args.stdin:
+        # 非交互模式不加载 prompt_toolkit
+        agent_mode = args.agent is not None
+        if agent_mode and args.query:
+            print("错误：-q 和 --agent 不能同时使用", file=sys.stderr)
+            sys.exit(2)
+        queries = [goal for goal in (args.agent or []) if goal] or args.query
+        if not queries and not args.stdin:
+            print("错误：--agent 需要指定目标，或与 --stdin 一起使用", file=sys.stderr)
+            sys.exit(2)
+        from .core.batch import run_batch
+        sys.exit(run_batch(
+            queries,
+            agent_mode=agent_mode,
+            read_stdin=args.stdin,
+            jobs=args.jobs,
+            output=args.output,
+            use_cache=not args.no_cache,
+        ))
+    
     try:
         print("\n=== aiCMD - AI-Powered Command-Line Assistant ===")
         print("请选择运行模式：")
@@ -11,7 +95,10 @@ def main():
         mode = input("请选择 [回车/a]: ").strip().lower()
         is_agent_mode = mode == 'a'
         
-        assistant = Assistant(agent_mode=is_agent_mode)
+        # 在选择模式之后再导入，让提示尽快出现
+        from .core.assistant import Assistant
+        
+        assistant = Assistant(agent_mode=is_agent_mode, use_cache=not args.no_cache, hosts_file=args.hosts)
         if is_agent_mode:
             print("\n=== 已进入 Agent 模式 ===")
             print("AI 将自动执行命令来完成你的目标")
@@ -32,4 +119,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
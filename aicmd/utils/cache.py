@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class DiskCache:
+    """磁盘缓存
+
+    每个条目保存为一个 JSON 文件，读取时更新文件 mtime，超出 max_entries 时按 mtime
+    淘汰最久未使用的条目；超过 ttl 的条目视为过期。可选的内存层缓存最近使用的条目。
+    """
+    def __init__(self, directory, max_entries=200, ttl=86400, memory_entries=0):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def get_entry(self, key):
+        """读取条目（不检查是否过期，不计入命中统计）
+
+        Returns:
+            dict: {'value': ..., 'stored_at': 时间戳, 'meta': {...}}，不存在时返回 None
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('key') != key:
+                return None
+            os.utime(path)  # 记录访问时间，用于 LRU 淘汰
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, entry)
+        return entry
+
+    def is_fresh(self, entry):
+        """条目是否仍在有效期内"""
+        return entry is not None and time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def get(self, key, default=None):
+        """读取未过期的缓存值"""
+        entry = self.get_entry(key)
+        if self.is_fresh(entry):
+            self.hits += 1
+            return entry['value']
+        self.misses += 1
+        return default
+
+    def set(self, key, value, meta=None):
+        """写入缓存"""
+        entry = {'key': key, 'value': value, 'stored_at': time.time(), 'meta': meta or {}}
+        self._remember(key, entry)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError:
+            pass
+
+    def touch(self, key):
+        """刷新条目的写入时间（如条件请求确认内容未变化）"""
+        entry = self.get_entry(key)
+        if entry is not None:
+            self.set(key, entry['value'], entry.get('meta'))
+
+    def delete(self, key):
+        """删除条目"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+        for path in self._files():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._files())
+
+    def stats(self):
+        """命中统计"""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def _remember(self, key, entry):
+        """放入内存层"""
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _files(self):
+        try:
+            return list(self.directory.glob('*.json'))
+        except OSError:
+            return []
+
+    def _evict(self):
+        """超出容量时删除最久未使用的条目"""
+        files = self._files()
+        excess = len(files) - self.max_entries
+        if excess <= 0:
+            return
+
+        def mtime(path):
+            try:
+                return path.stat().st_mtime
+            except OSError:
+                return 0
+
+        for path in sorted(files, key=mtime)[:excess]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
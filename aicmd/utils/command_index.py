@@ -0,0 +1,148 @@
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class CommandIndex:
+    """PATH 命令索引
+
+    以目录 mtime 为键持久化到 ~/.aicmd/command_index.json。启动时直接读取缓存，
+    由后台线程检查各目录 mtime，只重新扫描发生变化的目录。命令名保存在有序列表中，
+    前缀查找通过二分完成，复杂度 O(log n + k)。
+    """
+    BUILTIN_COMMANDS = ('cd', 'ls', 'pwd', 'exit', 'help')
+    CACHE_VERSION = 1
+
+    def __init__(self, cache_file=None, refresh_interval=30.0):
+        self.cache_file = Path(cache_file) if cache_file else Path.home() / '.aicmd' / 'command_index.json'
+        self.refresh_interval = refresh_interval
+        self._dirs = {}  # 目录 -> {'mtime': mtime_ns, 'commands': [...]}
+        self._commands = sorted(self.BUILTIN_COMMANDS)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_refresh = 0.0
+
+        self._load_cache()
+        self.refresh()
+
+    @property
+    def commands(self):
+        """当前全部命令（有序列表快照）"""
+        return self._commands
+
+    def lookup(self, prefix):
+        """返回以 prefix 开头的命令（按字母序）"""
+        commands = self._commands  # 后台刷新会整体替换列表，这里取快照即可
+        if not prefix:
+            return list(commands)
+        lo = bisect.bisect_left(commands, prefix)
+        hi = bisect.bisect_left(commands, prefix + '\U0010ffff', lo)
+        return commands[lo:hi]
+
+    def maybe_refresh(self):
+        """距离上次刷新超过 refresh_interval 时，在后台发起刷新"""
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def refresh(self, wait=False):
+        """在后台线程中检查 PATH 目录并增量刷新索引
+
+        Args:
+            wait: 是否等待刷新完成
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._last_refresh = time.monotonic()
+                self._thread = threading.Thread(target=self._refresh, name='aicmd-command-index', daemon=True)
+                self._thread.start()
+            thread = self._thread
+        if wait:
+            thread.join()
+
+    def _path_dirs(self):
+        """获取 PATH 中的目录（去重并保持顺序）"""
+        seen = set()
+        dirs = []
+        for path in os.environ.get('PATH', '').split(os.pathsep):
+            if path and path not in seen:
+                seen.add(path)
+                dirs.append(path)
+        return dirs
+
+    def _refresh(self):
+        """检查各目录 mtime，只重新扫描变化的目录"""
+        try:
+            dirs = {}
+            changed = False
+            for path in self._path_dirs():
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._dirs.get(path)
+                if cached and cached['mtime'] == mtime:
+                    dirs[path] = cached
+                else:
+                    dirs[path] = {'mtime': mtime, 'commands': self._scan_dir(path)}
+                    changed = True
+
+            if changed or set(dirs) != set(self._dirs):
+                self._dirs = dirs
+                self._rebuild()
+                self._save_cache()
+        except Exception as e:
+            print(f"Warning: Error refreshing command index: {e}")
+
+    @staticmethod
+    def _scan_dir(path):
+        """扫描单个目录中的可执行文件"""
+        commands = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            commands.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return commands
+
+    def _rebuild(self):
+        """根据目录数据重建有序命令列表"""
+        commands = set(self.BUILTIN_COMMANDS)
+        for data in self._dirs.values():
+            commands.update(data['commands'])
+        self._commands = sorted(commands)
+
+    def _load_cache(self):
+        """加载磁盘缓存，只保留仍在 PATH 中的目录"""
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.CACHE_VERSION:
+                return
+            cached_dirs = data.get('dirs', {})
+            self._dirs = {
+                path: cached_dirs[path]
+                for path in self._path_dirs()
+                if path in cached_dirs
+            }
+            self._rebuild()
+        except Exception:
+            self._dirs = {}
+
+    def _save_cache(self):
+        """原子写入磁盘缓存"""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_name(f'{self.cache_file.name}.{os.getpid()}.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.CACHE_VERSION, 'dirs': self._dirs}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception:
+            pass
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DirectoryCache:
+    """目录列表缓存
+
+    用 os.scandir 读取目录（DirEntry 自带文件类型，普通条目不需要额外的 stat），
+    以 (路径, mtime) 为键缓存 [(名字, 是否目录), ...]，按 LRU 保留 max_dirs 个目录。
+    同一目录在 revalidate_interval 秒内重复访问时连 mtime 也不检查（NFS 上 stat 也很慢），
+    逐级补全深层路径时连续的几次补全可以直接复用。prefetch() 在后台线程中预先读取目录，
+    同一目录同时只读取一次，前台的 list() 会等待进行中的读取而不是重复扫描。
+    """
+    def __init__(self, max_dirs=64, revalidate_interval=1.0, prefetch_children=16):
+        self.max_dirs = max_dirs
+        self.revalidate_interval = revalidate_interval
+        self.prefetch_children = prefetch_children  # 预读时顺带读取的子目录数
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # 路径 -> (mtime_ns, 检查时间, 列表)
+        self._pending = {}  # 路径 -> 进行中的读取完成事件
+        self._lock = threading.Lock()
+
+    def list(self, path):
+        """列出目录，返回按名字排序的 [(名字, 是否目录), ...]，不是目录时返回 None"""
+        path = os.path.abspath(path)
+        while True:
+            with self._lock:
+                cached = self._entries.get(path)
+                if cached is not None and time.monotonic() - cached[1] < self.revalidate_interval:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return cached[2]
+                pending = self._pending.get(path)
+                if pending is None:
+                    self._pending[path] = threading.Event()
+                    break
+            pending.wait()  # 其他线程正在读取同一目录
+
+        try:
+            return self._load(path, cached)
+        finally:
+            with self._lock:
+                self._pending.pop(path).set()
+
+    def prefetch(self, path):
+        """在后台读取目录及其前几个子目录"""
+        thread = threading.Thread(target=self._prefetch, args=(path,), name='aicmd-dir-prefetch', daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self, path=None):
+        """清除某个目录（path 为 None 时清除全部）的缓存"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def _prefetch(self, path):
+        entries = self.list(path)
+        if not entries:
+            return
+        children = [name for name, is_dir in entries if is_dir and not name.startswith('.')]
+        for name in children[:self.prefetch_children]:
+            self.list(os.path.join(path, name))
+
+    def _load(self, path, cached):
+        """检查 mtime，未变化时沿用缓存，否则重新扫描"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.invalidate(path)
+            return None
+
+        if cached is not None and cached[0] == mtime:
+            entries = cached[2]
+            self.hits += 1
+        else:
+            entries = self._scan(path)
+            if entries is None:
+                return None
+            self.misses += 1
+
+        with self._lock:
+            self._entries[path] = (mtime, time.monotonic(), entries)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_dirs:
+                self._entries.popitem(last=False)
+        return entries
+
+    @staticmethod
+    def _scan(path):
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()  # 只有符号链接需要 stat
+                    except OSError:
+                        is_dir = False
+                    entries.append((entry.name, is_dir))
+        except OSError:
+            return None
+        entries.sort()
+        return entries
+
+
+_dir_cache = None
+
+
+def get_dir_cache():
+    """进程内共用的目录列表缓存"""
+    global _dir_cache
+    if _dir_cache is None:
+        _dir_cache = DirectoryCache()
+    return _dir_cache
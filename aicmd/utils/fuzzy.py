@@ -0,0 +1,88 @@
+# 打分参数（与 fzf 的 v1 算法一致）
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8  # 开头或分隔符之后
+BONUS_CAMEL = 7  # 小写后的大写、字母后的数字
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+DELIMITERS = frozenset(' \t/\\-_.:=,;|@')
+
+
+def fuzzy_match(pattern, text):
+    """fzf 风格的子序列匹配
+
+    模式全为小写时忽略大小写（smart case）。先正向找到最早结束的匹配，再反向找到该匹配
+    最短的窗口，在窗口内按连续匹配、单词边界、驼峰加分，按间隔扣分。
+
+    Returns:
+        tuple: (得分, 匹配字符的位置列表)，不匹配时返回 None
+    """
+    if not pattern:
+        return 0, []
+    subject = text if pattern != pattern.lower() else _lower(text)
+
+    # 正向：最早结束的位置
+    end = -1
+    for ch in pattern:
+        end = subject.find(ch, end + 1)
+        if end < 0:
+            return None
+
+    # 反向：该结束位置对应的最晚开始位置
+    start = end + 1
+    for ch in reversed(pattern):
+        start = subject.rfind(ch, 0, start)
+
+    score = 0
+    positions = []
+    index = 0
+    consecutive = 0
+    first_bonus = 0
+    in_gap = False
+    for i in range(start, end + 1):
+        if index < len(pattern) and subject[i] == pattern[index]:
+            bonus = _bonus_at(text, i)
+            if consecutive == 0:
+                first_bonus = bonus
+            else:
+                # 连续匹配沿用这一段开头的加分
+                if bonus >= BONUS_BOUNDARY and bonus > first_bonus:
+                    first_bonus = bonus
+                bonus = max(bonus, first_bonus, BONUS_CONSECUTIVE)
+            score += SCORE_MATCH + (bonus * BONUS_FIRST_CHAR_MULTIPLIER if index == 0 else bonus)
+            positions.append(i)
+            in_gap = False
+            consecutive += 1
+            index += 1
+        else:
+            score += SCORE_GAP_EXTENSION if in_gap else SCORE_GAP_START
+            in_gap = True
+            consecutive = 0
+            first_bonus = 0
+    return score, positions
+
+
+def _lower(text):
+    """转为小写，且与原文逐字符对应
+
+    少数字符小写后长度会变（如 'İ' 变为 'i' 加一个组合符号），这些字符只取小写的第一个字符，
+    保证搜索到的位置可以直接用于原文（计算加分、高亮显示）。
+    """
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return ''.join(ch.lower()[:1] or ch for ch in text)
+
+
+def _bonus_at(text, i):
+    if i == 0:
+        return BONUS_BOUNDARY
+    prev, ch = text[i - 1], text[i]
+    if prev in DELIMITERS:
+        return BONUS_BOUNDARY
+    if (prev.islower() and ch.isupper()) or (prev.isalpha() and ch.isdigit()):
+        return BONUS_CAMEL
+    if not prev.isalnum() and ch.isalnum():
+        return BONUS_BOUNDARY
+    return 0
@@ -0,0 +1,158 @@
+import bisect
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from prompt_toolkit.history import FileHistory
+
+
+class HistoryIndex:
+    """历史命令前缀索引
+
+    维护去重后的有序命令列表（二分查找前缀范围）以及按最近使用排序的统计表，
+    新命令通过 add() 增量加入。匹配结果按使用频率和最近程度综合排序。
+    另外按命令名（第一个词）统计使用情况，供命令补全按 frecency 排序。
+    """
+    # 前缀范围内候选数不超过该值时直接全部打分，否则按最近使用顺序取样
+    SCAN_LIMIT = 2000
+
+    def __init__(self, recency_scale=100.0):
+        self.recency_scale = recency_scale
+        self._sorted = []  # 去重后的命令（字母序）
+        self._stats = OrderedDict()  # 命令 -> [使用次数, 最近一次序号]，按最近使用排序
+        self._heads = {}  # 命令名 -> [使用次数, 最近一次序号]
+        self._recent = (-1, [])  # (序号, 最近使用在前的命令列表) 快照
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def rebuild(self, strings):
+        """根据历史记录重建索引
+
+        Args:
+            strings: 历史命令，最早的在前
+        """
+        stats = OrderedDict()
+        heads = {}
+        seq = 0
+        for string in strings:
+            entry = stats.pop(string, None)
+            if entry is None:
+                entry = [0, 0]
+            entry[0] += 1
+            entry[1] = seq
+            stats[string] = entry
+            self._count_head(heads, string, seq)
+            seq += 1
+
+        with self._lock:
+            self._stats = stats
+            self._heads = heads
+            self._sorted = sorted(stats)
+            self._seq = seq
+
+    def add(self, string):
+        """增量添加一条历史命令"""
+        if not string:
+            return
+        with self._lock:
+            entry = self._stats.pop(string, None)
+            if entry is None:
+                entry = [0, 0]
+                bisect.insort(self._sorted, string)
+            entry[0] += 1
+            entry[1] = self._seq
+            self._stats[string] = entry
+            self._count_head(self._heads, string, self._seq)
+            self._seq += 1
+
+    def recent(self):
+        """全部历史命令（去重，最近使用的在前）
+
+        返回的列表是快照，历史记录没有变化时重复调用不会再复制。
+        """
+        with self._lock:
+            seq, commands = self._recent
+            if seq != self._seq:
+                commands = list(reversed(self._stats))
+                self._recent = (self._seq, commands)
+            return commands
+
+    def frecency(self, cmd):
+        """整条命令的频率 × 最近程度得分（没有用过时为 0）"""
+        entry = self._stats.get(cmd)
+        return self._frecency(entry) if entry else 0.0
+
+    def command_frecency(self, name):
+        """命令名（如 git）的频率 × 最近程度得分（没有用过时为 0）"""
+        entry = self._heads.get(name)
+        return self._frecency(entry) if entry else 0.0
+
+    def search(self, prefix, limit=20):
+        """查找以 prefix 开头的历史命令
+
+        Args:
+            prefix: 命令前缀
+            limit: 最多返回的条数
+
+        Returns:
+            list: 按频率和最近程度排序的命令列表
+        """
+        with self._lock:
+            if not prefix:
+                return [cmd for cmd, _ in zip(reversed(self._stats), range(limit))]
+
+            lo = bisect.bisect_left(self._sorted, prefix)
+            hi = bisect.bisect_left(self._sorted, prefix + '\U0010ffff', lo)
+            if hi - lo <= self.SCAN_LIMIT:
+                candidates = self._sorted[lo:hi]
+            else:
+                # 匹配项很多时，最近使用的命令中很快就能找够候选
+                candidates = []
+                for cmd in reversed(self._stats):
+                    if cmd.startswith(prefix):
+                        candidates.append(cmd)
+                        if len(candidates) >= limit * 4:
+                            break
+
+            return heapq.nlargest(limit, candidates, key=self._score)
+
+    def _score(self, cmd):
+        return self._frecency(self._stats[cmd])
+
+    def _frecency(self, entry):
+        """频率 × 最近程度 的综合得分"""
+        count, last_seq = entry
+        age = self._seq - last_seq
+        return (1.0 + math.log(count)) / (1.0 + age / self.recency_scale)
+
+    @staticmethod
+    def _count_head(heads, string, seq):
+        words = string.split(None, 1)
+        if not words:
+            return
+        entry = heads.get(words[0])
+        if entry is None:
+            entry = heads[words[0]] = [0, 0]
+        entry[0] += 1
+        entry[1] = seq
+
+
+class IndexedFileHistory(FileHistory):
+    """带前缀索引的文件历史记录"""
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.index = HistoryIndex()
+
+    def load_history_strings(self):
+        """加载历史记录并重建索引"""
+        strings = list(super().load_history_strings())  # 最新的在前
+        self.index.rebuild(reversed(strings))
+        return strings
+
+    def store_string(self, string):
+        """保存历史记录并更新索引"""
+        super().store_string(string)
+        self.index.add(string)
@@ -0,0 +1,139 @@
+import re
+from html.parser import HTMLParser
+
+# 不包含正文的元素，其中的文字全部跳过
+SKIP_TAGS = {
+    'head', 'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer',
+    'aside', 'form', 'button', 'select', 'iframe',
+}
+# 代码块
+CODE_TAGS = {'pre', 'code'}
+# 块级元素，前后换行
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'pre', 'blockquote', 'tr', 'table', 'dd', 'dt',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article',
+}
+# 没有结束标签的元素，不入栈
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source',
+    'track', 'wbr',
+}
+# 问答网站和博客中回答 / 正文容器的 class 或 id
+ANSWER_RE = re.compile(
+    r'answer|accepted|post-?text|post-?body|s-prose|markdown-body|article|entry-content|'
+    r'blog-content|content_views|rich-text|js_content',
+    re.IGNORECASE
+)
+
+# 片段优先级：越小越优先放入长度预算
+ANSWER_CODE, ANSWER_TEXT, CODE, TEXT = range(4)
+
+
+class TextExtractor(HTMLParser):
+    """增量式 HTML 正文提取
+
+    可以分块 feed()，跳过脚本、样式、导航等元素；按“回答中的代码、回答正文、其他代码、
+    其他文字”的优先级挑选片段放入 limit 个字符，再按原文顺序输出。回答和代码的文字已经
+    足够 limit 时 full 为 True，调用方可以提前停止下载。
+    """
+    def __init__(self, limit=1000):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self._stack = []  # [(tag, 跳过, 回答, 代码)]
+        self._pieces = []  # [(优先级, 与前一片段的分隔符, 文本)]
+        self._newline = False
+        self._space = False  # 前一段文字以空白结尾
+        self._preferred_chars = 0
+
+    @property
+    def full(self):
+        """优先内容是否已经足够"""
+        return self._preferred_chars >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._newline = True
+        if tag in VOID_TAGS:
+            return
+        skip, answer, code = self._state()
+        attrs = dict(attrs)
+        marker = f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+        self._stack.append((
+            tag,
+            skip or tag in SKIP_TAGS,
+            answer or bool(ANSWER_RE.search(marker)),
+            code or tag in CODE_TAGS,
+        ))
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._newline = True
+        # 容忍未闭合的标签：弹出到匹配的开始标签为止
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        skip, answer, code = self._state()
+        if skip:
+            return
+        if code and self._stack_has('pre'):
+            text = data.strip('\n')
+        else:
+            text = ' '.join(data.split())
+        if not text:
+            self._space = self._space or bool(data)
+            return
+        if self._newline:
+            separator = '\n'
+        elif self._space or data[:1].isspace():
+            separator = ' '
+        else:
+            separator = ''
+
+        if code:
+            priority = ANSWER_CODE if answer else CODE
+        else:
+            priority = ANSWER_TEXT if answer else TEXT
+        if priority in (ANSWER_CODE, ANSWER_TEXT):
+            self._preferred_chars += len(text)
+        self._pieces.append((priority, separator, text))
+        self._newline = False
+        self._space = data[-1:].isspace()
+
+    def text(self):
+        """按优先级挑选片段，按原文顺序拼接，不超过 limit 个字符"""
+        order = sorted(range(len(self._pieces)), key=lambda i: (self._pieces[i][0], i))
+        selected = {}
+        budget = self.limit
+        for i in order:
+            if budget <= 0:
+                break
+            text = self._pieces[i][2][:budget]
+            selected[i] = text
+            budget -= len(text) + 1
+
+        parts = []
+        for i in sorted(selected):
+            if parts:
+                # 中间有片段被省略时至少保留一个空格
+                parts.append(self._pieces[i][1] or (' ' if i - 1 not in selected else ''))
+            parts.append(selected[i])
+        return ''.join(parts).strip()
+
+    def _state(self):
+        if self._stack:
+            return self._stack[-1][1:]
+        return False, False, False
+
+    def _stack_has(self, tag):
+        return any(entry[0] == tag for entry in self._stack)
+
+
+def html_to_text(html, limit=1000):
+    """提取整段 HTML 的正文"""
+    extractor = TextExtractor(limit)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
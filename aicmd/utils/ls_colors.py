@@ -0,0 +1,194 @@
+import os
+import stat
+
+# 未设置 LS_COLORS 时的颜色（与 GNU ls 默认值接近）
+DEFAULT_COLORS = {
+    'di': '1;34',     # 目录
+    'ln': '1;36',     # 符号链接
+    'or': '40;31;1',  # 指向不存在目标的符号链接
+    'ex': '1;32',     # 可执行文件
+    'fi': '0;37',     # 普通文件
+    'pi': '40;33',    # 命名管道
+    'so': '1;35',     # 套接字
+    'bd': '40;33;1',  # 块设备
+    'cd': '40;33;1',  # 字符设备
+}
+# ls -l 第一列的类型字符
+_LONG_TYPES = {'d': 'di', 'l': 'ln', 'p': 'pi', 's': 'so', 'b': 'bd', 'c': 'cd', '-': 'fi'}
+_EXEC_BITS = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+# 输出中的名字不超过这么多个时逐个 lstat，不扫描整个目录
+_LSTAT_LIMIT = 256
+
+
+def parse_ls_colors(value):
+    """解析 LS_COLORS
+
+    Returns:
+        tuple: (类型 -> 颜色, 文件名后缀 -> 颜色)，后缀统一为小写
+    """
+    types = {}
+    suffixes = {}
+    for item in (value or '').split(':'):
+        key, sep, code = item.partition('=')
+        if not sep or not code:
+            continue
+        if key.startswith('*'):
+            suffixes[key[1:].lower()] = code
+        else:
+            types[key] = code
+    return types, suffixes
+
+
+class LsColorizer:
+    """ls 输出着色
+
+    只给输出中出现的名字分类：名字不多时（如 ls f1.txt）逐个 lstat，否则对被列出的目录做一次
+    os.scandir 快照，用 DirEntry 缓存的文件类型分类（先判断符号链接，符号链接指向的目录不会
+    被当成目录），只有普通文件为判断可执行位、符号链接为判断目标是否存在才各做一次 stat。
+    颜色遵循 LS_COLORS（类型和 *.ext 后缀）。
+    """
+    def __init__(self, ls_colors=None):
+        if ls_colors is None:
+            ls_colors = os.environ.get('LS_COLORS')
+        if ls_colors:
+            self.types, self.suffixes = parse_ls_colors(ls_colors)
+        else:
+            self.types, self.suffixes = dict(DEFAULT_COLORS), {}
+        self._suffix_lengths = sorted({len(s) for s in self.suffixes}, reverse=True)
+
+    def snapshot(self, directory='.', names=None):
+        """读取目录中条目的类型
+
+        Args:
+            names: 只需要这些名字的类型（集合），None 表示全部条目
+
+        Returns:
+            dict: 文件名 -> (类型, 符号链接目标的类型)
+        """
+        want_exec = 'ex' in self.types
+        if names is not None and len(names) <= _LSTAT_LIMIT:
+            return {name: self._classify_path(os.path.join(directory, name), want_exec) for name in names}
+
+        kinds = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if names is None or entry.name in names:
+                        kinds[entry.name] = self._classify(entry, want_exec)
+        except OSError:
+            pass
+        return kinds
+
+    def _classify(self, entry, want_exec):
+        try:
+            if entry.is_symlink():
+                return 'ln', self._link_target(entry.path)
+            if entry.is_dir(follow_symlinks=False):
+                return 'di', None
+            if entry.is_file(follow_symlinks=False):
+                if want_exec and entry.stat(follow_symlinks=False).st_mode & _EXEC_BITS:
+                    return 'ex', None
+                return 'fi', None
+            mode = entry.stat(follow_symlinks=False).st_mode
+        except OSError:
+            return 'fi', None
+        return self._kind_of(mode, want_exec), None
+
+    def _classify_path(self, path, want_exec):
+        """不经过 scandir，直接 lstat 一个路径"""
+        try:
+            mode = os.lstat(path).st_mode
+        except OSError:
+            return 'fi', None
+        if stat.S_ISLNK(mode):
+            return 'ln', self._link_target(path)
+        return self._kind_of(mode, want_exec), None
+
+    @staticmethod
+    def _link_target(path):
+        """符号链接目标的类型，目标不存在时返回 None"""
+        try:
+            return 'di' if stat.S_ISDIR(os.stat(path).st_mode) else 'fi'
+        except OSError:
+            return None
+
+    @staticmethod
+    def _kind_of(mode, want_exec):
+        if stat.S_ISDIR(mode):
+            return 'di'
+        if stat.S_ISREG(mode):
+            return 'ex' if want_exec and mode & _EXEC_BITS else 'fi'
+        if stat.S_ISFIFO(mode):
+            return 'pi'
+        if stat.S_ISSOCK(mode):
+            return 'so'
+        if stat.S_ISBLK(mode):
+            return 'bd'
+        if stat.S_ISCHR(mode):
+            return 'cd'
+        return 'fi'
+
+    def color_for(self, name, kind, target=None):
+        """文件名对应的颜色代码，没有颜色时返回 None"""
+        if kind == 'ln':
+            if target is None and 'or' in self.types:
+                return self.types['or']
+            code = self.types.get('ln')
+            if code == 'target':
+                kind = target or 'fi'
+            else:
+                return code
+        if kind in ('fi', 'ex') and self.suffixes:
+            lower = name.lower()
+            for length in self._suffix_lengths:
+                code = self.suffixes.get(lower[-length:])
+                if code is not None:
+                    return code
+        return self.types.get(kind) or self.types.get('fi')
+
+    def colorize(self, output, directory='.'):
+        """给 ls 的输出着色（每行一个名字的短格式或 ls -l 长格式）"""
+        lines = output.splitlines()
+        kinds = None
+        result = []
+        for line in lines:
+            if not line.strip() or line.startswith('total '):
+                result.append(line)  # 空行和 ls -l 的合计行
+                continue
+            if self._is_long_line(line):
+                kind = _LONG_TYPES.get(line[0], 'fi')
+                if kind == 'fi' and 'x' in line[1:10]:
+                    kind = 'ex'
+                name = line.split(' -> ')[0].rsplit(None, 1)[-1]
+                code = self.color_for(name, kind, 'fi')
+            else:
+                if kinds is None:  # 只读取输出中出现的名字
+                    kinds = self.snapshot(directory, self._short_names(lines))
+                kind, target = kinds.get(line, ('fi', None))
+                code = self.color_for(line, kind, target)
+            result.append(f"\033[{code}m{line}\033[0m" if code else line)
+        return '\n'.join(result)
+
+    def _short_names(self, lines):
+        """短格式输出中的名字"""
+        return {
+            line for line in lines
+            if line.strip() and not line.startswith('total ') and not self._is_long_line(line)
+        }
+
+    @staticmethod
+    def _is_long_line(line):
+        """是否是 ls -l 的一行（如 drwxr-xr-x 2 user group ...）"""
+        return (len(line) > 10 and line[0] in _LONG_TYPES
+                and all(c in 'rwxsStTl-' for c in line[1:10]) and line[10] in ' .+@')
+
+
+_colorizer = None
+
+
+def get_ls_colorizer():
+    """进程内共用的着色器（LS_COLORS 只解析一次）"""
+    global _colorizer
+    if _colorizer is None:
+        _colorizer = LsColorizer()
+    return _colorizer
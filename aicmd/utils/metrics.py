@@ -0,0 +1,169 @@
+import json
+import posixpath
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def _percentile(values, fraction):
+    """简单分位数（values 已排序）"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def command_name(command):
+    """命令行中第一条命令的命令名（不含参数和变量赋值，其中可能有密码、token）"""
+    from ..core.shell_ast import ShellSyntaxError, parse
+    try:
+        first = parse(command.strip()).first_command
+        name = first.name if first is not None else ''
+    except ShellSyntaxError:
+        words = command.split()
+        name = words[0] if words else ''
+    return posixpath.basename(name)
+
+
+class MetricsRecorder:
+    """耗时统计
+
+    记录每轮 AI 对话（上下文构建、建连、首字节、首字、末字、token 数、输出速度）
+    和每条命令的执行耗时。本次会话的记录保存在内存中供 /stats 显示，同时逐条追加到
+    ~/.aicmd/metrics.jsonl，每行一个 JSON 对象，便于汇总各主机的模型延迟。命令只记录命令名，
+    不记录参数。
+    """
+    def __init__(self, path=None, enabled=True, keep=500):
+        self.path = Path(path) if path else Path.home() / '.aicmd' / 'metrics.jsonl'
+        self.enabled = enabled
+        self.turns = deque(maxlen=keep)
+        self.commands = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """根据配置创建"""
+        return cls(
+            path=settings.get('metrics.file') or None,
+            enabled=settings.get('metrics.enabled', True),
+        )
+
+    def record_turn(self, **fields):
+        """记录一轮 AI 对话"""
+        record = self._record('turn', fields)
+        self.turns.append(record)
+        return record
+
+    def record_command(self, result, source):
+        """记录一条命令的执行结果（CommandResult），只记录命令名"""
+        rusage = result.rusage or {}
+        record = self._record('command', {
+            'source': source,
+            'command': command_name(result.command or ''),
+            'exit_code': result.exit_code,
+            'wall_time': round(result.wall_time, 4),
+            'cpu_time': round(rusage.get('user_time', 0.0) + rusage.get('system_time', 0.0), 4),
+            'output_chars': len(result.output or ''),
+        })
+        self.commands.append(record)
+        return record
+
+    def _record(self, kind, fields):
+        record = {'type': kind, 'ts': round(time.time(), 3)}
+        for key, value in fields.items():
+            record[key] = round(value, 4) if isinstance(value, float) else value
+        if self.enabled:
+            self._append(record)
+        return record
+
+    def _append(self, record):
+        """追加到 JSONL 文件"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    def summary(self):
+        """本次会话的统计"""
+        turns = list(self.turns)
+        commands = list(self.commands)
+
+        def avg(records, key):
+            values = [r[key] for r in records if r.get(key) is not None]
+            return sum(values) / len(values) if values else None
+
+        ttfts = sorted(r['ttft'] for r in turns if r.get('ttft') is not None)
+        return {
+            'turns': len(turns),
+            'failed_turns': sum(1 for r in turns if r.get('failed')),
+            'avg_context_build': avg(turns, 'context_build'),
+            'avg_ttfb': avg(turns, 'ttfb'),
+            'avg_ttft': avg(turns, 'ttft'),
+            'p50_ttft': _percentile(ttfts, 0.5),
+            'p95_ttft': _percentile(ttfts, 0.95),
+            'avg_total': avg(turns, 'total'),
+            'avg_tokens_per_second': avg(turns, 'tokens_per_second'),
+            'prompt_tokens': sum(r.get('prompt_tokens') or 0 for r in turns),
+            'completion_tokens': sum(r.get('completion_tokens') or 0 for r in turns),
+            'commands': len(commands),
+            'avg_command_time': avg(commands, 'wall_time'),
+            'slowest_command': max(commands, key=lambda r: r['wall_time'], default=None),
+        }
+
+    def report(self):
+        """生成统计报告"""
+        s = self.summary()
+        if not s['turns'] and not s['commands']:
+            return "暂无统计数据"
+
+        def seconds(value):
+            return f"{value:.3f}秒" if value is not None else '-'
+
+        lines = []
+        if s['turns']:
+            rate = s['avg_tokens_per_second']
+            lines += [
+                f"AI 对话 {s['turns']} 轮（失败 {s['failed_turns']} 轮）",
+                f"  上下文构建  平均 {seconds(s['avg_context_build'])}",
+                f"  首字节      平均 {seconds(s['avg_ttfb'])}",
+                f"  首字        平均 {seconds(s['avg_ttft'])}，P50 {seconds(s['p50_ttft'])}，P95 {seconds(s['p95_ttft'])}",
+                f"  总耗时      平均 {seconds(s['avg_total'])}",
+                f"  输出速度    平均 {rate:.1f} token/秒" if rate is not None else "  输出速度    -",
+                f"  token       输入 {s['prompt_tokens']}，输出 {s['completion_tokens']}",
+            ]
+            recent = list(self.turns)[-5:]
+            lines.append("  最近几轮：")
+            for r in recent:
+                lines.append(
+                    f"    {r.get('route', '-'):<22}{r.get('model', '-'):<20}"
+                    f"首字 {seconds(r.get('ttft'))}  总计 {seconds(r.get('total'))}"
+                )
+        if s['commands']:
+            slowest = s['slowest_command']
+            lines += [
+                f"命令 {s['commands']} 条，平均耗时 {seconds(s['avg_command_time'])}",
+                f"  最慢：{slowest['command']}（{seconds(slowest['wall_time'])}）",
+            ]
+        if self.enabled:
+            lines.append(f"详细记录：{self.path}")
+        return "\n".join(lines)
+
+
+def get_metrics(settings=None):
+    """获取进程内共享的 MetricsRecorder"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            if settings is None:
+                from ..config.settings import Settings
+                settings = Settings()
+            _metrics = MetricsRecorder.from_settings(settings)
+        return _metrics
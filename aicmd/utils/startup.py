@@ -0,0 +1,66 @@
+import importlib
+import sys
+import time
+
+# 启动路径上的模块，按实际导入顺序排列；lazy=True 表示已改为首次使用时才导入
+STARTUP_MODULES = [
+    ('prompt_toolkit', '交互式命令行', False),
+    ('colorama', '彩色输出', False),
+    ('aicmd.core.terminal', '终端', False),
+    ('aicmd.core.command', '命令执行器', False),
+    ('aicmd.core.assistant', '主控制器', False),
+    ('aicmd.ai.chat', 'AI 对话管理', True),
+    ('openai', 'OpenAI 客户端', True),
+    ('requests', 'HTTP 请求', True),
+    ('aicmd.ai.search', '网络搜索', True),
+]
+
+
+class StartupProfiler:
+    """统计启动阶段各模块的导入耗时"""
+    def __init__(self, modules=None):
+        self.modules = modules or STARTUP_MODULES
+        self.records = []
+
+    def run(self):
+        """按顺序导入模块，记录每个模块的增量耗时
+
+        已被前面模块间接导入的模块耗时记为 0。
+
+        Returns:
+            list: (模块名, 说明, 是否延迟导入, 耗时秒数, 错误信息) 列表
+        """
+        self.records = []
+        for name, desc, lazy in self.modules:
+            error = None
+            start = time.perf_counter()
+            try:
+                if name not in sys.modules:
+                    importlib.import_module(name)
+            except Exception as e:
+                error = str(e)
+            self.records.append((name, desc, lazy, time.perf_counter() - start, error))
+        return self.records
+
+    def report(self):
+        """生成导入耗时报告文本"""
+        if not self.records:
+            self.run()
+
+        lines = ["=== aiCMD 启动耗时分析 ===", f"{'模块':<24}{'耗时':>10}  说明"]
+        eager_total = 0.0
+        lazy_total = 0.0
+        for name, desc, lazy, elapsed, error in self.records:
+            if lazy:
+                lazy_total += elapsed
+            else:
+                eager_total += elapsed
+            note = f"{desc}（首次使用时加载）" if lazy else desc
+            if error:
+                note += f" [导入失败: {error}]"
+            lines.append(f"{name:<24}{elapsed * 1000:>8.1f}ms  {note}")
+
+        lines.append("")
+        lines.append(f"启动路径合计: {eager_total * 1000:.1f}ms")
+        lines.append(f"延迟加载合计: {lazy_total * 1000:.1f}ms（不计入启动时间）")
+        return "\n".join(lines)
@@ -1,58 +1,201 @@
 import time
 import threading
 import os
+import sys
+
+# ANSI 控制码
+BLUE = "\033[34m"
+RESET = "\033[0m"
+CLEAR_LINE = "\033[K"
+
+
+def format_time(seconds):
+    """将秒数格式化为时分秒"""
+    if seconds < 60:
+        return f"{seconds:.1f}秒"
+    minutes = int(seconds // 60)
+    seconds = seconds % 60
+    if minutes < 60:
+        return f"{minutes}分{seconds:.1f}秒"
+    hours = int(minutes // 60)
+    minutes = minutes % 60
+    return f"{hours}时{minutes}分{seconds:.1f}秒"
+
+
+class SpinnerRenderer:
+    """常驻的计时动画渲染线程
+
+    整个进程只有一个渲染线程，没有计时器显示时在条件变量上等待，不占用 CPU；
+    计时器开始、停止只是切换 active 并唤醒线程，不再为每次查询创建线程。
+    绘制和停止都在同一把锁内完成，stop 返回后不会再有动画输出和流式内容交错。
+    """
+    def __init__(self, interval=0.1, stream=None):
+        self.interval = interval
+        self.stream = stream
+        self.active = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._ansi_ready = False
+
+    def show(self, timer):
+        """开始显示计时器"""
+        with self._cond:
+            self._enable_ansi()
+            self.active = timer
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='aicmd-spinner', daemon=True)
+                self._thread.start()
+            self._draw(timer)
+            self._cond.notify()
+
+    def hide(self, timer, done=True):
+        """停止显示计时器，done 为 True 时保留一行完成状态"""
+        with self._cond:
+            if self.active is not timer:
+                return
+            self.active = None
+            line = f"{BLUE}{timer.desc} {format_time(timer.elapsed)} ✓{RESET}\n" if done else ''
+            self._write(f"\r{CLEAR_LINE}{line}")
+            self._cond.notify()
+
+    def _loop(self):
+        with self._cond:
+            while True:
+                if self.active is None:
+                    self._cond.wait()
+                else:
+                    self._cond.wait(self.interval)
+                if self.active is not None:
+                    self._draw(self.active)
+
+    def _draw(self, timer):
+        self._write(f"\r{CLEAR_LINE}{BLUE}{timer.desc} {format_time(timer.elapsed)}...{RESET}")
+
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(text)
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def _enable_ansi(self):
+        """在 Windows 上启用 ANSI 颜色支持"""
+        if self._ansi_ready:
+            return
+        self._ansi_ready = True
+        if os.name == 'nt':
+            try:
+                import ctypes
+                kernel32 = ctypes.windll.kernel32
+                kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
+            except Exception:
+                pass
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """获取进程内共享的渲染线程"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = SpinnerRenderer()
+        return _renderer
+
 
 class ThinkingTimer:
-    def __init__(self, desc="AI 思考中"):
+    """AI 请求计时器
+
+    start() 开始计时（show 为 True 时显示动画）；收到第一个 token 时调用 first_token()
+    记录首字时间；开始显示内容时调用 stop() 暂停动画（推理模型隐藏的思考过程期间动画继续）；
+    输出过程中用 add_tokens() 计数，结束时调用 finish()。stop() 和 finish() 可以重复调用。
+    """
+    def __init__(self, desc="AI 思考中", show=True, renderer=None):
         self.desc = desc
-        self.done = False
+        self.show = show
+        self.renderer = renderer
         self.start_time = None
-        self._thread = None
-        self.current_time = 0.0
-        
-        # 在 Windows 上启用 ANSI 颜色支持
-        if os.name == 'nt':
-            import ctypes
-            kernel32 = ctypes.windll.kernel32
-            kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
-        
-        # ANSI 颜色代码
-        self.BLUE = "\033[34m"
-        self.RESET = "\033[0m"
-        self.CLEAR_LINE = "\033[K"
-        self.CURSOR_UP = "\033[1A"
-
-    def format_time(self, seconds):
-        """将秒数格式化为时分秒"""
-        if seconds < 60:
-            return f"{seconds:.1f}秒"
-        minutes = int(seconds // 60)
-        seconds = seconds % 60
-        if minutes < 60:
-            return f"{minutes}分{seconds:.1f}秒"
-        hours = int(minutes // 60)
-        minutes = minutes % 60
-        return f"{hours}时{minutes}分{seconds:.1f}秒"
-
-    def animate(self):
-        self.start_time = time.time()
-        print("\n", end='', flush=True)
-        
-        while not self.done:
-            self.current_time = time.time() - self.start_time
-            print(f'\r{self.CURSOR_UP}{self.CLEAR_LINE}{self.BLUE}{self.desc} {self.format_time(self.current_time)}...{self.RESET}', 
-                  end='\n', flush=True)
-            time.sleep(0.1)
-        
-        print(f'\r{self.CURSOR_UP}{self.CLEAR_LINE}{self.BLUE}{self.desc} {self.format_time(self.current_time)} ✓{self.RESET}', 
-              end='\n', flush=True)
+        self.first_token_time = None
+        self.stop_time = None
+        self.end_time = None
+        self.last_token_time = None
+        self.tokens = 0
+
+    @property
+    def elapsed(self):
+        """等待时间（到动画停止为止）"""
+        if self.start_time is None:
+            return 0.0
+        return (self.stop_time or time.perf_counter()) - self.start_time
+
+    @property
+    def ttft(self):
+        """首字时间（秒），尚未收到输出时为 None"""
+        if self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    @property
+    def tokens_per_second(self):
+        """首字之后的输出速度"""
+        if self.first_token_time is None or not self.tokens:
+            return None
+        duration = (self.end_time or time.perf_counter()) - self.first_token_time
+        return self.tokens / duration if duration > 0 else None
 
     def start(self):
-        self.done = False
-        self._thread = threading.Thread(target=self.animate)
-        self._thread.start()
+        """开始计时"""
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.stop_time = None
+        self.end_time = None
+        self.last_token_time = None
+        self.tokens = 0
+        if self.show:
+            self._renderer().show(self)
+
+    def first_token(self):
+        """记录首字时间"""
+        if self.first_token_time is None and self.start_time is not None:
+            self.first_token_time = time.perf_counter()
 
     def stop(self):
-        self.done = True
-        if self._thread is not None:
-            self._thread.join() 
\ No newline at end of file
+        """停止动画，保留一行等待时间"""
+        if self.start_time is None or self.stop_time is not None:
+            return
+        self.stop_time = time.perf_counter()
+        if self.show:
+            self._renderer().hide(self)
+
+    def add_tokens(self, count=1):
+        """记录输出的 token 数"""
+        self.tokens += count
+        self.last_token_time = time.perf_counter()
+
+    def finish(self, tokens=None):
+        """请求结束（tokens 为接口返回的实际 token 数时以其为准）"""
+        if self.end_time is not None:
+            return
+        self.end_time = time.perf_counter()
+        if tokens:
+            self.tokens = tokens
+        if self.stop_time is None:
+            # 没有显示任何内容（如请求出错）时只清除动画行
+            self.stop_time = self.end_time
+            if self.show:
+                self._renderer().hide(self, done=False)
+
+    def summary(self):
+        """首字时间和输出速度"""
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"首字 {self.ttft:.2f}秒")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} token/秒")
+        return " · ".join(parts)
+
+    def _renderer(self):
+        return self.renderer or get_renderer()
@@ -52,50 +52,75 @@ class CommandTranslator:
         目前主要用于反向查找，确保命令存在对应关系
         """
         # 查找是否有对应的 Linux 命令
-        win_cmd = windows_command.strip().split()[0].lower()
+        parts = windows_command.strip().split()
+        if not parts:
+            return windows_command
+        win_cmd = parts[0].lower()
         for linux_cmd, mapped_cmd in self.command_map.items():
             if mapped_cmd.split()[0].lower() == win_cmd:
                 return linux_cmd
         return windows_command
 
     def translate_command(self, linux_command):
-        """转换命令（保持向后兼容）"""
+        """转换命令（保持向后兼容）
+
+        Args:
+            linux_command: 命令字符串或 shell_ast 语法树；管道和命令列表中的每条命令
+                分别转换，重定向和引号保持不变
+        """
         try:
-            parts = linux_command.strip().split()
-            if not parts:
+            tree = self._parse(linux_command)
+            if tree is None:
                 return linux_command
-                
-            cmd = parts[0].strip()
-            args = parts[1:] if len(parts) > 1 else []
-            
-            if len(args) > 0:
-                compound_cmd = f"{cmd} {args[0]}"
-                if compound_cmd in self.command_map:
-                    win_cmd = self.command_map[compound_cmd]
-                    args = args[1:]
-                else:
-                    win_cmd = self.command_map.get(cmd, cmd)
-            else:
-                win_cmd = self.command_map.get(cmd, cmd)
-            
-            win_args = []
-            for arg in args:
-                arg = arg.strip()
-                if arg.startswith('-'):
-                    win_arg = self.arg_map.get(arg, arg)
-                    if win_arg:
-                        win_args.append(win_arg)
-                else:
-                    win_args.append(arg)
-            
-            final_cmd = f"{win_cmd} {' '.join(win_args)}" if win_args else win_cmd
-            return final_cmd
+            return tree.to_string(self._translate_simple)
             
         except Exception as e:
             print(f"命令转换错误: {str(e)}")
-            return linux_command
+            return linux_command if isinstance(linux_command, str) else linux_command.to_string()
+
+    def _translate_simple(self, command):
+        """转换一条简单命令（开头的 then / do 等保留字原样保留）"""
+        reserved = len(command.words) - len(command.argv)
+        words = command.words[reserved:]
+        if not words:
+            return command.to_string()
+            
+        cmd = words[0].value
+        args = words[1:]
+        
+        if args and f"{cmd} {args[0].value}" in self.command_map:
+            win_cmd = self.command_map[f"{cmd} {args[0].value}"]
+            args = args[1:]
+        else:
+            win_cmd = self.command_map.get(cmd, words[0].raw)
+        
+        win_args = []
+        for arg in args:
+            if arg.value.startswith('-') and not arg.quoted:
+                win_arg = self.arg_map.get(arg.value, arg.value)
+                if win_arg:
+                    win_args.append(win_arg)
+            else:
+                win_args.append(arg.raw)
+        
+        parts = [word.raw for word in command.assignments + command.words[:reserved]] + [win_cmd] + win_args
+        parts += [redirect.to_string() for redirect in command.redirects]
+        return ' '.join(parts)
 
     def is_linux_command(self, command):
-        """检查是否是 Linux 命令"""
-        cmd = command.strip().split()[0]
-        return cmd in self.command_map 
\ No newline at end of file
+        """检查是否是 Linux 命令（命令字符串或语法树中任意一条命令可以转换）"""
+        tree = self._parse(command)
+        if tree is None:
+            return False
+        return any(simple.name in self.command_map for simple in tree.commands())
+
+    @staticmethod
+    def _parse(command):
+        """解析为语法树，引号不成对时返回 None"""
+        from ..core.shell_ast import ShellSyntaxError, parse
+        if not isinstance(command, str):
+            return command
+        try:
+            return parse(command.strip())
+        except ShellSyntaxError:
+            return None
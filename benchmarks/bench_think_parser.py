@@ -0,0 +1,104 @@
+"""<think> 流式解析器基准测试
+
+在长的合成输出流上比较 ThinkStreamParser 与旧实现（逐块 `in` 判断 + 字符串拼接），
+同时检查标签被拆分到相邻块时两者的结果是否正确。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_think_parser [--tokens 200000]
+"""
+import argparse
+import json
+import random
+import time
+
+from aicmd.ai.stream import ThinkStreamParser
+
+
+def make_stream(tokens, seed=0):
+    """生成合成输出：思考过程 + 回答，按随机长度切块（标签会被切开）"""
+    rng = random.Random(seed)
+    words = ['检查', '磁盘', 'disk', 'usage', ' ', '\n', 'df -h', '，', 'nginx', 'systemctl']
+    thinking = ''.join(rng.choice(words) for _ in range(tokens // 2))
+    answer = ''.join(rng.choice(words) for _ in range(tokens // 2))
+    text = f"<think>{thinking}</think>{answer}"
+
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 6)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks, answer, thinking
+
+
+def legacy_parse(chunks):
+    """旧实现：逐块 in 判断，字符串 += 累积"""
+    full_response = ""
+    is_thinking = False
+    thinking_buffer = ""
+    for content in chunks:
+        if '<think>' in content:
+            is_thinking = True
+            before_think = content.split('<think>')[0]
+            if before_think:
+                full_response += before_think
+            continue
+        if '</think>' in content:
+            is_thinking = False
+            after_think = content.split('</think>')[1]
+            if after_think:
+                full_response += after_think
+            continue
+        if not is_thinking:
+            full_response += content
+        else:
+            thinking_buffer += content
+    return full_response, thinking_buffer
+
+
+def parser_parse(chunks):
+    """ThinkStreamParser"""
+    parser = ThinkStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.answer, parser.reasoning
+
+
+def measure(func, chunks, repeat):
+    """多次运行取最短耗时"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(chunks)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(tokens=200000, repeat=5):
+    """运行基准测试，返回结果字典"""
+    chunks, answer, thinking = make_stream(tokens)
+    report = {'chunks': len(chunks)}
+    for name, func in (('legacy', legacy_parse), ('parser', parser_parse)):
+        elapsed, (got_answer, got_thinking) = measure(func, chunks, repeat)
+        report[name] = {
+            'seconds': round(elapsed, 6),
+            'chunks_per_second': round(len(chunks) / elapsed),
+            'answer_correct': got_answer == answer,
+            'thinking_correct': got_thinking == thinking,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='<think> 流式解析器基准测试')
+    parser.add_argument('--tokens', type=int, default=200000, help='合成输出的词数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最短耗时）')
+    args = parser.parse_args()
+    print(json.dumps(run(args.tokens, args.repeat), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""本地 OpenAI 兼容接口桩服务
+
+流式返回 /v1/chat/completions，可配置首字节延迟、输出速度、<think> 思考过程长度，
+供基准测试在离线环境中驱动 ChatManager / Assistant。
+
+用法（在仓库根目录）：
+    python -m benchmarks.mock_server [--port 11435] [--rate 200] [--ttfb 0.05] [--think 50]
+
+然后在 ~/.aicmd/config.json 中把 api.base_url 设为 http://127.0.0.1:11435/v1/
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLLMServer:
+    """OpenAI 兼容的流式接口桩
+
+    Args:
+        token_rate: 每秒输出的 token 数（0 表示不限速）
+        ttfb: 收到请求到返回响应头的延迟（秒）
+        think_tokens: <think> 中的 token 数（0 表示不输出思考过程）
+        answer_tokens: 回答的 token 数
+        answer: 回答文本，指定后按字符切块输出，忽略 answer_tokens
+        usage_option: 是否接受 stream_options（False 时模拟不支持该参数的旧接口，返回 400）
+    """
+    def __init__(self, host='127.0.0.1', port=0, token_rate=200.0, ttfb=0.05,
+                 think_tokens=0, answer_tokens=100, answer=None, usage_option=True):
+        self.token_rate = token_rate
+        self.ttfb = ttfb
+        self.think_tokens = think_tokens
+        self.answer_tokens = answer_tokens
+        self.answer = answer
+        self.usage_option = usage_option
+        self.requests = 0
+        self.completed = 0
+        self.aborted = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self):
+        """OpenAI 兼容接口地址"""
+        return f"http://127.0.0.1:{self.port}/v1/"
+
+    def start(self):
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def chunks(self):
+        """本次响应的输出块"""
+        chunks = []
+        if self.think_tokens:
+            chunks.append('<think>')
+            chunks += [f"step{i} " for i in range(self.think_tokens)]
+            chunks.append('</think>')
+        if self.answer is not None:
+            chunks += [self.answer[i:i + 4] for i in range(0, len(self.answer), 4)]
+        else:
+            chunks += [f"word{i} " for i in range(self.answer_tokens)]
+        return chunks
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._send_json({'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    body = {}
+                server.requests += 1
+                if server.ttfb:
+                    time.sleep(server.ttfb)
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    # Ollama 原生接口（Settings.validate_api）
+                    self._send_json({'response': 'ok', 'done': True})
+                    return
+                if 'stream_options' in body and not server.usage_option:
+                    self._send_json({'error': {'message': 'unknown field: stream_options'}}, status=400)
+                    return
+                if body.get('stream'):
+                    include_usage = (body.get('stream_options') or {}).get('include_usage')
+                    prompt_tokens = sum(len(str(m.get('content', ''))) for m in body.get('messages', [])) // 4
+                    self._stream(body.get('model', 'mock'), prompt_tokens if include_usage else None)
+                else:
+                    text = ''.join(server.chunks())
+                    self._send_json({
+                        'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()),
+                        'model': body.get('model', 'mock'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': text}}],
+                    })
+
+            def _send_json(self, data, status=200):
+                payload = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _write_chunk(self, data):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def _event(self, data):
+                self._write_chunk(f"data: {json.dumps(data)}\n\n".encode('utf-8'))
+
+            def _stream(self, model, prompt_tokens=None):
+                """prompt_tokens 不为 None 时（请求了 include_usage）在最后一块返回用量"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                delay = 1.0 / server.token_rate if server.token_rate else 0
+                chunks = server.chunks()
+                created = int(time.time())
+                try:
+                    for text in chunks:
+                        self._event({
+                            'id': 'mock', 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                            'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}],
+                        })
+                        if delay:
+                            time.sleep(delay)
+                    if prompt_tokens is not None:
+                        self._event({
+                            'id': 'mock', 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                            'choices': [],
+                            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(chunks),
+                                      'total_tokens': prompt_tokens + len(chunks)},
+                        })
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b'0\r\n\r\n')
+                    self.wfile.flush()
+                    server.completed += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    server.aborted += 1  # 客户端取消了请求
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 OpenAI 兼容接口桩服务')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--rate', type=float, default=200.0, help='每秒输出的 token 数，0 表示不限速')
+    parser.add_argument('--ttfb', type=float, default=0.05, help='首字节延迟（秒）')
+    parser.add_argument('--think', type=int, default=0, help='<think> 中的 token 数')
+    parser.add_argument('--tokens', type=int, default=100, help='回答的 token 数')
+    args = parser.parse_args()
+
+    server = MockLLMServer(port=args.port, token_rate=args.rate, ttfb=args.ttfb,
+                           think_tokens=args.think, answer_tokens=args.tokens)
+    print(f"OpenAI 兼容接口：{server.base_url}（Ctrl+C 退出）")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,531 @@
+"""aiCMD 基准测试
+
+离线运行（AI 请求发往本地桩服务 benchmarks.mock_server），覆盖启动耗时、流式输出、
+Assistant 问答、补全延迟、命令解析、危险命令检查、命令输出捕获、输出压缩和 ls 着色，结果输出为 JSON，
+可与之前保存的结果比较，发现性能回退。
+
+用法（在仓库根目录）：
+    python -m benchmarks.run                          # 运行全部测试，打印 JSON
+    python -m benchmarks.run -o result.json           # 保存结果
+    python -m benchmarks.run --compare baseline.json  # 与基线比较，有回退时退出码为 1
+    python -m benchmarks.run --suites chat,completion --quick
+
+所有测试在临时 HOME 中运行，不会读写 ~/.aicmd 和 ~/.aicmd_history。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPORT_VERSION = 1
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 越大越好的指标（其余均为耗时，越小越好）
+HIGHER_IS_BETTER_SUFFIXES = ('_per_second',)
+
+
+def percentile(values, fraction):
+    """分位数"""
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def timed(func, *args, **kwargs):
+    """返回 (耗时, 结果)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码的屏幕输出"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def write_config(home, base_url):
+    """在临时 HOME 中写入指向桩服务的配置"""
+    config_dir = os.path.join(home, '.aicmd')
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump({'api': {'key': 'benchmark', 'base_url': base_url}, 'metrics': {'enabled': False}}, f)
+
+
+def make_command_corpus(count, seed=0):
+    """生成合成的命令语料（普通命令、管道、重定向、引号）"""
+    rng = random.Random(seed)
+    commands = ['ls', 'grep', 'find', 'docker', 'kubectl', 'systemctl', 'journalctl', 'git', 'tar', 'awk']
+    args = ['-la', '-rf', '--all', '-n 100', 'nginx', '/var/log', '"hello world"', "'a b'", '*.py', '-v']
+    tails = ['', '', ' | grep error', ' > out.txt', ' 2>&1', ' && echo ok', ' | sort | uniq -c', ' >> log']
+    corpus = []
+    for _ in range(count):
+        parts = [rng.choice(commands)] + rng.sample(args, rng.randint(0, 3))
+        corpus.append(' '.join(parts) + rng.choice(tails))
+    return corpus
+
+
+# ---------------------------------------------------------------- 各项测试
+
+def make_large_outputs(seed=0):
+    """合成的大段命令输出：dmesg 风格日志、docker ps 表格、pip list 表格"""
+    rng = random.Random(seed)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'kernel', 'cache', 'worker', 'socket', 'module']
+    dmesg = [f"[{i * 0.0137:12.6f}] usb 1-{i % 4}: new high-speed USB device number {i} using xhci_hcd"
+             for i in range(4000)]
+    dmesg[2500] = "[   34.250000] EXT4-fs error (device sda1): ext4_find_entry: reading directory lblock 0"
+    dmesg.append("[   55.100000] Out of memory: Killed process 4242 (java)")
+    docker = ['CONTAINER ID   IMAGE   COMMAND   CREATED   STATUS   PORTS   NAMES']
+    for i in range(400):
+        status = 'Exited (137) 3 minutes ago' if i % 97 == 13 else f'Up {rng.randint(1, 90)} hours'
+        docker.append(f"{rng.getrandbits(48):012x}   {rng.choice(words)}:{rng.randint(1, 9)}.{rng.randint(0, 20)}   "
+                      f"\"/entrypoint.sh\"   {rng.randint(1, 30)} days ago   {status}   {8000 + i}/tcp   "
+                      f"{rng.choice(words)}_{rng.choice(words)}_{i}")
+    pip = ['Package                Version', '---------------------- -------']
+    pip += [f"{rng.choice(words)}-{rng.choice(words)}-{i:<10} {rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 9)}"
+            for i in range(600)]
+    return {'dmesg': '\n'.join(dmesg), 'docker_ps': '\n'.join(docker), 'pip_list': '\n'.join(pip)}
+
+
+def bench_startup(quick):
+    """启动耗时：导入入口模块和终端模块（子进程中测量，取最短）"""
+    repeat = 3 if quick else 7
+    env = dict(os.environ, PYTHONPATH=ROOT)
+
+    def measure(code):
+        best = None
+        for _ in range(repeat):
+            elapsed, _ = timed(subprocess.run, [sys.executable, '-c', code], env=env, check=True)
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    baseline = measure('pass')
+    return {
+        'params': {'repeat': repeat},
+        'metrics': {
+            'interpreter_seconds': baseline,
+            'import_run_seconds': measure('import aicmd.run') - baseline,
+            'import_terminal_seconds': measure('import aicmd.core.terminal') - baseline,
+            'import_assistant_seconds': measure('import aicmd.core.assistant') - baseline,
+        },
+    }
+
+
+def bench_chat(quick):
+    """ChatManager.get_response：首字时间、相对理论耗时的额外开销、不限速时的吞吐"""
+    from benchmarks.mock_server import MockLLMServer
+    from aicmd.ai.chat import ChatManager
+    from aicmd.config.settings import Settings
+
+    requests = 3 if quick else 10
+    rate, ttfb, think, tokens = 200.0, 0.05, 20, 100
+    with MockLLMServer(token_rate=rate, ttfb=ttfb, think_tokens=think, answer_tokens=tokens) as server:
+        write_config(os.environ['HOME'], server.base_url)
+        with quiet():
+            chat = ChatManager(settings=Settings())
+            chat.get_response('warmup', {}, '')  # 首次请求包含导入 openai 和建立连接
+        ttfts, overheads = [], []
+        expected = ttfb + (think + 2 + tokens) / rate
+        for i in range(requests):
+            turn = {}
+            with quiet():
+                elapsed, _ = timed(chat.get_response, f'question {i}', {}, '', turn=turn)
+            ttfts.append(turn['ttft'])
+            overheads.append(elapsed - expected)
+
+        # 不限速：衡量每块的解析和显示开销
+        server.token_rate = 0
+        server.think_tokens = 0
+        server.answer_tokens = 2000 if quick else 10000
+        with quiet():
+            elapsed, _ = timed(chat.get_response, 'throughput', {}, '')
+
+    return {
+        'params': {'requests': requests, 'token_rate': rate, 'ttfb': ttfb,
+                   'think_tokens': think, 'answer_tokens': tokens,
+                   'throughput_tokens': server.answer_tokens},
+        'metrics': {
+            'ttft_p50_seconds': percentile(ttfts, 0.5),
+            'ttft_p95_seconds': percentile(ttfts, 0.95),
+            'overhead_p50_seconds': percentile(overheads, 0.5),
+            'stream_chunks_per_second': server.answer_tokens / elapsed,
+        },
+    }
+
+
+def bench_assistant(quick):
+    """Assistant.handle_ai_query：多轮会话中的端到端问答耗时、缓存命中耗时和命中率
+
+    会话保留上下文（和交互模式一样），先问一轮不同的问题，再重复提问并穿插追问：
+    重复的独立问题应命中缓存，追问每次都请求 AI。
+    """
+    from prompt_toolkit.application import create_app_session
+    from prompt_toolkit.input import create_pipe_input
+    from prompt_toolkit.output import DummyOutput
+    from benchmarks.mock_server import MockLLMServer
+
+    requests = 3 if quick else 10
+    questions = [f'如何查看磁盘占用 {i}' for i in range(requests)]
+    with MockLLMServer(token_rate=0, ttfb=0.02, answer='使用 `df -h` 查看磁盘占用：\n```bash\ndf -h\n```\n') as server:
+        write_config(os.environ['HOME'], server.base_url)
+        with create_pipe_input() as pipe, create_app_session(input=pipe, output=DummyOutput()):
+            from aicmd.core.assistant import Assistant
+            with quiet():
+                elapsed_init, assistant = timed(Assistant, agent_mode=False, use_cache=True)
+                assistant.handle_ai_query('!warmup')
+            cache = assistant.response_cache
+            totals, hits, follow_ups = [], [], []
+            for question in questions:
+                with quiet():
+                    elapsed, _ = timed(assistant.handle_ai_query, question)
+                totals.append(elapsed)
+            hits_before = cache.hits
+            for question in questions:
+                with quiet():
+                    elapsed, _ = timed(assistant.handle_ai_query, question)
+                    hits.append(elapsed)
+                    elapsed, _ = timed(assistant.handle_ai_query, '这个命令的输出怎么看？')
+                follow_ups.append(elapsed)
+            repeat_hits = cache.hits - hits_before
+
+    return {
+        'params': {'requests': requests, 'context_entries': len(assistant.context)},
+        'metrics': {
+            'init_seconds': elapsed_init,
+            'query_p50_seconds': percentile(totals, 0.5),
+            'query_p95_seconds': percentile(totals, 0.95),
+            'cache_hit_p50_seconds': percentile(hits, 0.5),
+            'follow_up_p50_seconds': percentile(follow_ups, 0.5),
+            'repeat_hit_rate': repeat_hits / len(questions),
+        },
+    }
+
+
+def bench_completion(quick):
+    """SimpleCompleter.get_completions：大 PATH、大历史记录下的补全延迟（含边输入边补全）"""
+    from types import SimpleNamespace
+    from prompt_toolkit.completion import CompleteEvent
+    from prompt_toolkit.document import Document
+    from aicmd.utils.history_index import IndexedFileHistory
+    from aicmd.core.terminal import SimpleCompleter
+
+    home = os.environ['HOME']
+    path_dirs, per_dir = (5, 1000) if quick else (20, 2000)
+    history_lines = 20000 if quick else 100000
+    rng = random.Random(1)
+
+    # 合成 PATH：每个目录若干可执行文件
+    bin_root = os.path.join(home, 'bin')
+    dirs = []
+    for d in range(path_dirs):
+        path = os.path.join(bin_root, f'd{d}')
+        os.makedirs(path)
+        for i in range(per_dir):
+            name = os.path.join(path, f"{rng.choice('abcdefghijklmnop')}cmd{d}_{i}")
+            with open(name, 'w'):
+                pass
+            os.chmod(name, 0o755)
+        dirs.append(path)
+
+    # 合成历史记录
+    history_file = os.path.join(home, '.aicmd_history')
+    corpus = make_command_corpus(history_lines, seed=2)
+    with open(history_file, 'w', encoding='utf-8') as f:
+        for i, cmd in enumerate(corpus):
+            f.write(f"\n# 2024-01-01 00:00:{i % 60:02d}\n+{cmd}\n")
+
+    # 目录补全用的大目录
+    big_dir = os.path.join(home, 'big')
+    os.makedirs(big_dir)
+    for i in range(2000 if quick else 10000):
+        open(os.path.join(big_dir, f"file{i:05d}.log"), 'w').close()
+    for i in range(200):
+        os.makedirs(os.path.join(big_dir, f"dir{i:03d}"))
+
+    old_path = os.environ['PATH']
+    os.environ['PATH'] = os.pathsep.join(dirs)
+    old_cwd = os.getcwd()
+    try:
+        history = IndexedFileHistory(history_file)
+        elapsed_load, _ = timed(lambda: list(history.load_history_strings()))
+        completer = SimpleCompleter(SimpleNamespace(history=history))
+        elapsed_index, _ = timed(completer.command_index.refresh, wait=True)
+        event = CompleteEvent(completion_requested=True)
+
+        def latencies(texts):
+            result = []
+            for text in texts:
+                elapsed, _ = timed(lambda: list(completer.get_completions(Document(text), event)))
+                result.append(elapsed)
+            return result
+
+        prefixes = [c[:rng.randint(1, 4)] for c in rng.sample(corpus, 200)]
+        history_times = latencies(prefixes)
+        command_times = latencies([f"{c}cmd" for c in 'abcdefghijklmnop'] * 5)
+        os.chdir(home)
+        completer.dir_cache.invalidate()
+        path_cold_times = latencies(['cd big/'])  # 首次读取目录
+        path_times = latencies(['cd big/', 'ls big/file0', 'cd big/dir1', 'ls big/'] * 10)
+
+        # 边输入边补全：逐个字符输入历史中的命令，每个按键补全一次
+        typing_times = []
+        truncated = 0
+        for cmd in rng.sample(corpus, 20):
+            typing_times += latencies([cmd[:i] for i in range(1, min(len(cmd), 12) + 1)])
+            truncated += completer.engine.last_stats[1]
+    finally:
+        os.environ['PATH'] = old_path
+        os.chdir(old_cwd)
+
+    return {
+        'params': {'path_dirs': path_dirs, 'commands_per_dir': per_dir, 'history_lines': history_lines},
+        'metrics': {
+            'history_load_seconds': elapsed_load,
+            'command_index_seconds': elapsed_index,
+            'history_p50_seconds': percentile(history_times, 0.5),
+            'history_p95_seconds': percentile(history_times, 0.95),
+            'command_p50_seconds': percentile(command_times, 0.5),
+            'command_p95_seconds': percentile(command_times, 0.95),
+            'path_cold_seconds': path_cold_times[0],
+            'path_p50_seconds': percentile(path_times, 0.5),
+            'path_p95_seconds': percentile(path_times, 0.95),
+            'typing_p50_seconds': percentile(typing_times, 0.5),
+            'typing_p95_seconds': percentile(typing_times, 0.95),
+            'typing_truncated': truncated,
+        },
+    }
+
+
+def bench_parser(quick):
+    """CommandParser.parse：合成命令语料的解析吞吐"""
+    from aicmd.core.command import CommandParser
+
+    corpus = make_command_corpus(5000 if quick else 50000, seed=3)
+    parser = CommandParser()
+    elapsed, _ = timed(lambda: [parser.parse(cmd) for cmd in corpus])
+    return {
+        'params': {'commands': len(corpus)},
+        'metrics': {'parse_commands_per_second': len(corpus) / elapsed},
+    }
+
+
+def bench_compactor(quick):
+    """OutputCompactor：大段输出压缩前后的 token 数和压缩耗时"""
+    from aicmd.ai.compactor import OutputCompactor
+    from aicmd.ai.context import estimate_tokens
+
+    outputs = make_large_outputs(seed=4)
+    compactor = OutputCompactor()
+    rounds = 3 if quick else 20
+    params = {'rounds': rounds}
+    metrics = {}
+    total = 0.0
+    for name, text in outputs.items():
+        elapsed, compacted = timed(lambda: [compactor.compact(text) for _ in range(rounds)])
+        total += elapsed / rounds
+        params[f'{name}_raw_tokens'] = estimate_tokens(text)
+        metrics[f'{name}_tokens'] = estimate_tokens(compacted[-1])
+    metrics['compact_seconds'] = total / len(outputs)
+    return {'params': params, 'metrics': metrics}
+
+
+def bench_policy(quick):
+    """CommandPolicy.check：合成命令语料（混入危险命令的各种写法）的检查吞吐和拦截数"""
+    from aicmd.core.policy import CommandPolicy
+
+    dangerous = [
+        'rm -rf /', 'rm -fr  /', 'sudo rm -r -f /*', '"rm" -rf "/"', 'rm --recursive ~',
+        'dd if=/dev/zero of=/dev/sda', 'cat image > /dev/sdb', 'mkfs.ext4 /dev/sdb1',
+        ':(){ :|:& };:', 'bash -c "rm -rf /"', 'ls && rm -rf /usr/', 'format C:',
+        "bash -lc 'rm -rf /'", "bash -c -- 'rm -rf /'", "sh -o errexit -ec 'rm -rf ~'",
+        'eval "rm -rf /"', 'rm -rf ${HOME}', 'find / -delete', 'find /etc -exec rm -rf {} +',
+        "bash <<'EOF'\nrm -rf /\nEOF", "sh <<< 'rm -rf /'", "sudo bash <<-EOF\n\trm -rf /usr\n\tEOF",
+    ]
+    corpus = make_command_corpus(10000 if quick else 100000, seed=5)
+    planted = set(range(0, len(corpus), 100))
+    for i in planted:
+        corpus[i] = dangerous[(i // 100) % len(dangerous)]
+    policy = CommandPolicy()
+    elapsed, verdicts = timed(lambda: [policy.check(cmd) for cmd in corpus])
+    return {
+        'params': {'commands': len(corpus), 'dangerous': len(planted)},
+        'metrics': {
+            'policy_commands_per_second': len(corpus) / elapsed,
+            'missed': sum(1 for i in planted if verdicts[i]),
+            'false_positives': sum(1 for i, verdict in enumerate(verdicts) if not verdict and i not in planted),
+        },
+    }
+
+
+def bench_colorize(quick):
+    """LsColorizer：大目录（普通文件、可执行文件、目录、符号链接）的 ls 输出着色耗时"""
+    from aicmd.utils.ls_colors import LsColorizer
+
+    count = 20000 if quick else 100000
+    directory = tempfile.mkdtemp(prefix='aicmd-bench-ls-')
+    try:
+        names = []
+        for i in range(count):
+            name = f"entry{i:06d}"
+            path = os.path.join(directory, name)
+            kind = i % 20
+            if kind == 0:
+                os.mkdir(path)
+            elif kind == 1:
+                os.symlink(f"entry{i - 1:06d}", path)  # 指向目录的符号链接
+            else:
+                name += '.tar.gz' if kind == 2 else '.txt'
+                path = os.path.join(directory, name)
+                open(path, 'w').close()
+                if kind == 3:
+                    os.chmod(path, 0o755)
+            names.append(name)
+        output = '\n'.join(sorted(names))
+        colorizer = LsColorizer(ls_colors='di=01;34:ln=01;36:ex=01;32:*.tar.gz=01;31:*.txt=00;33')
+        elapsed, _ = timed(colorizer.colorize, output, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'params': {'files': count},
+        'metrics': {'colorize_seconds': elapsed, 'colorize_files_per_second': count / elapsed},
+    }
+
+
+def bench_capture(quick):
+    """命令输出捕获：大量输出时的耗时（不回显）"""
+    from aicmd.core.runner import CommandRunner
+
+    lines = 200000 if quick else 2000000
+    runner = CommandRunner()
+    metrics = {}
+    modes = [('pipes', False)]
+    if runner.pty_available():
+        modes.append(('pty', True))
+    for name, use_pty in modes:
+        elapsed, result = timed(runner.run, f"seq 1 {lines}", echo=False, use_pty=use_pty)
+        metrics[f'{name}_seconds'] = elapsed
+        metrics[f'{name}_lines_per_second'] = lines / elapsed
+    return {'params': {'lines': lines}, 'metrics': metrics}
+
+
+SUITES = {
+    'startup': bench_startup,
+    'chat': bench_chat,
+    'assistant': bench_assistant,
+    'completion': bench_completion,
+    'parser': bench_parser,
+    'policy': bench_policy,
+    'capture': bench_capture,
+    'colorize': bench_colorize,
+    'compactor': bench_compactor,
+}
+
+
+# ---------------------------------------------------------------- 报告
+
+def run(suites, quick=False):
+    """在临时 HOME 中运行指定的测试，返回报告"""
+    report = {
+        'version': REPORT_VERSION,
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick,
+        },
+        'suites': {},
+    }
+    old_home = os.environ.get('HOME')
+    for name in suites:
+        home = tempfile.mkdtemp(prefix='aicmd-bench-')
+        os.environ['HOME'] = home
+        try:
+            report['suites'][name] = SUITES[name](quick)
+        except Exception as e:
+            report['suites'][name] = {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            if old_home is not None:
+                os.environ['HOME'] = old_home
+            shutil.rmtree(home, ignore_errors=True)
+        print(f"[{name}] 完成", file=sys.stderr)
+    return report
+
+
+def compare(baseline, current, threshold=0.2):
+    """比较两份报告
+
+    Returns:
+        tuple: (比较结果行列表, 是否有回退)
+    """
+    rows = []
+    regressed = False
+    for suite, data in current['suites'].items():
+        base_metrics = baseline.get('suites', {}).get(suite, {}).get('metrics', {})
+        for metric, value in data.get('metrics', {}).items():
+            base = base_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or base < 0:
+                continue
+            higher_better = metric.endswith(HIGHER_IS_BETTER_SUFFIXES)
+            if base == 0:
+                # 基线为 0 的计数指标（漏拦截数等）：出现任何非零值都算回退
+                if higher_better or value == 0:
+                    continue
+                change = float('inf')
+            else:
+                ratio = value / base
+                change = (1 / ratio - 1) if higher_better else (ratio - 1)  # 正数表示变慢
+            status = 'ok'
+            if change > threshold:
+                status = 'REGRESSION'
+                regressed = True
+            elif change < -threshold:
+                status = 'improved'
+            rows.append(f"{suite + '.' + metric:<48}{base:>14.6g}{value:>14.6g}{change:>+9.1%}  {status}")
+    header = f"{'指标':<46}{'基线':>12}{'当前':>12}{'变化':>9}"
+    return [header] + rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='aiCMD 基准测试')
+    parser.add_argument('--suites', default=','.join(SUITES), help=f"逗号分隔，可选：{','.join(SUITES)}")
+    parser.add_argument('--quick', action='store_true', help='缩小数据规模，快速运行')
+    parser.add_argument('-o', '--output', help='把结果保存为 JSON 文件')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线 JSON 比较')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为回退的变化比例（默认 0.2）')
+    args = parser.parse_args()
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    suites = [s.strip() for s in args.suites.split(',') if s.strip()]
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        parser.error(f"未知的测试：{', '.join(unknown)}")
+
+    report = run(suites, quick=args.quick)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressed = compare(baseline, report, args.threshold)
+        print("\n".join(rows))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import unittest
+
+from aicmd.core.fanout import FanoutExecutor, HostResult
+
+# 用本地子进程模拟主机：sh -c 执行命令，主机名作为 $0 传入
+LOCAL_TEMPLATE = ['sh', '-c', '{command}']
+LOCAL_TEMPLATE_WITH_HOST = ['sh', '-c', '{command}', '{host}']
+
+
+@unittest.skipUnless(os.name == 'posix', '需要 sh')
+class FanoutExecutorTest(unittest.TestCase):
+    def make_executor(self, hosts, template=LOCAL_TEMPLATE, **kwargs):
+        executor = FanoutExecutor(hosts=hosts, command_template=template, **kwargs)
+        self.addCleanup(executor.close)
+        return executor
+
+    def test_identical_outputs_are_grouped(self):
+        hosts = [f'web{i}' for i in range(5)]
+        result = self.make_executor(hosts).run('echo ok')
+
+        self.assertEqual(len(result.groups), 1)
+        members = next(iter(result.groups.values()))
+        self.assertEqual([m.host for m in members], hosts)
+        self.assertEqual(members[0].output, 'ok\n')
+        self.assertEqual(result.failed_hosts, [])
+        self.assertIn('1 种不同结果', result.summary())
+        self.assertEqual(result.to_command_result('echo ok').exit_code, 0)
+
+    def test_hosts_grouped_by_output_fingerprint(self):
+        hosts = ['web1', 'db1', 'web2', 'web3', 'db2']
+        command = 'case "$0" in web*) echo up;; *) echo down; exit 3;; esac'
+        result = self.make_executor(hosts, LOCAL_TEMPLATE_WITH_HOST).run(command)
+
+        groups = [[m.host for m in members] for members in result.groups.values()]
+        self.assertEqual(groups, [['web1', 'web2', 'web3'], ['db1', 'db2']])  # 主机多的组在前
+        self.assertEqual(sorted(result.failed_hosts), ['db1', 'db2'])
+        summary = result.summary()
+        self.assertEqual(summary.count('up'), 1)
+        self.assertEqual(summary.count('down'), 1)
+        self.assertEqual(result.to_command_result(command).exit_code, 1)
+
+    def test_fingerprint_ignores_colors_and_trailing_whitespace(self):
+        plain = HostResult('a', 'active\nrunning\n', 0)
+        colored = HostResult('b', '\x1b[32mactive\x1b[0m  \nrunning', 0)
+        failed = HostResult('c', 'active\nrunning\n', 1)
+        self.assertEqual(plain.fingerprint(), colored.fingerprint())
+        self.assertNotEqual(plain.fingerprint(), failed.fingerprint())
+
+    def test_output_is_streamed_per_host(self):
+        lines = []
+        lock = threading.Lock()
+
+        def on_output(host, line):
+            with lock:
+                lines.append((host, line))
+
+        self.make_executor(['h1', 'h2'], LOCAL_TEMPLATE_WITH_HOST).run('echo "$0"; echo done', on_output=on_output)
+        self.assertEqual(sorted(lines), [('h1', 'done'), ('h1', 'h1'), ('h2', 'done'), ('h2', 'h2')])
+
+    def test_worker_pool_is_bounded(self):
+        executor = self.make_executor([f'h{i}' for i in range(4)], workers=2)
+        result = executor.run('sleep 0.3')
+        self.assertGreaterEqual(result.wall_time, 0.55)
+        self.assertTrue(all(r.success for r in result.results))
+
+    def test_timeout_kills_slow_host(self):
+        executor = self.make_executor(['fast', 'slow'], LOCAL_TEMPLATE_WITH_HOST, timeout=0.5)
+        # 后台的 sleep 也持有输出管道，超时后必须连同子进程一起结束
+        command = 'if [ "$0" = slow ]; then sleep 30 & sleep 30; fi; echo finished'
+        started = time.monotonic()
+        result = executor.run(command)
+
+        self.assertLess(time.monotonic() - started, 10)
+        by_host = {r.host: r for r in result.results}
+        self.assertTrue(by_host['fast'].success)
+        self.assertIn('超时', by_host['slow'].error)
+        self.assertEqual(result.failed_hosts, ['slow'])
+        self.assertEqual(len(result.groups), 2)
+
+    def test_watchdog_is_cancelled_after_normal_exit(self):
+        executor = self.make_executor(['h1'], timeout=0.3)
+        result = executor.run('echo quick')
+        time.sleep(0.5)  # 看门狗若未取消，会在这之后把结果之外的进程组杀掉
+        self.assertTrue(result.results[0].success)
+        self.assertIsNone(result.results[0].error)
+
+    def test_cancel_stops_running_and_pending_hosts(self):
+        executor = self.make_executor([f'h{i}' for i in range(4)], workers=2, timeout=30)
+        outcome = {}
+
+        def run():
+            outcome['result'] = executor.run('sleep 30')
+
+        thread = threading.Thread(target=run)
+        started = time.monotonic()
+        thread.start()
+        time.sleep(0.3)
+        executor.cancel()
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.monotonic() - started, 10)
+        results = outcome['result'].results
+        self.assertEqual([r.error for r in results], ['已取消'] * 4)
+        self.assertEqual(len(outcome['result'].groups), 2)  # 被结束的主机和未开始的主机
+
+    def test_run_after_cancel_starts_again(self):
+        executor = self.make_executor(['h1'])
+        executor.cancel()
+        self.assertTrue(executor.run('echo again').results[0].success)
+
+    def test_unrunnable_command_reports_error(self):
+        executor = self.make_executor(['h1'], ['/nonexistent/aicmd-ssh', '{host}', '{command}'])
+        result = executor.run('true').results[0]
+        self.assertIn('无法执行', result.error)
+        self.assertFalse(result.success)
+
+    def test_select_hosts(self):
+        executor = FanoutExecutor(hosts=['web1', 'web2', 'db1'])
+        self.assertEqual(executor.select_hosts('web*'), ['web1', 'web2'])
+        self.assertEqual(executor.select_hosts('db1,web2,other'), ['db1', 'web2', 'other'])
+        self.assertEqual(executor.select_hosts(''), ['web1', 'web2', 'db1'])
+
+
+if __name__ == '__main__':
+    unittest.main()